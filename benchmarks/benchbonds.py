@@ -0,0 +1,97 @@
+"""
+Scaling benchmark for the bond detection
+========================================
+
+Random structures of hydrocarbon-like density are generated with sizes from
+:math:`10^2` to :math:`10^6` atoms, and the time for the cell-list bond search
+is measured. For the small sizes, the original all-pairs search is also timed
+for comparison. The results are printed as a table.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+from numpy import linalg
+
+from ccpoviz.neighbours import find_bonded_pairs
+
+
+# Number density of atoms in per cubic angstrom, about that of liquid alkanes
+DENSITY = 0.1
+# Covalent radii for the carbon and hydrogen atoms to be randomly selected
+RADII = [0.76, 0.31]
+
+
+def gen_structure(n_atms, seed=0):
+
+    """Generates a random structure with the given number of atoms"""
+
+    rand = np.random.RandomState(seed)
+    edge = (n_atms / DENSITY) ** (1.0 / 3.0)
+    coords = rand.uniform(0.0, edge, size=(n_atms, 3))
+    radii = rand.choice(RADII, size=n_atms)
+
+    return coords, radii
+
+
+def all_pairs_search(coords, radii):
+
+    """The original all-pairs search for the bonds"""
+
+    bonds = []
+    for idx1, idx2 in itertools.combinations(xrange(len(coords)), 2):
+        dist = linalg.norm(coords[idx1] - coords[idx2])
+        if dist < radii[idx1] + radii[idx2]:
+            bonds.append((idx1, idx2))
+
+    return bonds
+
+
+def main():
+
+    """The main driver function"""
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark the scaling of the bond detection'
+        )
+    parser.add_argument('--max-exponent', type=int, default=6,
+                        help='The largest size as a power of ten')
+    parser.add_argument('--max-all-pairs', type=int, default=3000,
+                        help='The largest size to run the all-pairs search')
+    args = parser.parse_args()
+
+    print('%10s %10s %14s %14s' % (
+        'atoms', 'bonds', 'cell-list (s)', 'all-pairs (s)'
+        ))
+
+    for exponent in xrange(2, args.max_exponent + 1):
+        for mantissa in [1, 3] if exponent < args.max_exponent else [1]:
+
+            n_atms = mantissa * 10 ** exponent
+            coords, radii = gen_structure(n_atms)
+
+            beg = time.time()
+            idx1, _ = find_bonded_pairs(coords, radii)
+            cell_time = time.time() - beg
+
+            if n_atms <= args.max_all_pairs:
+                beg = time.time()
+                all_pairs_search(coords, radii)
+                all_pairs_time = '%14.4f' % (time.time() - beg)
+            else:
+                all_pairs_time = '%14s' % '-'
+
+            print('%10d %10d %14.4f %s' % (
+                n_atms, len(idx1), cell_time, all_pairs_time
+                ))
+
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,589 @@
+"""
+Non-blocking rendering from an event loop
+=========================================
+
+The :py:func:`renderdriver.render_driver` function blocks until pov-ray
+finishes, which makes it unsuitable for embedding in an event-driven service.
+This module provides a non-blocking alternative. In a :py:class:`RenderLoop`,
+many renders can be submitted and run at the same time from a single thread.
+The scenes are generated in a pool of worker processes and the pov-ray
+processes are monitored by ``select`` on their output pipes, so that no thread
+is needed for each render.
+
+Each submission gives a :py:class:`RenderJob` handle, which can be cancelled,
+queried, or given callbacks to be called when it is done. A timeout can be set
+for each job, after which its pov-ray process is killed. The output of pov-ray
+is streamed line by line to an optional callback as soon as it is produced.
+When the ``render-stats`` option is set for a job, the output is also kept,
+and the statistics parsed from it are written next to the image and set as
+the ``stats`` attribute of the job handle.
+
+The number of pov-ray processes running at the same time is limited, and
+their work threads are allocated from a :py:class:`cpubudget.CpuBudget` and
+released when they finish, the same as in :py:mod:`batchrender`. The jobs with
+their scenes generated wait for a free render slot and free processors.
+
+Renders are submitted by :py:meth:`RenderLoop.submit_render`, which takes the
+same arguments as the render driver, or by :py:meth:`RenderLoop.submit` with a
+job dictionary. The loop can be driven by
+:py:meth:`RenderLoop.run_until_complete`, or by calling
+:py:meth:`RenderLoop.poll` periodically from another event loop, which can also
+watch the file descriptors from :py:meth:`RenderLoop.get_fds` for readiness.
+
+"""
+
+import multiprocessing
+import os
+import re
+import select
+import subprocess
+import time
+
+from .batchrender import init_worker, prepare_scene
+from .cpubudget import CpuBudget, count_blocks, decide_threads
+from .povstats import parse_stats
+from .rendercache import get_cache, remove_output
+from .runpov import finish_stats, get_graph_height, remove_pov_files
+
+
+# The status of the jobs that are finished
+FINISHED_STATUS = ['done', 'failed', 'cancelled', 'timeout']
+
+# The size of the chunks for reading the output of pov-ray in bytes
+READ_SIZE = 65536
+
+# The pattern for splitting the output of pov-ray into lines, where the
+# progress is updated by carriage returns
+LINE_END = re.compile(r'\r\n|\r|\n')
+
+
+class RenderFailure(Exception):
+
+    """The exception for failed, cancelled, or timed-out render jobs"""
+
+    pass
+
+
+class RenderJob(object):
+
+    """The handle of a render job submitted to a render loop
+
+    .. py:attribute:: job
+
+      The job dictionary, of the format of the jobs of
+      :py:mod:`batchrender`.
+
+    .. py:attribute:: status
+
+      The status of the job, which is ``scene`` during the scene generation
+      and the waiting for a render slot, ``running`` when pov-ray is running,
+      and ``done``, ``failed``, ``cancelled``, or ``timeout`` when finished.
+
+    .. py:attribute:: message
+
+      The message of the error for failed jobs.
+
+    .. py:attribute:: output_file
+
+      The name of the output file, known after the scene generation.
+
+    .. py:attribute:: stats
+
+      The dictionary of the statistics of the render, only set when the
+      ``render-stats`` option is set and pov-ray is finished.
+
+    """
+
+    __slots__ = [
+        'job',
+        'status',
+        'message',
+        'output_file',
+        'stats',
+        'deadline',
+        'on_output',
+        '_callbacks',
+        '_scene_res',
+        '_scene',
+        '_proc',
+        '_buffer',
+        '_output',
+        '_beg_time',
+        '_n_threads',
+        '_cpus',
+        ]
+
+    def __init__(self, job, deadline, on_output):
+
+        """Initializes the handle for a job under scene generation"""
+
+        self.job = job
+        self.status = 'scene'
+        self.message = ''
+        self.output_file = None
+        self.stats = None
+        self.deadline = deadline
+        self.on_output = on_output
+        self._callbacks = []
+        self._scene_res = None
+        self._scene = None
+        self._proc = None
+        self._buffer = ''
+        self._output = None
+        self._beg_time = None
+        self._n_threads = None
+        self._cpus = None
+
+    def done(self):
+
+        """Tests if the job is finished"""
+
+        return self.status in FINISHED_STATUS
+
+    def result(self):
+
+        """Gets the output file of a job that is done
+
+        :raises RenderFailure: if the job is not successfully done
+
+        """
+
+        if self.status == 'done':
+            return self.output_file
+        elif self.done():
+            raise RenderFailure('Render %s: %s' % (self.status, self.message))
+        else:
+            raise RenderFailure('Render not finished')
+
+    def add_done_callback(self, callback):
+
+        """Adds a callback to be called with the job when it is done
+
+        The callback is called immediately when the job is already done.
+
+        """
+
+        if self.done():
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+        return None
+
+    def cancel(self):
+
+        """Cancels the job
+
+        A running pov-ray process is killed, and the pov-ray input files are
+        removed unless they are to be kept.
+
+        :returns: If the job is cancelled, False when it is already done
+
+        """
+
+        if self.done():
+            return False
+
+        self._finish('cancelled', 'Cancelled')
+        return True
+
+    def _finish(self, status, message=''):
+
+        """Finishes the job with the given status and calls the callbacks"""
+
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.kill()
+        if self._proc is not None:
+            self._proc.stdout.close()
+            self._proc.wait()
+
+        if self._scene is not None and not self.job['keep']:
+            remove_pov_files(self._scene.output_file)
+
+        self.status = status
+        self.message = message
+
+        callbacks = self._callbacks
+        self._callbacks = []
+        for callback in callbacks:
+            callback(self)
+
+        return None
+
+    def _feed(self, chunk):
+
+        """Feeds a chunk of the output of pov-ray to the output callback"""
+
+        if self._output is not None:
+            self._output.append(chunk)
+        if self.on_output is None:
+            return None
+
+        lines = LINE_END.split(self._buffer + chunk)
+        self._buffer = lines.pop()
+        for line in lines:
+            self.on_output(self, line)
+
+        return None
+
+    def _flush(self):
+
+        """Feeds the remaining incomplete line to the output callback"""
+
+        if self.on_output is not None and self._buffer != '':
+            self.on_output(self, self._buffer)
+        self._buffer = ''
+
+        return None
+
+
+class RenderLoop(object):
+
+    """The loop for running render jobs without blocking
+
+    .. py:attribute:: jobs
+
+      The list of the unfinished jobs.
+
+    .. py:attribute:: max_renders
+
+      The maximum number of pov-ray processes running at the same time.
+
+    .. py:attribute:: budget
+
+      The :py:class:`cpubudget.CpuBudget` for the pov-ray processes.
+
+    """
+
+    __slots__ = [
+        'jobs',
+        'max_renders',
+        'budget',
+        '_pool',
+        '_caches',
+        '_abandoned',
+        ]
+
+    def __init__(self, n_workers=None, max_renders=None, n_cpus=None):
+
+        """Initializes the loop
+
+        :param n_workers: The number of worker processes for the scene
+            generation, default to the number of processors
+        :param max_renders: The maximum number of concurrent pov-ray
+            processes, default to the number of processors in the budget
+        :param n_cpus: The number of processors for the pov-ray processes,
+            default to all the available ones
+        :raises ValueError: if the numbers are not positive
+
+        """
+
+        budget = CpuBudget(n_cpus)
+        if max_renders is None:
+            max_renders = len(budget.cpus)
+        elif max_renders < 1:
+            raise ValueError(
+                'The number of concurrent renders needs to be positive'
+                )
+
+        self.jobs = []
+        self.max_renders = max_renders
+        self.budget = budget
+        self._pool = multiprocessing.Pool(n_workers, init_worker)
+        self._caches = {}
+        self._abandoned = []
+
+    def submit(self, job, timeout=None, on_output=None):
+
+        """Submits a render job
+
+        :param job: The job dictionary, with all the fields of the jobs of
+            :py:mod:`batchrender`
+        :param timeout: The timeout of the job in seconds from the submission
+        :param on_output: The callback to be called with the job and each line
+            of the output of pov-ray
+        :returns: The :py:class:`RenderJob` handle of the job
+
+        """
+
+        # pylint: disable=protected-access
+
+        deadline = None if timeout is None else time.time() + timeout
+        render_job = RenderJob(job, deadline, on_output)
+        render_job._scene_res = self._pool.apply_async(
+            prepare_scene, (len(self.jobs), job)
+            )
+        self.jobs.append(render_job)
+
+        return render_job
+
+    def submit_render(self, input_file, input_reader, molecule_option,
+                      project_option, output_file, if_keep, timeout=None,
+                      on_output=None):
+
+        """Submits a render job with the arguments of the render driver
+
+        The arguments are the same as :py:func:`renderdriver.render_driver`,
+        followed by the timeout and output callback of :py:meth:`submit`.
+
+        :returns: The :py:class:`RenderJob` handle of the job
+
+        """
+
+        # pylint: disable=too-many-arguments
+
+        return self.submit({
+            'input': input_file,
+            'reader': input_reader,
+            'molecule-option': molecule_option,
+            'project-option': project_option,
+            'output': output_file,
+            'keep': if_keep,
+            }, timeout=timeout, on_output=on_output)
+
+    def get_fds(self):
+
+        """Gets the file descriptors of the output of the running renders"""
+
+        # pylint: disable=protected-access
+
+        return [
+            i._proc.stdout.fileno() for i in self.jobs
+            if i.status == 'running'
+            ]
+
+    def poll(self, timeout=0.0):
+
+        """Runs one iteration of the loop
+
+        The generated scenes are sent to pov-ray, the available output of
+        pov-ray is read, and the finished and timed-out jobs are finished.
+
+        :param timeout: The maximum time in seconds to wait for the output of
+            pov-ray
+        :returns: The number of the unfinished jobs
+
+        """
+
+        # pylint: disable=protected-access
+
+        self._drop_finished()
+
+        for job in self.jobs:
+            if (job.status == 'scene' and job._scene_res.ready() and
+                    self._has_slot()):
+                self._start(job, job._scene_res.get())
+
+        running = dict(
+            (i._proc.stdout.fileno(), i) for i in self.jobs
+            if i.status == 'running'
+            )
+        if len(running) > 0:
+            readable, _, _ = select.select(running.keys(), [], [], timeout)
+        else:
+            readable = []
+            if timeout > 0.0:
+                time.sleep(timeout)
+
+        for fd in readable:
+            job = running[fd]
+            chunk = os.read(fd, READ_SIZE)
+            if chunk:
+                job._feed(chunk)
+                continue
+
+            # The end of the output
+            job._flush()
+            ret_code = job._proc.wait()
+            if job._output is not None:
+                job.stats = finish_stats(
+                    job.output_file, job._scene.options,
+                    parse_stats(''.join(job._output)),
+                    time.time() - job._beg_time, job._n_threads
+                    )
+            if ret_code == 0:
+                self._store_image(job)
+                job._finish('done')
+            else:
+                job._finish(
+                    'failed', 'Pov-ray returned with error code %d' % ret_code
+                    )
+
+        now = time.time()
+        for job in self.jobs:
+            if (not job.done() and job.deadline is not None and
+                    now > job.deadline):
+                job._finish('timeout', 'Timed out')
+
+        self._drop_finished()
+
+        return len(self.jobs)
+
+    def _drop_finished(self):
+
+        """Drops the finished jobs from the loop
+
+        For the jobs finished before their scenes are generated, the scenes
+        are tracked until they are generated, so that their pov-ray input
+        files can be removed.
+
+        """
+
+        # pylint: disable=protected-access
+
+        for job in self.jobs:
+            if job.done() and job._cpus is not None:
+                self.budget.release(job._cpus)
+                job._cpus = None
+            if job.done() and job._scene is None:
+                self._abandoned.append((job._scene_res, job.job['keep']))
+
+        abandoned = []
+        for scene_res, keep in self._abandoned:
+            if not scene_res.ready():
+                abandoned.append((scene_res, keep))
+                continue
+            scene = scene_res.get()
+            if scene.error is None and not keep:
+                remove_pov_files(scene.output_file)
+        self._abandoned = abandoned
+
+        self.jobs = [i for i in self.jobs if not i.done()]
+
+        return None
+
+    def run_until_complete(self, jobs=None, interval=0.05):
+
+        """Runs the loop until the given jobs are finished
+
+        :param jobs: The jobs to wait for, default to all the jobs
+        :param interval: The maximum time in seconds for each iteration
+
+        """
+
+        if jobs is None:
+            jobs = list(self.jobs)
+
+        while not all(i.done() for i in jobs):
+            self.poll(interval)
+
+        return None
+
+    def close(self):
+
+        """Cancels all the unfinished jobs and shuts down the workers"""
+
+        for job in list(self.jobs):
+            job.cancel()
+        self.jobs = []
+        self._pool.terminate()
+        self._pool.join()
+
+        return None
+
+    def _get_cache(self, scene):
+
+        """Gets the render cache for a scene, None when it is not enabled"""
+
+        if scene.cache_key is None:
+            return None
+
+        settings = tuple(
+            scene.options[i] for i in [
+                'render-cache-dir', 'render-cache-size', 'render-cache-link'
+                ]
+            )
+        if settings not in self._caches:
+            self._caches[settings] = get_cache(scene.options)
+
+        return self._caches[settings]
+
+    def _has_slot(self):
+
+        """Tests if another pov-ray process can be started"""
+
+        n_running = len([i for i in self.jobs if i.status == 'running'])
+        return n_running < self.max_renders and len(self.budget.free) > 0
+
+    def _start(self, job, scene):
+
+        """Starts pov-ray for a job with its scene generated
+
+        The free processors are shared by the free render slots, limited by
+        the number of the jobs still to be rendered, and the processors for
+        the job are allocated from the budget until it is finished.
+
+        """
+
+        # pylint: disable=protected-access
+
+        job.output_file = scene.output_file
+        if scene.error is not None:
+            job._finish('failed', scene.error)
+            return None
+        job._scene = scene
+
+        try:
+            cache = self._get_cache(scene)
+        except (OSError, ValueError) as err:
+            job._finish('failed', 'Invalid render cache: %s' % err)
+            return None
+        if cache is not None and cache.fetch(
+                scene.cache_key, scene.output_file
+        ):
+            job._finish('done', 'cached')
+            return None
+        try:
+            remove_output(scene.output_file)
+        except OSError as err:
+            job._finish(
+                'failed', 'Cannot remove the old output file: %s' % err
+                )
+            return None
+
+        n_running = len([i for i in self.jobs if i.status == 'running'])
+        n_waiting = len([i for i in self.jobs if i.status == 'scene'])
+        n_threads = decide_threads(
+            len(self.budget.free),
+            min(self.max_renders - n_running, n_waiting),
+            count_blocks(
+                scene.options['graph-width'], get_graph_height(scene.options)
+                ),
+            scene.options['work-threads']
+            )
+        cpus = self.budget.allocate(n_threads)
+
+        try:
+            job._proc = subprocess.Popen(
+                scene.pov_args + ['+WT%d' % n_threads],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+                )
+        except OSError:
+            self.budget.release(cpus)
+            job._finish('failed', 'Pov-ray cannot be invoked!')
+            return None
+
+        job.status = 'running'
+        job._beg_time = time.time()
+        job._n_threads = n_threads
+        job._cpus = cpus
+        if scene.options['render-stats']:
+            job._output = []
+        return None
+
+    def _store_image(self, job):
+
+        """Stores the rendered image of a job into the render cache"""
+
+        # pylint: disable=protected-access
+
+        cache = self._get_cache(job._scene)
+        if cache is None:
+            return None
+
+        try:
+            cache.store(job._scene.cache_key, job._scene.output_file)
+        except (IOError, OSError):
+            pass
+
+        return None
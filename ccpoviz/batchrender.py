@@ -0,0 +1,901 @@
+"""
+Batch rendering of many inputs
+==============================
+
+In the batch mode, many input files are rendered in one invocation. The jobs
+can be given either as input files on the command line, which share the same
+settings, or by a manifest in the JSON lines format, with one JSON object for
+each job on each line. The fields of the objects are
+
+input
+  The name of the input file, which is required.
+
+output, reader, molecule-option, project-option, keep
+  The same as the corresponding command line arguments, which give the
+  defaults for the fields that are not set in the manifest.
+
+The pov-ray scenes are generated in a pool of worker processes, while a bounded
+number of pov-ray processes are kept running by the main process. So the scenes
+for the next jobs are prepared while the current ones are being rendered. The
+status of each job is printed as soon as it is finished, and a summary of all
+the jobs is printed at the end.
+
+The processors for the pov-ray processes are allocated from a
+:py:class:`cpubudget.CpuBudget`, and the number of work threads of each
+pov-ray process is set to the number of processors allocated to it. The free
+processors are shared among the renders to be started, so that the machine is
+not oversubscribed when many renders run at the same time, while a render
+started when no other jobs are waiting can use all the free processors. The
+allocation of each job is shown in its report.
+
+When the render cache is enabled in the options of a job, the cache key is
+formed in the worker after the scene is generated, and the cached image is used
+without invoking pov-ray on a hit. The statistics of the caches are shown in
+the summary.
+
+When the ``render-stats`` option of a job is set, the output of its pov-ray
+process is captured rather than shown, and the statistics parsed from it are
+written next to the image, see :py:mod:`povstats`.
+
+When a checkpoint is given, the jobs whose images are up to date according to
+it are skipped, and the completed jobs are recorded into it, so that an
+interrupted batch can be resumed, see :py:mod:`checkpoint`.
+
+The configuration files are parsed only once in each worker, see
+:py:mod:`configcache`, and the statistics of the caches of the workers are
+added up in the summary.
+
+Each job is rendered by a single pov-ray process, here and in the render loop
+of :py:mod:`asyncrender` that shares the scene generation. So the jobs asking
+for the tiled rendering by ``tile-count``, the progressive mode, or the
+turntable animation, which need several pov-ray processes, fail with an
+explicit error rather than being silently rendered in one go. They can be
+rendered by the single-job mode.
+
+"""
+
+from __future__ import print_function
+
+import collections
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import tempfile
+import time
+
+from .checkpoint import Checkpoint, get_fingerprint
+from .configcache import get_config_cache, format_stats
+from .cpubudget import (
+    CpuBudget, count_blocks, decide_threads, format_cpu_list,
+    gen_affinity_prefix, get_taskset
+    )
+from .povstats import parse_stats
+from .rendercache import form_render_key, get_cache, remove_output
+from .renderdriver import gen_scene, get_output_file
+from .runpov import (
+    finish_stats, gen_pov_args, get_graph_height, get_pov_input,
+    remove_pov_files
+    )
+from .turntable import is_turntable
+from .util import ProgramTermination
+
+
+#
+# The jobs
+# --------
+#
+
+
+JOB_FIELDS = [
+    'input', 'output', 'reader', 'molecule-option', 'project-option', 'keep'
+    ]
+
+
+def form_jobs(input_files, defaults):
+
+    """Forms the jobs for the given input files
+
+    :param input_files: The list of input file names
+    :param defaults: The dictionary giving the default for all the job fields
+        other than the input
+    :returns: The list of job dictionaries
+
+    """
+
+    jobs = []
+    for input_file in input_files:
+        job = dict(defaults)
+        job['input'] = input_file
+        jobs.append(job)
+
+    return jobs
+
+
+def read_manifest(manifest_file, defaults):
+
+    """Reads the jobs from a manifest file in the JSON lines format
+
+    Empty lines in the manifest are skipped.
+
+    :param manifest_file: The name of the manifest file
+    :param defaults: The dictionary giving the default for all the job fields
+        other than the input
+    :returns: The list of job dictionaries
+    :raises ValueError: if an entry in the manifest is invalid
+
+    """
+
+    jobs = []
+
+    with open(manifest_file, 'r') as manifest:
+        for line_no, line in enumerate(manifest, start=1):
+
+            if line.strip() == '':
+                continue
+
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                raise ValueError(
+                    'Invalid JSON on line %d of the manifest' % line_no
+                    )
+
+            if not isinstance(entry, dict) or 'input' not in entry:
+                raise ValueError(
+                    'No input file given on line %d of the manifest' % line_no
+                    )
+            unknown = sorted(set(entry) - set(JOB_FIELDS))
+            if len(unknown) > 0:
+                raise ValueError(
+                    'Unknown fields %s on line %d of the manifest' % (
+                        ', '.join(unknown), line_no
+                        )
+                    )
+
+            job = dict(defaults)
+            job.update(entry)
+            jobs.append(job)
+
+    return jobs
+
+
+def absolutize_job(job):
+
+    """Makes all the file names in a job absolute
+
+    This is needed when the job is to be run by another process with a
+    different working directory. The default output file is decided before
+    the input file name is made absolute, since it is derived from the name.
+
+    :returns: The new job dictionary
+
+    """
+
+    job = dict(job)
+    job['output'] = os.path.abspath(
+        get_output_file(job['input'], job['output'])
+        )
+    job['input'] = os.path.abspath(job['input'])
+    if job['project-option'] is not None:
+        job['project-option'] = os.path.abspath(job['project-option'])
+    if job['molecule-option'] not in [None, 'input-title']:
+        job['molecule-option'] = os.path.abspath(job['molecule-option'])
+
+    return job
+
+
+#
+# Scene generation in the workers
+# -------------------------------
+#
+
+
+Scene = collections.namedtuple('Scene', [
+    'index',
+    'job',
+    'output_file',
+    'options',
+    'pov_args',
+    'cache_key',
+    'error',
+    'time',
+    'config_stats',
+    ])
+
+
+def init_worker():
+
+    """Initializes the worker processes for scene generation
+
+    The interruption from the keyboard is left for the main process to handle.
+
+    """
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def get_config_stats():
+
+    """Gets the process ID and the config cache statistics of the worker"""
+
+    return os.getpid(), dict(get_config_cache().stats)
+
+
+def check_single_render(options):
+
+    """Checks if a job can be rendered by a single pov-ray process
+
+    :param options: The options dictionary of the job
+    :returns: The error message for the options needing more than one pov-ray
+        process, None when there is no such option
+
+    """
+
+    if options['tile-count'] != 1:
+        return (
+            'Tiled rendering by tile-count %d is only supported for single '
+            'jobs' % options['tile-count']
+            )
+    elif options['progressive']:
+        return 'The progressive mode is only supported for single jobs'
+    elif is_turntable(options):
+        return (
+            'Turntable animation of %d frames is only supported for single '
+            'jobs' % options['turntable-frames']
+            )
+    else:
+        return None
+
+
+def prepare_scene(index, job):
+
+    """Generates the pov-ray scene for a job
+
+    This function is run in the worker processes. The errors in the scene
+    generation are returned in the ``error`` field of the result rather than
+    raised, so that a failed job does not affect the others. The jobs that
+    cannot be rendered by a single pov-ray process, see
+    :py:func:`check_single_render`, fail after the scene generation.
+
+    :param index: The index of the job in the batch
+    :param job: The job dictionary
+    :returns: The :py:class:`Scene` for the job
+
+    """
+
+    beg_time = time.time()
+
+    try:
+        output_file, options = gen_scene(
+            job['input'], job['reader'], job['molecule-option'],
+            job['project-option'], job['output']
+            )
+        error = check_single_render(options)
+        if error is not None:
+            if not job['keep']:
+                remove_pov_files(output_file)
+            return Scene(
+                index, job, output_file, None, None, None, error,
+                time.time() - beg_time, get_config_stats()
+                )
+        pov_args = gen_pov_args(output_file, options)
+        if options['render-cache-dir'] == '':
+            cache_key = None
+        else:
+            cache_key = form_render_key(
+                pov_args, get_pov_input(output_file), options
+                )
+    except ProgramTermination as exc:
+        return Scene(
+            index, job, get_output_file(job['input'], job['output']),
+            None, None, None, exc.err_msg, time.time() - beg_time,
+            get_config_stats()
+            )
+    except Exception as exc:  # pylint: disable=broad-except
+        return Scene(
+            index, job, get_output_file(job['input'], job['output']),
+            None, None, None, '%s: %s' % (type(exc).__name__, exc),
+            time.time() - beg_time, get_config_stats()
+            )
+
+    return Scene(
+        index, job, output_file, options, pov_args, cache_key, None,
+        time.time() - beg_time, get_config_stats()
+        )
+
+
+#
+# The batch runner
+# ----------------
+#
+
+
+JobResult = collections.namedtuple('JobResult', [
+    'input_file',
+    'output_file',
+    'status',
+    'message',
+    'scene_time',
+    'render_time',
+    'n_threads',
+    'cpus',
+    ])
+
+
+Render = collections.namedtuple('Render', [
+    'scene',
+    'proc',
+    'beg_time',
+    'n_threads',
+    'cpus',
+    'log',
+    ])
+
+
+# The interval in seconds for polling the workers and pov-ray processes
+POLL_INTERVAL = 0.05
+
+# The message for the jobs skipped as up to date by the checkpoint
+UP_TO_DATE = 'up to date'
+
+
+class BatchRunner(object):
+
+    """The runner for a batch of rendering jobs
+
+    .. py:attribute:: jobs
+
+      The list of job dictionaries.
+
+    .. py:attribute:: n_workers
+
+      The number of worker processes for the scene generation.
+
+    .. py:attribute:: max_renders
+
+      The maximum number of pov-ray processes running at the same time.
+
+    .. py:attribute:: budget
+
+      The :py:class:`cpubudget.CpuBudget` for the pov-ray processes.
+
+    .. py:attribute:: pin_cpus
+
+      If the pov-ray processes are pinned to their allocated processors.
+
+    .. py:attribute:: caches
+
+      The dictionary of the render caches used by the jobs, keyed by their
+      settings.
+
+    .. py:attribute:: checkpoint
+
+      The :py:class:`checkpoint.Checkpoint` for the batch, or None.
+
+    .. py:attribute:: config_stats
+
+      The dictionary from the process IDs of the workers to the latest
+      statistics of their config caches.
+
+    .. py:attribute:: results
+
+      The list of :py:class:`JobResult` for the jobs, in the order of the
+      jobs. Jobs that are not yet finished have ``None`` for their result.
+
+    """
+
+    __slots__ = [
+        'jobs',
+        'n_workers',
+        'max_renders',
+        'budget',
+        'pin_cpus',
+        'caches',
+        'checkpoint',
+        'config_stats',
+        'results',
+        '_fingerprints',
+        '_to_submit',
+        '_n_finished',
+        '_preparing',
+        '_ready',
+        '_running',
+        ]
+
+    def __init__(self, jobs, n_workers=None, max_renders=1, n_cpus=None,
+                 pin_cpus=False, checkpoint=None):
+
+        """Initializes the runner for the given jobs
+
+        :param jobs: The list of job dictionaries
+        :param n_workers: The number of worker processes for scene generation,
+            default to the number of processors
+        :param max_renders: The maximum number of concurrent pov-ray processes
+        :param n_cpus: The number of processors for the pov-ray processes,
+            default to all the available ones
+        :param pin_cpus: If the pov-ray processes are to be pinned to their
+            allocated processors, which requires the ``taskset`` utility
+        :param checkpoint: The :py:class:`checkpoint.Checkpoint` for skipping
+            and recording the completed jobs
+
+        """
+
+        # pylint: disable=too-many-arguments
+
+        if n_workers is None:
+            n_workers = multiprocessing.cpu_count()
+        if n_workers < 1 or max_renders < 1:
+            raise ValueError(
+                'The numbers of workers and renders need to be positive'
+                )
+
+        self.jobs = jobs
+        self.n_workers = n_workers
+        self.max_renders = max_renders
+        self.budget = CpuBudget(n_cpus)
+        self.pin_cpus = pin_cpus and get_taskset() is not None
+        self.caches = {}
+        self.checkpoint = checkpoint
+        self.config_stats = {}
+        self.results = [None for _ in jobs]
+
+        self._fingerprints = [None for _ in jobs]
+        self._to_submit = collections.deque(xrange(0, len(jobs)))
+        self._n_finished = 0
+        self._preparing = collections.deque()
+        self._ready = collections.deque()
+        self._running = []
+
+    def describe_budget(self):
+
+        """Describes the budget of processors for the report"""
+
+        if self.pin_cpus:
+            pinning = 'pinned'
+        else:
+            pinning = 'not pinned'
+
+        return (
+            'Rendering %d jobs on %d processors (%s, %s), '
+            'at most %d concurrent renders'
+            ) % (
+                len(self.jobs), len(self.budget.cpus),
+                format_cpu_list(self.budget.cpus), pinning, self.max_renders
+                )
+
+    def run(self):
+
+        """Runs all the jobs
+
+        :returns: The list of the results of the jobs
+
+        """
+
+        self._skip_done()
+
+        pool = multiprocessing.Pool(self.n_workers, init_worker)
+
+        try:
+            while self._n_finished < len(self.jobs):
+                self._submit_scenes(pool)
+                self._collect_scenes()
+                self._start_renders()
+                self._poll_renders()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            pool.terminate()
+            pool.join()
+            for render in self._running:
+                if render.proc.poll() is None:
+                    render.proc.kill()
+            for cache in self.caches.itervalues():
+                cache.save_stats()
+
+        return self.results
+
+    def _skip_done(self):
+
+        """Finishes the jobs that are up to date according to the checkpoint
+
+        The fingerprints of all the jobs are computed for the checkpoint.
+
+        """
+
+        if self.checkpoint is None:
+            return None
+
+        to_submit = collections.deque()
+        for idx in self._to_submit:
+            job = self.jobs[idx]
+            fingerprint = get_fingerprint(job)
+            self._fingerprints[idx] = fingerprint
+            if self.checkpoint.is_done(job, fingerprint):
+                self._finish(Scene(
+                    idx, job, get_output_file(job['input'], job['output']),
+                    None, None, None, None, 0.0, None
+                    ), 'ok', UP_TO_DATE)
+            else:
+                to_submit.append(idx)
+
+        self._to_submit = to_submit
+
+        return None
+
+    def _get_cache(self, scene):
+
+        """Gets the render cache for a scene, None when it is not enabled"""
+
+        if scene.cache_key is None:
+            return None
+
+        settings = tuple(
+            scene.options[i] for i in [
+                'render-cache-dir', 'render-cache-size', 'render-cache-link'
+                ]
+            )
+        if settings not in self.caches:
+            self.caches[settings] = get_cache(scene.options)
+
+        return self.caches[settings]
+
+    def _submit_scenes(self, pool):
+
+        """Submits jobs to the workers for scene generation
+
+        Only a bounded number of scenes are prepared ahead of the rendering,
+        so that the scenes waiting for rendering do not pile up.
+
+        """
+
+        max_ahead = self.n_workers + self.max_renders
+
+        while (len(self._to_submit) > 0 and
+               len(self._preparing) + len(self._ready) < max_ahead):
+            idx = self._to_submit.popleft()
+            self._preparing.append(pool.apply_async(
+                prepare_scene, (idx, self.jobs[idx])
+                ))
+
+        return None
+
+    def _collect_scenes(self):
+
+        """Collects the scenes that have been generated by the workers"""
+
+        pending = collections.deque()
+        for async_res in self._preparing:
+            if not async_res.ready():
+                pending.append(async_res)
+                continue
+
+            scene = async_res.get()
+            pid, config_stats = scene.config_stats
+            self.config_stats[pid] = config_stats
+            if scene.error is None:
+                self._ready.append(scene)
+            else:
+                self._finish(scene, 'failed', scene.error)
+
+        self._preparing = pending
+
+        return None
+
+    def _start_renders(self):
+
+        """Starts pov-ray for the ready scenes up to the allowed number
+
+        A render is only started when there are free processors. The number of
+        renders sharing the free processors is the number of free render slots,
+        limited by the number of jobs still to be rendered.
+
+        """
+
+        while (len(self._ready) > 0 and
+               len(self._running) < self.max_renders and
+               len(self.budget.free) > 0):
+            scene = self._ready.popleft()
+
+            try:
+                cache = self._get_cache(scene)
+            except (OSError, ValueError) as err:
+                self._finish(scene, 'failed', 'Invalid render cache: %s' % err)
+                continue
+            if cache is not None and cache.fetch(
+                    scene.cache_key, scene.output_file
+            ):
+                if not scene.job['keep']:
+                    remove_pov_files(scene.output_file)
+                self._record(scene)
+                self._finish(scene, 'ok', 'cached')
+                continue
+            try:
+                remove_output(scene.output_file)
+            except OSError as err:
+                self._finish(
+                    scene, 'failed',
+                    'Cannot remove the old output file: %s' % err
+                    )
+                continue
+
+            n_slots = min(
+                self.max_renders - len(self._running),
+                len(self._ready) + len(self._preparing) +
+                len(self._to_submit) + 1
+                )
+            n_threads = decide_threads(
+                len(self.budget.free), n_slots,
+                count_blocks(
+                    scene.options['graph-width'],
+                    get_graph_height(scene.options)
+                    ),
+                scene.options['work-threads']
+                )
+            cpus = self.budget.allocate(n_threads)
+
+            pov_args = scene.pov_args + ['+WT%d' % n_threads]
+            if self.pin_cpus:
+                pov_args = gen_affinity_prefix(cpus) + pov_args
+
+            # The output is captured in a temporary file for the statistics
+            log = None
+            if scene.options['render-stats']:
+                log = tempfile.TemporaryFile()
+                out_file = log
+            elif scene.options['suppress-povray-out']:
+                out_file = open(os.devnull, 'w')
+            else:
+                out_file = None
+
+            try:
+                proc = subprocess.Popen(
+                    pov_args, stdout=out_file, stderr=subprocess.STDOUT
+                    )
+            except OSError:
+                self.budget.release(cpus)
+                if log is not None:
+                    log.close()
+                self._finish(scene, 'failed', 'Pov-ray cannot be invoked!')
+                continue
+            finally:
+                if out_file is not None and out_file is not log:
+                    out_file.close()
+
+            self._running.append(
+                Render(scene, proc, time.time(), n_threads, cpus, log)
+                )
+
+        return None
+
+    def _poll_renders(self):
+
+        """Checks the running pov-ray processes for finished ones"""
+
+        running = []
+        for render in self._running:
+            ret_code = render.proc.poll()
+            if ret_code is None:
+                running.append(render)
+                continue
+
+            scene = render.scene
+            self.budget.release(render.cpus)
+            if render.log is not None:
+                self._write_stats(render)
+            if ret_code == 0:
+                self._store_image(scene)
+                self._record(scene)
+                if not scene.job['keep']:
+                    remove_pov_files(scene.output_file)
+                self._finish(scene, 'ok', '', render)
+            else:
+                self._finish(
+                    scene, 'failed',
+                    'Pov-ray returned with error code %d' % ret_code, render
+                    )
+
+        self._running = running
+
+        return None
+
+    def _write_stats(self, render):
+
+        """Writes the statistics of a finished render from its output"""
+
+        render.log.seek(0)
+        output = render.log.read().decode('utf-8', 'replace')
+        render.log.close()
+
+        finish_stats(
+            render.scene.output_file, render.scene.options,
+            parse_stats(output), time.time() - render.beg_time,
+            render.n_threads
+            )
+
+        return None
+
+    def _store_image(self, scene):
+
+        """Stores the rendered image of a scene into the render cache"""
+
+        cache = self._get_cache(scene)
+        if cache is None:
+            return None
+
+        try:
+            cache.store(scene.cache_key, scene.output_file)
+        except (IOError, OSError) as err:
+            print('Image not stored into the render cache: %s' % err)
+
+        return None
+
+    def _record(self, scene):
+
+        """Records the completed job of a scene into the checkpoint"""
+
+        if self.checkpoint is None:
+            return None
+
+        try:
+            self.checkpoint.record(
+                scene.job, self._fingerprints[scene.index]
+                )
+        except (IOError, OSError) as err:
+            print('Job not recorded into the checkpoint: %s' % err)
+
+        return None
+
+    def _finish(self, scene, status, message, render=None):
+
+        """Records and reports the result of a finished job
+
+        The message is joined into a single line for the report. The render
+        should be given for jobs finished after pov-ray is invoked.
+
+        """
+
+        if render is None:
+            render_time = None
+            n_threads = None
+            cpus = None
+        else:
+            render_time = time.time() - render.beg_time
+            n_threads = render.n_threads
+            cpus = format_cpu_list(render.cpus) if self.pin_cpus else None
+
+        result = JobResult(
+            scene.job['input'], scene.output_file, status,
+            ' '.join(message.split()), scene.time, render_time,
+            n_threads, cpus
+            )
+        self.results[scene.index] = result
+        self._n_finished += 1
+
+        print(format_result(result, self._n_finished, len(self.jobs)))
+
+        return None
+
+
+#
+# Reporting
+# ---------
+#
+
+
+def format_result(result, serial, n_jobs):
+
+    """Formats the result of a job into a line for the report
+
+    :param result: The :py:class:`JobResult` of the job
+    :param serial: The serial number of the job in the order of finishing
+    :param n_jobs: The total number of jobs
+
+    """
+
+    width = len(str(n_jobs))
+    head = '[%*d/%d] %-6s %s' % (
+        width, serial, n_jobs, result.status, result.input_file
+        )
+
+    if result.status == 'ok' and result.render_time is None:
+        return '%s -> %s (scene %.2f s, %s)' % (
+            head, result.output_file, result.scene_time, result.message
+            )
+    elif result.status == 'ok':
+        if result.cpus is None:
+            alloc = '%d threads' % result.n_threads
+        else:
+            alloc = '%d threads on processors %s' % (
+                result.n_threads, result.cpus
+                )
+        return '%s -> %s (scene %.2f s, render %.2f s, %s)' % (
+            head, result.output_file, result.scene_time, result.render_time,
+            alloc
+            )
+    else:
+        return '%s: %s' % (head, result.message)
+
+
+def format_summary(results, wall_time, caches=(), config_stats=()):
+
+    """Formats the summary of the results of a batch
+
+    :param results: The list of the results of the jobs
+    :param wall_time: The total wall time of the batch in seconds
+    :param caches: The render caches used by the batch
+    :param config_stats: The statistics of the config caches of the workers
+    :returns: The summary as a string with multiple lines
+
+    """
+
+    failed = [i for i in results if i.status != 'ok']
+    n_skipped = len([i for i in results if i.message == UP_TO_DATE])
+    scene_time = sum(i.scene_time for i in results)
+    render_time = sum(
+        i.render_time for i in results if i.render_time is not None
+        )
+
+    lines = [
+        '',
+        'Batch summary',
+        '-------------',
+        '%d jobs, %d succeeded, %d failed, in %.2f s wall time' % (
+            len(results), len(results) - len(failed), len(failed), wall_time
+            ),
+        'Total scene generation time %.2f s, total render time %.2f s' % (
+            scene_time, render_time
+            ),
+        ]
+
+    if n_skipped > 0:
+        lines.append('%d jobs skipped as up to date' % n_skipped)
+
+    if len(config_stats) > 0:
+        lines.append(format_stats(list(config_stats)))
+    lines.extend(i.format_stats() for i in caches)
+
+    if len(failed) > 0:
+        lines.append('Failed jobs:')
+        lines.extend(
+            '    %s: %s' % (i.input_file, i.message) for i in failed
+            )
+
+    return '\n'.join(lines)
+
+
+def run_batch(jobs, n_workers=None, max_renders=1, n_cpus=None,
+              pin_cpus=False, checkpoint_file=None):
+
+    """Runs a batch of jobs and prints the summary
+
+    :param jobs: The list of job dictionaries
+    :param n_workers: The number of worker processes for scene generation
+    :param max_renders: The maximum number of concurrent pov-ray processes
+    :param n_cpus: The number of processors for the pov-ray processes
+    :param pin_cpus: If the pov-ray processes are pinned to their processors
+    :param checkpoint_file: The name of the checkpoint file, None for no
+        checkpoint
+    :returns: The list of the results of the jobs
+    :raises IOError: if the checkpoint file cannot be read
+
+    """
+
+    # pylint: disable=too-many-arguments
+
+    beg_time = time.time()
+    if checkpoint_file is None:
+        checkpoint = None
+    else:
+        checkpoint = Checkpoint(checkpoint_file)
+    runner = BatchRunner(
+        jobs, n_workers, max_renders, n_cpus, pin_cpus, checkpoint
+        )
+    print(runner.describe_budget())
+    results = runner.run()
+    print(format_summary(
+        results, time.time() - beg_time, runner.caches.values(),
+        runner.config_stats.values()
+        ))
+
+    return results
@@ -34,7 +34,34 @@ from numpy import linalg
 #
 
 
-def compute_mov_dir(atms, camera, bond):
+def get_bond_ends(atms, bond, latt_vecs=()):
+
+    """Gets the coordinates of the two ends of a bond
+
+    For bonds across the boundary of the cell, which has the periodic image of
+    the second atom given in the fourth field, the second end is translated
+    to the image by the lattice vectors.
+
+    :param atms: The list of atoms
+    :param bond: The bond tuple
+    :param latt_vecs: The lattice vectors of the structure
+    :returns: The pair of numpy arrays for the coordinates of the ends
+
+    """
+
+    beg = atms[bond[0]].coord
+    end = atms[bond[1]].coord
+
+    if len(bond) > 3 and any(bond[3]):
+        end = end + np.dot(
+            np.array(bond[3], dtype=np.float64),
+            np.array(latt_vecs, dtype=np.float64)[0:len(bond[3])]
+            )
+
+    return beg, end
+
+
+def compute_mov_dir(atms, camera, bond, latt_vecs=()):
 
     """Computes the movement direction for a given bond
 
@@ -46,13 +73,13 @@ def compute_mov_dir(atms, camera, bond):
     :param atms: The list of atoms
     :param camera: The numpy array for the location of the camera
     :param bond: A bond triple for the bond to be processed
+    :param latt_vecs: The lattice vectors for bonds across the cell boundary
     :returns: A normalized numpy array giving the direction to translate the
         bonds in the multiple bonds
 
     """
 
-    atm1c = atms[bond[0]].coord
-    atm2c = atms[bond[1]].coord
+    atm1c, atm2c = get_bond_ends(atms, bond, latt_vecs)
 
     bond_centre = (atm1c + atm2c) / 2.0
     bond_direction = atm2c - atm1c
@@ -95,7 +122,7 @@ def compute_mov_amts(separation, n_bonds):
     return amts
 
 
-def resolve_multiple_bond(atms, camera, separation, bond):
+def resolve_multiple_bond(atms, camera, separation, bond, latt_vecs=()):
 
     """Resolves a multiple bond into several cylinder beginning and end points
 
@@ -105,7 +132,8 @@ def resolve_multiple_bond(atms, camera, separation, bond):
 
     """
 
-    move_dir = compute_mov_dir(atms, camera, bond)
+    move_dir = compute_mov_dir(atms, camera, bond, latt_vecs)
+    atm1c, atm2c = get_bond_ends(atms, bond, latt_vecs)
 
     n_bonds = int(math.ceil(bond[2]))
     if_partial = (n_bonds - bond[2]) > 0.1
@@ -113,8 +141,8 @@ def resolve_multiple_bond(atms, camera, separation, bond):
 
     res = []
     for i, amt in enumerate(move_amts):
-        beg = atms[bond[0]].coord + amt * move_dir
-        end = atms[bond[1]].coord + amt * move_dir
+        beg = atm1c + amt * move_dir
+        end = atm2c + amt * move_dir
         res.append((beg, end,
                     if_partial if i == len(move_amts) - 1 else False))
 
@@ -193,7 +221,8 @@ BondCylinder = collections.namedtuple(
     )
 
 
-def bonds2cylinders(bonds, atms, camera, separation, dash_size):
+def bonds2cylinders(bonds, atms, camera, separation, dash_size,
+                    latt_vecs=()):
 
     """Convert bonds to a list of bond cylinders
 
@@ -205,15 +234,19 @@ def bonds2cylinders(bonds, atms, camera, separation, dash_size):
     :param atms: A list of atoms
     :param separation: The separation between multiple bonds
     :param dash_size: The size of each dash for partial bonds
+    :param latt_vecs: The lattice vectors, for drawing the bonds across the
+        cell boundary to the periodic image of the second atom
     :returns: A list of BondCylinder instances
 
     """
 
+    # pylint: disable=too-many-arguments
+
     cylinders = []
 
     for bond_i in bonds:
         resolved_bonds = resolve_multiple_bond(
-            atms, camera, separation, bond_i
+            atms, camera, separation, bond_i, latt_vecs
             )
 
         for sn_i, res_bond_i in enumerate(resolved_bonds):
@@ -233,3 +266,174 @@ def bonds2cylinders(bonds, atms, camera, separation, dash_size):
                 )
 
     return cylinders
+
+
+#
+# Batched resolution of the bonds
+# -------------------------------
+#
+# For large structures, resolving the bonds one by one into namedtuples is
+# slow, especially for the partial bonds where each dash is formed in a Python
+# loop. So here an engine is given that resolves all the bonds at once by
+# numpy. The result holds the same information as a list of
+# :py:class:`BondCylinder`, but in the struct-of-arrays form, with each field
+# holding an array over all the cylinders, in the same order as the cylinders
+# returned by :py:func:`bonds2cylinders`.
+#
+
+
+BondCylinders = collections.namedtuple(
+    'BondCylinders',
+    [
+        'beg_coords',
+        'end_coords',
+        'beg_atms',
+        'end_atms',
+        'bond_sns',
+        'total_orders',
+        'if_partial'
+    ]
+    )
+
+
+def _unpack_bonds(bonds, n_latt):
+
+    """Unpacks a list of bonds into arrays
+
+    :returns: The arrays for the first and second atom, the order and the
+        periodic image of the second atom.
+
+    """
+
+    n_bonds = len(bonds)
+    idx1 = np.empty(n_bonds, dtype=np.int64)
+    idx2 = np.empty(n_bonds, dtype=np.int64)
+    orders = np.empty(n_bonds, dtype=np.float64)
+    images = np.zeros((n_bonds, n_latt), dtype=np.float64)
+
+    for i, bond in enumerate(bonds):
+        idx1[i] = bond[0]
+        idx2[i] = bond[1]
+        orders[i] = bond[2]
+        if len(bond) > 3 and len(bond[3]) > 0:
+            images[i, 0:len(bond[3])] = bond[3]
+
+    return idx1, idx2, orders, images
+
+
+def _compute_mov_amts_batch(separation, n_bonds, sns):
+
+    """Computes the movement for the cylinders of multiple bonds
+
+    This gives the same result as :py:func:`compute_mov_amts` for each of the
+    cylinders.
+
+    :param separation: The separation between the multiple bonds
+    :param n_bonds: The array of the number of cylinders of the bond that each
+        cylinder belongs to
+    :param sns: The serial numbers of the cylinders within their bond
+
+    """
+
+    odd = n_bonds % 2 == 1
+    # For odd number of bonds, the first one is in the middle and the rest are
+    # paired from the separation; for even ones, all are paired from half of
+    # the separation.
+    paired_sns = np.where(odd, sns - 1, sns)
+    sign = np.where(paired_sns % 2 == 0, 1.0, -1.0)
+    amts = sign * separation * (
+        paired_sns // 2 + np.where(odd, 1.0, 0.5)
+        )
+
+    return np.where(odd & (sns == 0), 0.0, amts)
+
+
+def bonds2cylinder_arrays(bonds, coords, camera, separation, dash_size,
+                          latt_vecs=()):
+
+    """Converts bonds to bond cylinders in arrays
+
+    This is the batched counterpart of :py:func:`bonds2cylinders`. The
+    displacement directions, the multiple-bond offsets and the dashes for the
+    partial bonds are computed for all the bonds at once.
+
+    :param bonds: A list of bonds, as the triple
+    :param coords: The (N, 3) array of the coordinates of the atoms
+    :param camera: The numpy array for the location of the camera
+    :param separation: The separation between multiple bonds
+    :param dash_size: The size of each dash for partial bonds
+    :param latt_vecs: The lattice vectors, for drawing the bonds across the
+        cell boundary to the periodic image of the second atom
+    :returns: A :py:class:`BondCylinders` instance
+
+    """
+
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-locals
+
+    latt = np.array(latt_vecs, dtype=np.float64).reshape((-1, 3))
+    idx1, idx2, orders, images = _unpack_bonds(bonds, latt.shape[0])
+
+    atm1c = coords[idx1]
+    atm2c = coords[idx2] + np.dot(images, latt)
+
+    # The movement directions, the same as in compute_mov_dir
+    cross_prod = np.cross(
+        atm2c - atm1c, (atm1c + atm2c) / 2.0 - camera
+        )
+    move_dirs = cross_prod / np.sqrt(
+        np.einsum('ij,ij->i', cross_prod, cross_prod)
+        )[:, np.newaxis]
+
+    # Resolve the multiple bonds
+    n_bonds = np.ceil(orders).astype(np.int64)
+    partial_bonds = (n_bonds - orders) > 0.1
+    owners = np.repeat(np.arange(len(n_bonds)), n_bonds)
+    sns = np.arange(len(owners)) - (np.cumsum(n_bonds) - n_bonds)[owners]
+    amts = _compute_mov_amts_batch(separation, n_bonds[owners], sns)
+    if_partial = partial_bonds[owners] & (sns == n_bonds[owners] - 1)
+
+    moves = amts[:, np.newaxis] * move_dirs[owners]
+    begs = atm1c[owners] + moves
+    ends = atm2c[owners] + moves
+
+    # Break the partial bonds into dashes, the same as in to_partial. With the
+    # number of full steps fitting in the bond, the dashes are at the even
+    # steps, with the last one ending at the end of the bond.
+    vecs = ends - begs
+    lengths = np.sqrt(np.einsum('ij,ij->i', vecs, vecs))
+    n_steps = np.maximum(np.ceil(lengths / dash_size) - 1, 0).astype(np.int64)
+    n_pieces = np.where(if_partial, n_steps // 2 + 1, 1)
+
+    cyl_owners = np.repeat(np.arange(len(n_pieces)), n_pieces)
+    pieces = np.arange(len(cyl_owners)) - (
+        np.cumsum(n_pieces) - n_pieces
+        )[cyl_owners]
+    cyl_lengths = lengths[cyl_owners]
+    dash_beg = np.where(
+        if_partial[cyl_owners], 2 * pieces * dash_size, 0.0
+        )
+    dash_end = np.where(
+        if_partial[cyl_owners],
+        np.minimum((2 * pieces + 1) * dash_size, cyl_lengths),
+        cyl_lengths
+        )
+    units = vecs[cyl_owners] / cyl_lengths[:, np.newaxis]
+
+    cyl_begs = begs[cyl_owners] + dash_beg[:, np.newaxis] * units
+    cyl_ends = np.where(
+        (dash_end < cyl_lengths)[:, np.newaxis],
+        begs[cyl_owners] + dash_end[:, np.newaxis] * units,
+        ends[cyl_owners]
+        )
+
+    bond_owners = owners[cyl_owners]
+    return BondCylinders(
+        beg_coords=cyl_begs,
+        end_coords=cyl_ends,
+        beg_atms=idx1[bond_owners],
+        end_atms=idx2[bond_owners],
+        bond_sns=sns[cyl_owners],
+        total_orders=orders[bond_owners],
+        if_partial=if_partial[cyl_owners]
+        )
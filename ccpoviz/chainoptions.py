@@ -157,6 +157,22 @@ prototype, prototype-key
     changed in the actual implementation, as can the separator for the meta-
     options.
 
+Since the meta-options cannot be changed by later configurations, they are
+resolved from the default only once, by compiling the default into a schema
+holding the types, update methods, coercion flags, and prototypes of all the
+nodes. For chaining many configurations onto the same default, like in batch
+runs, the compiled schema can be reused, so that each chaining is just a walk
+over the precomputed schema.
+
+The results of the chaining are frozen, with the maps and lists being the
+immutable :py:class:`FrozenMap` and :py:class:`FrozenList`. So rather than
+copying the nodes that are not changed, the results of the chaining share them
+with the default and with each other, and derived options can be formed by
+:py:meth:`FrozenMap.derive` sharing all the unchanged nodes with their parents.
+This saves the memory and the copying when many options are alive at the same
+time, and the consumers of the options can read them without any defensive
+copy.
+
 .. _JSON scheme: http://json-schema.org
 
 """
@@ -282,226 +298,326 @@ def _report_type_error(tag, default):
 
 
 #
-# The main class
+# Frozen options
 # --------------
 #
+# Since the nodes of frozen options cannot be changed, they can be shared by
+# any number of options trees. So both shallow and deep copies of them just
+# give the same nodes, and the nodes not touched by an update are shared by the
+# updated tree and the existing one.
+#
 
 
-class ChainOptions(object):
+def _refuse_change(self, *args, **kwargs):
 
-    """Option settings chainer
+    """Refuses any change to a frozen node"""
 
-    This is an implementation of the options chainer described in this module.
-    The implementation emphasizes flexibility is its usage. Basically all the
-    default values for the meta-options can be set in the initializer and
-    stored as attributes. Then the :py:meth:`chain_options` method can be
-    invoked to do the actual job of chaining the options together.
+    # pylint: disable=unused-argument
 
-    .. py:attribute:: separator
+    raise TypeError(
+        '%s in the options is frozen' % type(self).__name__
+        )
 
-        The separator of the option tag with the meta-option tag. Default to
-        ``...``.
 
-    .. py:attribute:: proto_tag
+class FrozenMap(dict):
 
-       The tag for the prototype of nodes to be extended. Default to
-       ``prototype``.
+    """An immutable map in the options tree
 
-    .. py:attribute:: default_list_update, default_map_update
+    It can be read as a normal dictionary, but all the methods changing its
+    entries raise :py:exc:`TypeError`. A mutable copy can be made by the
+    ``dict`` constructor, or a new frozen map with some of the entries changed
+    can be derived by :py:meth:`derive`. The values in it should be frozen as
+    well, as given by :py:func:`freeze`.
 
-        The default update method for lists and maps, currently defaults to
-        ``overwrite`` for both of them for compatibility with the standard
-        library ``ChainMap`` class.
+    """
 
-    .. py:attribute:: default_coercion
+    __slots__ = []
 
-        The default value of if the type coercion is going to be performed for
-        atomic input with different types. Defaults to false.
+    __setitem__ = _refuse_change
+    __delitem__ = _refuse_change
+    clear = _refuse_change
+    pop = _refuse_change
+    popitem = _refuse_change
+    setdefault = _refuse_change
+    update = _refuse_change
 
-    """
+    def __copy__(self):
 
-    __slots__ = [
-        'separator',
-        'proto_tag',
-        'default_list_update',
-        'default_map_update',
-        'default_coercion',
-        ]
+        """Returns the map itself, which cannot be changed"""
 
-    def __init__(self, separator='...', proto_tag='prototype',
-                 default_list_update='overwrite',
-                 default_map_update='overwrite', default_coercion=False):
-        # pylint: disable=too-many-arguments
+        return self
 
-        """Initializes the options chainer according to the default values"""
+    def __deepcopy__(self, memo):
 
-        self.separator = separator
-        self.proto_tag = proto_tag
-        self.default_list_update = default_list_update
-        self.default_map_update = default_map_update
-        self.default_coercion = default_coercion
+        """Returns the map itself, whose values are frozen as well"""
 
-    def _get_proto(self, tag, context, existing):
+        return self
 
-        """Try to get the prototype for the node with tag
+    def __reduce__(self):
 
-        This is useful for adding new entries to list or maps. If no prototype
-        or prototype update method is found in the context, the default value
-        for the entries in the existing node will be used.
+        """Pickles the map by its entries"""
 
-        Getting the prototype is generally straightforward to understand. For
-        the virtual context, it is needed whenever a new node is added to the
-        options tree. Generally, meta-options for each option node should be a
-        sibling to the actual option node. But for new nodes added based on a
-        prototype, the location of the new node added and the prototype is
-        actually different, with the prototype one level higher. To make the
-        settings consist towards users, the meta-options for the prototypes
-        are put as siblings to the prototypes by using essentially the same
-        format in the key as the normal nodes. In addition, for nodes in a
-        list, since the list cannot have a special entry to hold the meta-
-        options for the actual nodes, we have to put it one-level (or levels
-        for nested-list) higher into the dictionary holding the list. From
-        this discrepancy of the location of the prototype and the actual
-        location of nodes that is added based on it, we need to pass the meta-
-        options for the prototype downwards somehow. In this implementation,
-        the meta-settings of the prototype is found and bundled into a special
-        context called virtual context.
+        return (FrozenMap, (dict(self), ))
 
-        :param tag: The tag for the node within the context
-        :param context: The context (dictionary) in which the node is
-        :param existing: The existing node
-        :returns: A pair, with the first component being the prototype of the
-            node. The second component is a dictionary able to serve as the
-            virtual context to update the prototype.
-        :raises DefaultError: if something goes wrong, like the key cannot be
-            found in the existing node.
+    def derive(self, changes):
+
+        """Derives a new frozen map with some entries changed
+
+        :param changes: The dictionary of the entries to set, whose values
+            should be frozen
+        :returns: The new frozen map, sharing all the other entries with this
+            map, or this map itself when there is no change
 
         """
 
-        # pylint: disable=too-many-branches
+        if len(changes) == 0:
+            return self
 
-        # Try to get the basis for the list elements
-        proto = None  # prototype or basis
-        existing_type = _find_type(existing, tag=tag, user=False)
+        derived = FrozenMap(self)
+        dict.update(derived, changes)
+        return derived
 
-        # Try to get the meta-settings from an explicitly-given prototype or
-        # key
-        for i in [self.proto_tag, self.proto_tag + '-key']:
 
-            meta_tag = tag + self.separator + i
-            # raise exception if more than one meta-setting is given
-            if meta_tag in context and proto is not None:
-                raise DefaultError(
-                    'Meta-setting %s duplicates with others' % meta_tag
-                    )
+class FrozenList(list):
+
+    """An immutable list in the options tree
+
+    It can be read as a normal list, but all the methods changing its
+    entries raise :py:exc:`TypeError`. Concatenations with other lists give
+    normal mutable lists.
+
+    """
+
+    __slots__ = []
+
+    __setitem__ = _refuse_change
+    __delitem__ = _refuse_change
+    __setslice__ = _refuse_change
+    __delslice__ = _refuse_change
+    __iadd__ = _refuse_change
+    __imul__ = _refuse_change
+    append = _refuse_change
+    extend = _refuse_change
+    insert = _refuse_change
+    pop = _refuse_change
+    remove = _refuse_change
+    reverse = _refuse_change
+    sort = _refuse_change
+
+    def __copy__(self):
+
+        """Returns the list itself, which cannot be changed"""
+
+        return self
+
+    def __deepcopy__(self, memo):
+
+        """Returns the list itself, whose entries are frozen as well"""
+
+        return self
+
+    def __reduce__(self):
+
+        """Pickles the list by its entries"""
+
+        return (FrozenList, (list(self), ))
+
+
+def freeze(node):
+
+    """Freezes an options tree
+
+    :param node: The node of the options tree
+    :returns: The frozen node, which is the node itself when it is already
+        frozen or it is an atom
 
-            if meta_tag in context:
-                raw_value = context[meta_tag]
-
-                # if it is a key, get the actual one from the existing
-                if i.endswith('-key'):
-                    try:
-                        if existing_type == _MAP:
-                            proto = existing[raw_value]
-                        elif existing_type == _LIST:
-                            if type(raw_value) != int:
-                                raise IndexError()
-                            else:
-                                proto = existing[raw_value]
-                        elif existing_type in _ATOMS:
-                            # raise error for atomic nodes that cannot be
-                            # indexed
-                            raise IndexError()
-                        else:
-                            assert 0
-                    except IndexError:
-                        raise DefaultError(
-                            'The prototype key %s '
-                            'cannot be found for %s' % (raw_value, tag)
-                            )
-                # When the prototype is given explicitly
-                else:
-                    proto = raw_value
-
-            # Continue to the next loop no matter what.
-            # To have a check if others has also been set
-            continue
-
-        # Try to get a prototype from the existing ones when none of the meta-
-        # settings are given.
-        if proto is None:
+    """
+
+    if isinstance(node, (FrozenMap, FrozenList)):
+        return node
+    elif isinstance(node, dict):
+        return FrozenMap((k, freeze(v)) for k, v in node.iteritems())
+    elif isinstance(node, list):
+        return FrozenList(freeze(i) for i in node)
+    else:
+        return node
+
+
+#
+# The compiled schema
+# -------------------
+#
+# Resolving the meta-options of a node requires the searching of its siblings
+# for the specially-named tags and the formation of the virtual contexts for
+# the prototypes, which is the same for every update, since the meta-options
+# cannot be changed by the user input. So the meta-options are resolved only
+# once when the default is compiled into a schema, and the later updates just
+# walk over the precomputed nodes of the schema.
+#
+
+
+# The acceptable update methods for lists
+_LIST_UPDATES = ('overwrite', 'prepend', 'append', 'unique')
+
+
+class _NodeSchema(object):
+
+    """The resolved meta-options for a node in the options tree
+
+    .. py:attribute:: kind
+
+      The type of the node, one of the module constants.
+
+    .. py:attribute:: update
+
+      The update method for lists and maps.
+
+    .. py:attribute:: coercion
+
+      If the type coercion is to be attempted for atoms.
+
+    .. py:attribute:: proto, proto_key
+
+      The explicitly given prototype, or the key for getting the prototype
+      from the existing node. When neither of them is given, the first entry
+      of the existing node is used as the prototype.
+
+    .. py:attribute:: proto_schema
+
+      The schema for the nodes updated from the prototype, None when the
+      prototype cannot be found in the default, with the error kept in
+      ``proto_error`` to be raised when the node is extended.
+
+    .. py:attribute:: children, meta
+
+      For maps, the dictionary of the schemas of the entries, and the
+      meta-options in the map grouped by the tags of the options.
+
+    """
+
+    __slots__ = [
+        'kind',
+        'update',
+        'coercion',
+        'proto',
+        'proto_key',
+        'proto_schema',
+        'proto_error',
+        'children',
+        'meta',
+        ]
+
+    def __init__(self, kind):
+
+        """Initializes the node schema for the given type of nodes"""
+
+        self.kind = kind
+        self.update = None
+        self.coercion = False
+        self.proto = None
+        self.proto_key = None
+        self.proto_schema = None
+        self.proto_error = None
+        self.children = None
+        self.meta = None
+
+    def get_proto(self, existing, tag):
+
+        """Gets the prototype for extending the existing node
+
+        :param existing: The existing node
+        :param tag: The tag of the node within its context
+        :raises DefaultError: if the prototype cannot be found
+
+        """
+
+        if self.proto_key is not None:
             try:
-                if existing_type == _LIST:
-                    proto = existing[0]
-                elif existing_type == _MAP:
-                    proto = next(existing.itervalues())
-            except (IndexError, StopIteration):
+                if self.kind == _LIST and not isinstance(self.proto_key, int):
+                    raise IndexError()
+                return existing[self.proto_key]
+            except (IndexError, KeyError):
                 raise DefaultError(
-                    'No prototype/basis given for empty list/map %s' % tag
+                    'The prototype key %s '
+                    'cannot be found for %s' % (self.proto_key, tag)
                     )
+        elif self.proto is not None:
+            return self.proto
 
-        # Try to get the virtual context for the prototype
-        virt_prefix = tag + self.separator + self.proto_tag + self.separator
-        virt_context = {
-            k[len(tag + self.separator):]: v
-            for k, v in context.iteritems()
-            if k.startswith(virt_prefix)
-            }
+        try:
+            if self.kind == _LIST:
+                return existing[0]
+            else:
+                return next(existing.itervalues())
+        except (IndexError, StopIteration):
+            raise DefaultError(
+                'No prototype/basis given for empty list/map %s' % tag
+                )
 
-        return (proto, virt_context)
 
-    def remove_proto(self, tag):
+class OptionSchema(object):
 
-        """Removes the prototype tags from the tag path
+    """The compiled schema of a default options tree
 
-        When adding a new node to the option tree and thus updating from the
-        prototype, a dummy layer with the prototype tag is added to the tags
-        path to be able to get the meta-options from the virtual context. This
-        extra-layer might cause some confusion on the user when the error
-        message is tried to be deciphered. So this function is added to be able
-        to remove the technical layers for cleaner error position directly
-        corresponding to the user input, if the pretty formatter chooses to not
-        to print the special tags.
+    The schema is compiled from the default by :py:meth:`ChainOptions.compile`
+    and can be reused for chaining any number of options onto the default.
 
-        """
+    .. py:attribute:: chainer
 
-        return tuple(i for i in tag if i != self.proto_tag)
+      The :py:class:`ChainOptions` that the schema is compiled by.
+
+    .. py:attribute:: root
+
+      The schema for the root node.
+
+    .. py:attribute:: default
+
+      The frozen default that the schema is compiled from, which can be used
+      as the last argument of :py:meth:`chain_options` without any copying.
+
+    """
+
+    __slots__ = [
+        'chainer',
+        'root',
+        'default',
+        ]
+
+    def __init__(self, chainer, root, default):
+
+        """Initializes the schema with the compiled root node"""
+
+        self.chainer = chainer
+        self.root = root
+        self.default = default
 
     #
     # ### Node update methods ###
     #
-    # The methods to update a node based on a new code. All the functions have
-    # a common signature of ``existing``, ``new``, ``tag``, ``context``. The
-    # ``existing`` is the old node to update. And ``new`` is the new value.
-    # ``tag`` is the tuple giving the location of the **new** node is the new
-    # option configuration. And ``context`` is the dictionary for finding the
-    # meta-options. Usually it is the parent of the existing node in the old
-    # configuration tree, or a virtual context for the prototype. The last
-    # element of the tag is always used for finding the meta-options in the
-    # context.
+    # The methods to update a node based on a new node. All the methods have
+    # a common signature of ``schema``, ``existing``, ``new``, ``tag``. The
+    # ``schema`` is the compiled schema of the existing node, which is the old
+    # frozen node to update, and ``new`` is the new value. ``tag`` is the tuple
+    # giving the location of the **new** node in the new option configuration.
+    # The updated nodes are frozen as well.
     #
 
-    def _update_atom(self, existing, new, tag, context):
+    def _update_atom(self, schema, existing, new, tag):
 
         """Updates an atom node"""
 
         new_type = _find_type(new, tag=tag, user=True)
-        existing_type = _find_type(existing, tag=tag, user=False)
-        coercion = context.get(
-            tag[-1] + self.separator + 'coercion',
-            self.default_coercion
-            )
         try:
-            if new_type == existing_type:
+            if new_type == schema.kind:
                 return new
-            elif coercion:
+            elif schema.coercion:
                 return type(existing)(new)
             else:
                 raise ValueError()
         except ValueError:
             _report_type_error(tag, existing)
 
-    def _update_list(self, existing, new, tag, context):
+    def _update_list(self, schema, existing, new, tag):
 
         """Updates a list node"""
 
@@ -510,46 +626,33 @@ class ChainOptions(object):
         if new_type != _LIST:
             _report_type_error(tag, existing)
 
-        # Get the tag of the setting
-        tag_in_context = tag[-1]
-
-        # Forward the virtual context
-        proto, proto_context = self._get_proto(
-            tag_in_context, context, existing
-            )
+        proto = schema.get_proto(existing, tag[-1])
+        proto_schema = schema.proto_schema
+        if proto_schema is None:
+            raise schema.proto_error
 
-        new_list = [
-            self._update_node(
-                proto, i, tag + (n, self.proto_tag),
-                proto_context,
-                )
+        proto_tag = self.chainer.proto_tag
+        new_list = FrozenList(
+            self._update_node(proto_schema, proto, i, tag + (n, proto_tag))
             for n, i in enumerate(new)
-            ]
-
-        update = context.get(
-            tag_in_context + self.separator + 'update',
-            self.default_list_update
             )
 
+        update = schema.update
         if update == 'overwrite':
             return new_list
         elif update == 'prepend':
-            return new_list + existing
+            return FrozenList(new_list + existing)
         elif update == 'append':
-            return existing + new_list
-        elif update == 'unique':
+            return FrozenList(existing + new_list)
+        else:
             try:
-                return list(set(existing + new_list))
+                return FrozenList(set(existing + new_list))
             except TypeError:
                 raise DefaultError(
                     'update method `unique` is for atom lists only'
                     )
-        else:
-            raise DefaultError(
-                'Invalid list update value %s' % update
-                )
 
-    def _update_map(self, existing, new, tag, context):
+    def _update_map(self, schema, existing, new, tag):
 
         """Updates a map node"""
 
@@ -557,84 +660,337 @@ class ChainOptions(object):
         if new_type != _MAP:
             _report_type_error(tag, existing)
 
-        # Get the update method
-        tag_in_context = tag[-1]
-        update = context.get(
-            tag_in_context + self.separator + 'update',
-            self.default_map_update
-            )
-
         # get the prototype for extend
-        if update == 'extend':
-            proto, proto_context = self._get_proto(
-                tag_in_context, context, existing
-                )
-
-        # Make a shallow copy of the old map
-        new_map = dict(existing)
+        extend = schema.update == 'extend'
+        if extend:
+            proto = schema.get_proto(existing, tag[-1])
+            if schema.proto_schema is None:
+                raise schema.proto_error
+
+        separator = self.chainer.separator
+        children = schema.children
+
+        # Only the updated entries are new, the others are shared with the
+        # old map
+        changes = {}
         # Update the old ones according to the new ones
         for k, v in new.iteritems():  # pylint: disable=invalid-name
 
             # Have a check about the new mapping key
-            if k.find(self.separator) != -1:
+            if k.find(separator) != -1:
                 raise UpdateError(
                     tag,
                     'users are not supposed to taint meta-options'
                     )
 
             # Update old value or add new value
-            if k in new_map:
-                new_map[k] = self._update_node(
-                    existing[k], v, tag + (k, ), existing
+            if k in existing:
+                child = children.get(k)
+                if child is None:
+                    # Entries added by extension in earlier configurations,
+                    # which are compiled for this update only, since the
+                    # schema is shared by all the chainings
+                    child = self.chainer.compile_node(
+                        existing[k], tag + (k, ), schema.meta
+                        )
+                changes[k] = self._update_node(
+                    child, existing[k], v, tag + (k, )
+                    )
+            elif extend:
+                changes[k] = self._update_node(
+                    schema.proto_schema, proto, v,
+                    tag + (k, self.chainer.proto_tag)
                     )
             else:
-                if update == 'extend':
-                    new_map[k] = self._update_node(
-                        proto, v, tag + (k, self.proto_tag), proto_context
-                        )
-                else:
-                    raise UpdateError(
-                        tag + (k, ),
-                        'invalid option'
-                        )
-        return new_map
+                raise UpdateError(
+                    tag + (k, ),
+                    'invalid option'
+                    )
+        return existing.derive(changes)
 
-    def _update_node(self, existing, new, tag, context):
+    def _update_node(self, schema, existing, new, tag):
 
         """Updates an existing node according to the new node
 
         The updated existing node will be returned, which is going to be of the
         same type as the one. This function is going to be called recursively
-        and forms the core of this class.
+        and forms the core of the chaining.
 
+        :param schema: The compiled schema for the existing node
         :param existing: The existing node to update
         :param new: The new node to be patched onto the existing one
         :param tag: The tag for the node to be updated, used for the purpose of
             better error reporting. Rather than a plain string, the tag here
             are a tuple giving the tag from the root of the configuration tree.
             In this way, the error message could be better formatted.
-        :param context: The dictionary in which the setting is in, the place to
-            find its meta-options.
         :returns: The new node after the update
         :raises UpdateError: if the new value is not compatible to update the
             existing value.
 
         """
 
-        existing_type = _find_type(existing, tag=tag, user=False)
+        kind = schema.kind
 
         # The main selection
-        if existing_type in _ATOMS:
+        if kind in _ATOMS:
 
-            return self._update_atom(existing, new, tag, context)
+            return self._update_atom(schema, existing, new, tag)
 
-        elif existing_type == _LIST:
+        elif kind == _LIST:
 
-            return self._update_list(existing, new, tag, context)
+            return self._update_list(schema, existing, new, tag)
 
-        elif existing_type == _MAP:
+        else:
 
-            return self._update_map(existing, new, tag, context)
+            return self._update_map(schema, existing, new, tag)
+
+    def chain_options(self, *ops):
+
+        """Chains multiple set of options together
+
+        The same as :py:meth:`ChainOptions.chain_options`, the last argument
+        is the default option. It should be the default that the schema is
+        compiled from, or a copy of it, so that the schema applies to it. It is
+        frozen first when it is not frozen, and the frozen results share all
+        the nodes not changed by the updates with it.
+
+        """
+
+        return functools.reduce(
+            lambda d, u: self._update_node(self.root, d, u, ('', )),
+            reversed(ops[:-1]), freeze(ops[-1])
+            )
+
+
+#
+# The main class
+# --------------
+#
+
+
+class ChainOptions(object):
+
+    """Option settings chainer
+
+    This is an implementation of the options chainer described in this module.
+    The implementation emphasizes flexibility is its usage. Basically all the
+    default values for the meta-options can be set in the initializer and
+    stored as attributes. Then the :py:meth:`chain_options` method can be
+    invoked to do the actual job of chaining the options together. When the
+    same default is used for many times, it can be compiled into an
+    :py:class:`OptionSchema` by :py:meth:`compile` for the chaining, so that
+    its meta-options are resolved only once.
+
+    .. py:attribute:: separator
+
+        The separator of the option tag with the meta-option tag. Default to
+        ``...``.
+
+    .. py:attribute:: proto_tag
+
+       The tag for the prototype of nodes to be extended. Default to
+       ``prototype``.
+
+    .. py:attribute:: default_list_update, default_map_update
+
+        The default update method for lists and maps, currently defaults to
+        ``overwrite`` for both of them for compatibility with the standard
+        library ``ChainMap`` class.
+
+    .. py:attribute:: default_coercion
+
+        The default value of if the type coercion is going to be performed for
+        atomic input with different types. Defaults to false.
+
+    """
+
+    __slots__ = [
+        'separator',
+        'proto_tag',
+        'default_list_update',
+        'default_map_update',
+        'default_coercion',
+        ]
+
+    def __init__(self, separator='...', proto_tag='prototype',
+                 default_list_update='overwrite',
+                 default_map_update='overwrite', default_coercion=False):
+        # pylint: disable=too-many-arguments
+
+        """Initializes the options chainer according to the default values"""
+
+        self.separator = separator
+        self.proto_tag = proto_tag
+        self.default_list_update = default_list_update
+        self.default_map_update = default_map_update
+        self.default_coercion = default_coercion
+
+    def _group_meta(self, context):
+
+        """Groups the meta-options in a context by the tags of the options
+
+        :param context: The dictionary of the options and meta-options
+        :returns: The dictionary from the option tags to the dictionaries of
+            their meta-options, with the tags after the first separator as the
+            keys, like ``{'option': {'prototype...update': 'append'}}``
+
+        """
+
+        grouped = {}
+        for k, v in context.iteritems():  # pylint: disable=invalid-name
+            if k.find(self.separator) != -1:
+                option, meta_tag = k.split(self.separator, 1)
+                grouped.setdefault(option, {})[meta_tag] = v
+
+        return grouped
+
+    def _compile_proto(self, schema, node, tag, meta):
+
+        """Resolves the prototype for the node into its schema
+
+        This is useful for adding new entries to list or maps. If no prototype
+        or prototype key is found in the context, the first entry in the
+        existing node will be used.
+
+        Getting the prototype is generally straightforward to understand. For
+        the virtual context, it is needed whenever a new node is added to the
+        options tree. Generally, meta-options for each option node should be a
+        sibling to the actual option node. But for new nodes added based on a
+        prototype, the location of the new node added and the prototype is
+        actually different, with the prototype one level higher. To make the
+        settings consist towards users, the meta-options for the prototypes
+        are put as siblings to the prototypes by using essentially the same
+        format in the key as the normal nodes. In addition, for nodes in a
+        list, since the list cannot have a special entry to hold the meta-
+        options for the actual nodes, we have to put it one-level (or levels
+        for nested-list) higher into the dictionary holding the list. From
+        this discrepancy of the location of the prototype and the actual
+        location of nodes that is added based on it, we need to pass the meta-
+        options for the prototype downwards somehow. In this implementation,
+        the meta-settings of the prototype is found and bundled into a special
+        context called virtual context, from which the schema of the prototype
+        is compiled.
+
+        Since the prototype given by a key or the first entry can be changed
+        by the earlier configurations, only the way to get it is kept in the
+        schema, and the prototype in the default is used for its schema.
+
+        :param schema: The schema of the node, to be set for the prototype
+        :param node: The node in the default
+        :param tag: The tag for the node from the root
+        :param meta: The dictionary of the meta-options of the node
+        :raises DefaultError: if more than one prototype is given
+
+        """
+
+        name = tag[-1]
+        key_tag = self.proto_tag + '-key'
+
+        if self.proto_tag in meta and key_tag in meta:
+            raise DefaultError(
+                'Meta-setting %s duplicates with others' % (
+                    name + self.separator + key_tag
+                    )
+                )
+        elif self.proto_tag in meta:
+            schema.proto = meta[self.proto_tag]
+        elif key_tag in meta:
+            schema.proto_key = meta[key_tag]
+
+        try:
+            proto = schema.get_proto(node, name)
+        except DefaultError as exc:
+            schema.proto_error = exc
+            return None
+
+        # Form the virtual context for the prototype
+        virt_prefix = self.proto_tag + self.separator
+        virt_context = {
+            self.proto_tag: {
+                k[len(virt_prefix):]: v for k, v in meta.iteritems()
+                if k.startswith(virt_prefix)
+                }
+            }
+
+        schema.proto_schema = self.compile_node(
+            proto, tag + (self.proto_tag, ), virt_context
+            )
+
+        return None
+
+    def compile_node(self, node, tag, context_meta):
+
+        """Compiles a node in the default into its schema
+
+        :param node: The node in the default
+        :param tag: The tag for the node from the root, with the last element
+            used for finding the meta-options in the context
+        :param context_meta: The meta-options in the dictionary in which the
+            node is, or in the virtual context for prototypes, grouped by
+            :py:meth:`_group_meta`
+        :returns: The :py:class:`_NodeSchema` for the node
+        :raises DefaultError: if the node is not of an acceptable type, or its
+            meta-options are invalid
+
+        """
+
+        kind = _find_type(node, tag=tag, user=False)
+        schema = _NodeSchema(kind)
+        meta = context_meta.get(tag[-1], {})
+
+        schema.coercion = meta.get('coercion', self.default_coercion)
+
+        if kind == _LIST:
+            schema.update = meta.get('update', self.default_list_update)
+            if schema.update not in _LIST_UPDATES:
+                raise DefaultError(
+                    'Invalid list update value %s' % schema.update
+                    )
+            self._compile_proto(schema, node, tag, meta)
+
+        elif kind == _MAP:
+            schema.update = meta.get('update', self.default_map_update)
+            schema.meta = self._group_meta(node)
+            schema.children = {
+                k: self.compile_node(v, tag + (k, ), schema.meta)
+                for k, v in node.iteritems()
+                if k.find(self.separator) == -1
+                }
+            if schema.update == 'extend':
+                self._compile_proto(schema, node, tag, meta)
+
+        return schema
+
+    def compile(self, default):
+
+        """Compiles a default options tree into a reusable schema
+
+        :param default: The default options, which is frozen for the schema
+        :returns: The :py:class:`OptionSchema` for the default
+        :raises DefaultError: if the default is invalid
+
+        """
+
+        default = freeze(default)
+        root = self.compile_node(default, ('', ), self._group_meta(default))
+        return OptionSchema(self, root, default)
+
+    def remove_proto(self, tag):
+
+        """Removes the prototype tags from the tag path
+
+        When adding a new node to the option tree and thus updating from the
+        prototype, a dummy layer with the prototype tag is added to the tags
+        path to be able to get the meta-options from the virtual context. This
+        extra-layer might cause some confusion on the user when the error
+        message is tried to be deciphered. So this function is added to be able
+        to remove the technical layers for cleaner error position directly
+        corresponding to the user input, if the pretty formatter chooses to not
+        to print the special tags.
+
+        """
+
+        return tuple(i for i in tag if i != self.proto_tag)
 
     def chain_options(self, *ops):
 
@@ -643,14 +999,14 @@ class ChainOptions(object):
         The options should be given as the positional arguments of this method.
         The last one is the default option, and the earlier ones takes higher
         precedence. The final set of options are going to be returned in the
-        same structure as the arguments.
+        same structure as the arguments, with the maps and lists frozen. The
+        default is compiled for each invocation, see :py:meth:`compile` for
+        reusing the compiled default.
 
         """
 
-        return functools.reduce(
-            lambda d, u: self._update_node(d, u, ('', ), d),
-            reversed(ops[:-1]), ops[-1]
-            )
+        schema = self.compile(ops[-1])
+        return schema.chain_options(*(ops[:-1] + (schema.default, )))
 
     def format_update_error(self, update_error):
 
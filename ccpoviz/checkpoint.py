@@ -0,0 +1,209 @@
+"""
+Checkpoints of batch renders
+============================
+
+For long batches, the jobs that have been completed are recorded in a
+checkpoint file, so that a batch interrupted partway can be restarted without
+rendering the completed jobs again. The checkpoint is a JSON lines file, with
+an entry appended for each completed job, with the fields
+
+output
+  The absolute name of the output file, which identifies the job.
+
+input-hash
+  The SHA-256 hash of the input file.
+
+option-hash
+  The SHA-256 hash of the reader, the contents of the option files, and the
+  default options of the package.
+
+version
+  The version of the package.
+
+image-hash
+  The SHA-256 hash of the produced image.
+
+A job is up to date when the latest entry for its output has the same hashes
+and version as the current ones, and the image still has the recorded hash.
+Since the entries are only appended after the image is written, a job
+interrupted in rendering is never taken as done, and a truncated last line
+from an interrupted write is ignored and terminated before the next entry.
+
+"""
+
+import hashlib
+import json
+import os
+
+from .renderdriver import get_output_file
+from .rendercache import hash_file
+from .util import get_data_string, get_version
+
+
+# The fields of the fingerprint of a job
+FINGERPRINT_FIELDS = ['input-hash', 'option-hash', 'version']
+
+
+def hash_file_content(file_name):
+
+    """Gets the hexadecimal SHA-256 hash of the content of a file"""
+
+    hasher = hashlib.sha256()
+    hash_file(hasher, file_name)
+    return hasher.hexdigest()
+
+
+def get_job_output(job):
+
+    """Gets the absolute name of the output file of a job"""
+
+    return os.path.abspath(get_output_file(job['input'], job['output']))
+
+
+def hash_options(job):
+
+    """Hashes the settings of a job affecting its image other than the input
+
+    :raises IOError: if an option file cannot be read
+
+    """
+
+    hasher = hashlib.sha256()
+    hasher.update(job['reader'].encode('utf-8') + b'\0')
+    hasher.update(get_data_string('defaultoptions.json'))
+
+    for field in ['molecule-option', 'project-option']:
+        option = job[field]
+        hasher.update(b'\0' + field.encode('utf-8') + b'\0')
+        if option is None or (
+                field == 'molecule-option' and option == 'input-title'
+        ):
+            hasher.update(str(option).encode('utf-8'))
+        else:
+            hash_file(hasher, option)
+
+    return hasher.hexdigest()
+
+
+def get_fingerprint(job):
+
+    """Gets the fingerprint of a job for checking if its image is up to date
+
+    :returns: The dictionary of the fields in :py:data:`FINGERPRINT_FIELDS`,
+        or None when the input or option files cannot be read
+
+    """
+
+    try:
+        return {
+            'input-hash': hash_file_content(job['input']),
+            'option-hash': hash_options(job),
+            'version': get_version(),
+            }
+    except (IOError, OSError):
+        return None
+
+
+class Checkpoint(object):
+
+    """The checkpoint of a batch in a JSON lines file
+
+    .. py:attribute:: file_name
+
+      The name of the checkpoint file.
+
+    .. py:attribute:: entries
+
+      The dictionary from the absolute output file names to their latest
+      entries.
+
+    """
+
+    __slots__ = [
+        'file_name',
+        'entries',
+        '_terminated',
+        ]
+
+    def __init__(self, file_name):
+
+        """Initializes the checkpoint, reading the file when it exists
+
+        :param file_name: The name of the checkpoint file
+        :raises IOError: if the existing file cannot be read
+
+        """
+
+        self.file_name = file_name
+        self.entries = {}
+        self._terminated = True
+
+        if not os.path.exists(file_name):
+            return
+
+        with open(file_name, 'r') as checkpoint:
+            for line in checkpoint:
+                self._terminated = line.endswith('\n')
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and 'output' in entry:
+                    self.entries[entry['output']] = entry
+
+    def is_done(self, job, fingerprint):
+
+        """Tests if a job is up to date according to the checkpoint
+
+        :param job: The job dictionary
+        :param fingerprint: The fingerprint of the job from
+            :py:func:`get_fingerprint`
+
+        """
+
+        if fingerprint is None:
+            return False
+
+        output_file = get_job_output(job)
+        entry = self.entries.get(output_file)
+        if entry is None or any(
+                entry.get(i) != fingerprint[i] for i in FINGERPRINT_FIELDS
+        ):
+            return False
+
+        try:
+            return hash_file_content(output_file) == entry.get('image-hash')
+        except (IOError, OSError):
+            return False
+
+    def record(self, job, fingerprint):
+
+        """Records a completed job in the checkpoint
+
+        The entry is appended and synchronized to the disk at once. Nothing is
+        recorded when there is no fingerprint.
+
+        :raises IOError: if the image or the checkpoint file cannot be
+            accessed
+
+        """
+
+        if fingerprint is None:
+            return None
+
+        output_file = get_job_output(job)
+        entry = dict(fingerprint)
+        entry['output'] = output_file
+        entry['image-hash'] = hash_file_content(output_file)
+
+        with open(self.file_name, 'a') as checkpoint:
+            if not self._terminated:
+                checkpoint.write('\n')
+                self._terminated = True
+            checkpoint.write(json.dumps(entry, sort_keys=True) + '\n')
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+        self.entries[output_file] = entry
+
+        return None
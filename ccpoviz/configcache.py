@@ -0,0 +1,275 @@
+"""
+Cache of parsed configuration files
+===================================
+
+In batches of many jobs, the same project and molecule configuration files
+are used by many jobs in each worker process. In this module, the parsed
+configuration files are cached in each process, keyed by the absolute name,
+the size, and the modification time of the file, so that each file is only
+read and parsed once in each process until it is changed. The parsed
+configurations are frozen by :py:func:`chainoptions.freeze`, so that they can
+be shared by all the jobs.
+
+Optionally, the parsed configurations can also be cached in a directory on
+the disk as JSON files under the same keys, so that they are shared by the
+worker processes and the later runs. It mostly helps the YAML files, which
+are much slower to parse than JSON. The files that cannot be expressed in JSON
+are just not cached on the disk.
+
+The YAML files are parsed by the safe loader of PyYAML, by the fast one based
+on libyaml when it is available. The numbers of the hits in the memory, the
+hits on the disk, and the files parsed are counted for the current process.
+
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from .chainoptions import freeze
+
+
+# The version of the format of the keys, to be bumped when it is changed
+KEY_VERSION = 'ccpoviz-config-cache-1'
+
+# The extension of the cached configurations on the disk
+CACHE_EXT = '.json'
+
+# The fields of the statistics
+STATS_FIELDS = ['hits', 'disk_hits', 'parses']
+
+
+def is_yaml_file(file_name):
+
+    """Tests if a configuration file is to be parsed as YAML"""
+
+    return file_name.endswith(('.yml', '.yaml'))
+
+
+def load_yaml(content):
+
+    """Parses a YAML document by the safe loader
+
+    The loader based on libyaml is used when PyYAML is built with it.
+
+    :raises yaml.YAMLError: if the document cannot be parsed
+
+    """
+
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    return yaml.load(content, Loader=loader)
+
+
+def parse_config(file_name, content):
+
+    """Parses the content of a configuration file
+
+    If the file name ends with ``.yml`` or ``.yaml``, it is parsed as YAML,
+    or it is parsed as JSON.
+
+    :raises ValueError: if the content cannot be parsed
+
+    """
+
+    if is_yaml_file(file_name):
+        import yaml
+        try:
+            return load_yaml(content)
+        except yaml.YAMLError as err:
+            raise ValueError('%s' % err)
+    else:
+        return json.loads(content)
+
+
+class ConfigCache(object):
+
+    """The cache of the parsed configuration files in a process
+
+    .. py:attribute:: cache_dir
+
+      The directory for caching the parsed configurations on the disk, None
+      for caching only in the memory.
+
+    .. py:attribute:: entries
+
+      The dictionary from the absolute file names to the pairs of the size and
+      modification time of the file and its frozen parsed configuration.
+
+    .. py:attribute:: stats
+
+      The dictionary of the statistics of the current process.
+
+    """
+
+    __slots__ = [
+        'cache_dir',
+        'entries',
+        'stats',
+        ]
+
+    def __init__(self, cache_dir=None):
+
+        """Initializes an empty cache
+
+        :param cache_dir: The directory for caching on the disk, see
+            :py:meth:`set_cache_dir`
+
+        """
+
+        self.cache_dir = None
+        self.entries = {}
+        self.stats = dict((i, 0) for i in STATS_FIELDS)
+
+        if cache_dir is not None:
+            self.set_cache_dir(cache_dir)
+
+    def set_cache_dir(self, cache_dir):
+
+        """Sets the directory for caching on the disk
+
+        :param cache_dir: The directory, with ``~`` expanded, which is created
+            when needed
+        :raises OSError: if the directory cannot be created
+
+        """
+
+        cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_dir = cache_dir
+
+        return None
+
+    def _get_disk_path(self, path, stamp):
+
+        """Gets the name of the file caching a configuration on the disk"""
+
+        hasher = hashlib.sha256()
+        for i in [KEY_VERSION, path, '%d' % stamp[0], repr(stamp[1])]:
+            hasher.update(i.encode('utf-8') + b'\0')
+
+        return os.path.join(self.cache_dir, hasher.hexdigest() + CACHE_EXT)
+
+    def _load_disk(self, path, stamp):
+
+        """Loads a configuration cached on the disk, None when not found"""
+
+        if self.cache_dir is None:
+            return None
+
+        try:
+            with open(self._get_disk_path(path, stamp), 'r') as cached:
+                return json.load(cached)
+        except (IOError, ValueError):
+            return None
+
+    def _store_disk(self, path, stamp, config):
+
+        """Stores a configuration on the disk
+
+        The configuration is first written to a temporary file in the cache
+        directory and then renamed, so that a partial file is never visible.
+        It is done on a best-effort basis, so failures are silently ignored.
+
+        """
+
+        if self.cache_dir is None:
+            return None
+
+        try:
+            content = json.dumps(config)
+        except (TypeError, ValueError):
+            return None
+
+        tmp_name = None
+        try:
+            handle, tmp_name = tempfile.mkstemp(
+                suffix='.tmp', dir=self.cache_dir
+                )
+            with os.fdopen(handle, 'w') as tmp_file:
+                tmp_file.write(content)
+            os.rename(tmp_name, self._get_disk_path(path, stamp))
+        except (IOError, OSError):
+            if tmp_name is not None and os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+        return None
+
+    def load(self, file_name, content=None):
+
+        """Loads a configuration file through the cache
+
+        :param file_name: The name of the configuration file
+        :param content: The content of the file already read by the caller,
+            which is parsed when it is not cached rather than reading the file
+            again, None for reading the file
+        :returns: The frozen parsed configuration
+        :raises IOError, OSError: if the file cannot be read
+        :raises ValueError: if the file cannot be parsed
+
+        """
+
+        path = os.path.abspath(file_name)
+        stat = os.stat(path)
+        stamp = (stat.st_size, stat.st_mtime)
+
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == stamp:
+            self.stats['hits'] += 1
+            return entry[1]
+
+        config = self._load_disk(path, stamp)
+        if config is not None:
+            self.stats['disk_hits'] += 1
+        else:
+            if content is None:
+                with open(path, 'rb') as file_obj:
+                    content = file_obj.read()
+            config = parse_config(file_name, content)
+            self.stats['parses'] += 1
+            self._store_disk(path, stamp, config)
+
+        config = freeze(config)
+        self.entries[path] = (stamp, config)
+        return config
+
+    def format_stats(self):
+
+        """Formats the statistics of the current process for the report"""
+
+        return format_stats([self.stats])
+
+
+def format_stats(stats_list):
+
+    """Formats the statistics of the caches in one or more processes
+
+    :param stats_list: The list of the statistics dictionaries of the
+        processes, which are added
+
+    """
+
+    total = dict(
+        (i, sum(stats[i] for stats in stats_list)) for i in STATS_FIELDS
+        )
+
+    return (
+        'Config cache in %d process(es): %d files parsed, %d hits, '
+        '%d disk hits'
+        ) % (
+            len(stats_list), total['parses'], total['hits'],
+            total['disk_hits']
+            )
+
+
+# The cache of the current process
+_CACHE = ConfigCache()
+
+
+def get_config_cache():
+
+    """Gets the cache of the parsed configuration files of the process"""
+
+    return _CACHE
@@ -0,0 +1,223 @@
+"""
+Budget of processors for the pov-ray processes
+==============================================
+
+POV-Ray splits the image into square blocks and traces them in a number of
+work threads, which is set by the ``+WT`` option. When several renders are run
+at the same time, each of them should only get a share of the processors, or
+the machine is oversubscribed. In this module, the processors available to the
+current process are tracked in a budget, from which the processors for each
+pov-ray process are allocated and to which they are released after the render.
+
+The number of threads for a render is limited by the number of blocks in the
+image, since more threads than blocks cannot be kept busy. Optionally, the
+pov-ray processes can be pinned to the allocated processors by running them
+through the ``taskset`` utility, when it is available.
+
+"""
+
+import distutils.spawn
+import multiprocessing
+
+
+# The size of the square blocks that pov-ray renders in the threads in pixels
+BLOCK_SIZE = 32
+
+
+def get_available_cpus():
+
+    """Gets the processors available to the current process
+
+    On Linux, the processors that the current process is allowed to run on
+    are read from the ``/proc`` file system. Otherwise all the processors are
+    assumed to be available.
+
+    :returns: The sorted list of the identifiers of the processors
+
+    """
+
+    try:
+        with open('/proc/self/status', 'r') as status:
+            for line in status:
+                if line.startswith('Cpus_allowed_list:'):
+                    return parse_cpu_list(line.split(':', 1)[1])
+    except (IOError, ValueError):
+        pass
+
+    return range(0, multiprocessing.cpu_count())
+
+
+def parse_cpu_list(cpu_list):
+
+    """Parses a list of processors like ``0-3,8,10-11``
+
+    :param cpu_list: The string for the list of processors
+    :returns: The sorted list of the processor identifiers
+    :raises ValueError: if the string is not a valid list
+
+    """
+
+    cpus = set()
+    for field in cpu_list.strip().split(','):
+        bounds = [int(i) for i in field.split('-')]
+        if len(bounds) == 1:
+            cpus.add(bounds[0])
+        elif len(bounds) == 2:
+            cpus.update(range(bounds[0], bounds[1] + 1))
+        else:
+            raise ValueError('Invalid list of processors %s' % cpu_list)
+
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus):
+
+    """Formats a list of processors compactly, like ``0-3,8,10-11``
+
+    :param cpus: The iterable of processor identifiers
+    :returns: The string for the list
+
+    """
+
+    ranges = []
+    for cpu in sorted(cpus):
+        if len(ranges) > 0 and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+
+    return ','.join(
+        ('%d' % beg) if beg == end else ('%d-%d' % (beg, end))
+        for beg, end in ranges
+        )
+
+
+def count_blocks(width, height):
+
+    """Counts the number of blocks that pov-ray traces for an image
+
+    :param width: The width of the image in pixels
+    :param height: The height of the image in pixels
+
+    """
+
+    return (
+        ((int(width) + BLOCK_SIZE - 1) // BLOCK_SIZE) *
+        ((int(height) + BLOCK_SIZE - 1) // BLOCK_SIZE)
+        )
+
+
+def decide_threads(n_free, n_slots, n_blocks, max_threads=0):
+
+    """Decides the number of threads for a render
+
+    The free processors are shared evenly among the renders that are going to
+    be started, and the share is limited by the number of blocks in the image
+    and an explicit maximum.
+
+    :param n_free: The number of free processors
+    :param n_slots: The number of renders to share the free processors,
+        including the current one
+    :param n_blocks: The number of blocks in the image
+    :param max_threads: The explicit maximum number of threads, zero for no
+        limit
+    :returns: The number of threads, which is at least one
+
+    """
+
+    n_threads = min(n_free // max(n_slots, 1), n_blocks)
+    if max_threads > 0:
+        n_threads = min(n_threads, max_threads)
+
+    return max(n_threads, 1)
+
+
+def get_taskset():
+
+    """Gets the path of the ``taskset`` utility, None when not available"""
+
+    return distutils.spawn.find_executable('taskset')
+
+
+def gen_affinity_prefix(cpus):
+
+    """Generates the command prefix for pinning a process to processors
+
+    :param cpus: The list of processor identifiers
+    :returns: The list of arguments to be prepended to the command, which is
+        empty when the ``taskset`` utility is not available
+
+    """
+
+    taskset = get_taskset()
+    if taskset is None:
+        return []
+    else:
+        return [taskset, '-c', format_cpu_list(cpus)]
+
+
+class CpuBudget(object):
+
+    """The budget of processors for the pov-ray processes
+
+    .. py:attribute:: cpus
+
+      The list of the identifiers of all the processors in the budget.
+
+    .. py:attribute:: free
+
+      The set of the identifiers of the free processors.
+
+    """
+
+    __slots__ = [
+        'cpus',
+        'free',
+        ]
+
+    def __init__(self, n_cpus=None):
+
+        """Initializes the budget
+
+        :param n_cpus: The number of processors in the budget, default to all
+            the available processors. The processors with the lowest
+            identifiers are taken when it is less than the available ones.
+
+        """
+
+        cpus = get_available_cpus()
+        if n_cpus is not None:
+            if n_cpus < 1:
+                raise ValueError(
+                    'The number of processors needs to be positive'
+                    )
+            cpus = cpus[0:n_cpus]
+
+        self.cpus = list(cpus)
+        self.free = set(cpus)
+
+    def allocate(self, n_cpus):
+
+        """Allocates the given number of free processors
+
+        :param n_cpus: The number of processors to allocate, which should not
+            be more than the free ones
+        :returns: The sorted list of the allocated processors
+
+        """
+
+        if n_cpus > len(self.free):
+            raise ValueError('Not enough free processors')
+
+        cpus = sorted(self.free)[0:n_cpus]
+        self.free.difference_update(cpus)
+
+        return cpus
+
+    def release(self, cpus):
+
+        """Releases the processors back to the budget"""
+
+        self.free.update(cpus)
+
+        return None
@@ -33,6 +33,7 @@ import math
 
 import numpy as np
 
+from .structure import get_coords
 from .util import format_vector, terminate_program
 
 
@@ -98,9 +99,7 @@ def gen_camera_ops(ops_dict, structure):
 
     # First we need to find the focus out
     focus_inp = ops_dict['camera-focus']
-    focus = np.mean([
-        i.coord for i in structure.atms
-        ], axis=0)
+    focus = np.mean(get_coords(structure), axis=0)
     if len(focus_inp) == 3:
         focus += np.array(focus_inp)
     else:
@@ -125,12 +125,13 @@ def gen_light_ops(cam_loc, cam_foc, ops_dict):
     area_vec_1 = np.dot(rotation_matrix, base1)
     area_vec_2 = np.dot(rotation_matrix, base2)
 
-    # Process the adaptive a little bit to conform to the moustache requirement
+    # Process the adaptive to conform to the moustache requirement, the level
+    # is a string so that level zero is not taken as false
     light_adaptive_inp = ops_dict['light-adaptive']
     if light_adaptive_inp < 0:
         light_adaptive_value = False
     else:
-        light_adaptive_value = light_adaptive_value
+        light_adaptive_value = '%d' % light_adaptive_inp
 
     return {
         'light-location': format_vector(loc),
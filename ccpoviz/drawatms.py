@@ -11,21 +11,21 @@ location
 radius
     A float giving the radius of the sphere
 
-texture, pigment, normal, finish
-    Each are going to hold a list of strings holding the settings of the
-    options in Pov-ray. The strings should be put into the correct position in
-    the pov-ray file.
+texture-name
+    The name of the texture of the atom, which is declared once in the POV-Ray
+    file for all the atoms of the same texture.
 
 The resulted dictionary can be used in pov-ray input file mustache template
 rendering directly.
 
-"""
+The textures are formed by :py:func:`get_texture` as dictionaries with fields
+``texture``, ``pigment``, ``normal``, ``finish``, each holding a list of
+strings for the settings of the options in Pov-ray, and they are collected in a
+:py:class:`texturetable.TextureTable` for the declarations.
 
-import json
-import pkg_resources
-import copy
+"""
 
-from .util import terminate_program, format_vector
+from .util import terminate_program, format_vector, get_data_json
 
 
 def get_radius(elem_symb, ops_dict):
@@ -47,10 +47,7 @@ def form_colour_dict(ops_dict):
 
     """
 
-    default_schemes_str = pkg_resources.resource_string(
-        __name__, 'data/defaultcolour.json'
-        )
-    default_schemes = json.loads(default_schemes_str)
+    default_schemes = get_data_json('defaultcolour.json')
 
     scheme = ops_dict['element-colour-scheme']
     try:
@@ -75,15 +72,16 @@ def get_texture(elem_symb, colour_dict, ops_dict):
     """
 
     textures_dict = ops_dict['element-textures']
-    # Make a copy, even the explicitly given ones are based on the default.
-    raw_texture = copy.deepcopy(textures_dict['default'])
+    # Even the explicitly given ones are based on the default. The lists in the
+    # frozen options are shared rather than copied.
+    raw_texture = dict(textures_dict['default'])
     if elem_symb in textures_dict:
-        raw_texture.update(raw_texture[elem_symb])
+        raw_texture.update(textures_dict[elem_symb])
 
     texture_list = raw_texture['texture']
     pigment_list = raw_texture['pigment']
     if raw_texture['use-colour']:
-        pigment_list.append('colour %s' % colour_dict[elem_symb])
+        pigment_list = pigment_list + ['colour %s' % colour_dict[elem_symb]]
     normal_list = raw_texture['normal']
     finish_list = raw_texture['finish']
 
@@ -98,28 +96,32 @@ def get_texture(elem_symb, colour_dict, ops_dict):
         }
 
 
-def draw_atms(structure, ops_dict):
+def draw_atms(structure, ops_dict, texture_table):
 
     """Draws the atoms in a structure
 
     The returned will be a list that can be assigned into the rendering
-    dictionary under a key for rendering the mustache template.
+    dictionary under a key for rendering the mustache template. The textures of
+    the atoms are added to the given texture table, and they are formed only
+    once for each element.
 
     """
 
     colour_dict = form_colour_dict(ops_dict)
     atms = structure.atms
 
+    texture_names = {}
     atms_list = []
     for atm_i in atms:
-        atm_dict = {
+        symb = atm_i.symb
+        if symb not in texture_names:
+            texture_names[symb] = texture_table.get_name(
+                get_texture(symb, colour_dict, ops_dict)
+                )
+        atms_list.append({
             'location': format_vector(atm_i.coord),
-            'radius': get_radius(atm_i.symb, ops_dict)
-            }
-
-        atm_dict.update(
-            get_texture(atm_i.symb, colour_dict, ops_dict)
-            )
-        atms_list.append(atm_dict)
+            'radius': get_radius(symb, ops_dict),
+            'texture-name': texture_names[symb]
+            })
 
     return atms_list
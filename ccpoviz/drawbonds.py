@@ -16,19 +16,20 @@ begin, end
 radius
     The radius
 
-texture, pigment, normal, finish
-    The texture attributes, with each being a list of strings.
+texture-name
+    The name of the declared texture for the bonds, see the
+    :py:mod:`texturetable` module.
 
 """
 
-import itertools
-import json
+import collections
 
-from numpy import linalg
-import pkg_resources
+import numpy as np
 
-from .bonds2cylinder import bonds2cylinders
-from .util import format_vector
+from .bonds2cylinder import bonds2cylinder_arrays
+from .neighbours import find_bonded_pairs, find_periodic_bonded_pairs
+from .structure import as_array_structure, get_coords
+from .util import format_vector, terminate_program, get_data_json
 
 
 def compute_bonds(structure, ops_dict):
@@ -40,34 +41,69 @@ def compute_bonds(structure, ops_dict):
     triples for the bonds. Note that in the current implementation, the bond
     order is always set to one.
 
+    The search for the close atoms is performed by the cell-list method in the
+    :py:mod:`neighbours` module, so that it scales linearly with the size of
+    the structure. For crystals with lattice vectors, the bonds across the
+    cell boundaries are also found, and they are given a fourth field for the
+    periodic image of the second atom, as documented in
+    :py:class:`structure.Structure`.
+
     """
 
-    default_radii = json.loads(
-        pkg_resources.resource_string(__name__, 'data/covradius.json')
-        )
+    default_radii = get_data_json('covradius.json')
     default_radii.update(
         ops_dict['covalent-radii']
         )
 
-    bonds = []
-    for atm1, atm2 in itertools.combinations(enumerate(structure.atms), 2):
+    structure = as_array_structure(structure)
+    radii = np.array(
+        [default_radii[i] for i in structure.symbs], dtype=np.float64
+        )[structure.species]
+
+    if len(structure.latt_vecs) == 0:
+        idx1, idx2 = find_bonded_pairs(structure.coords, radii)
+        return [
+            (i, j, 1.0) for i, j in zip(idx1.tolist(), idx2.tolist())
+            ]
+
+    idx1, idx2, images = find_periodic_bonded_pairs(
+        structure.coords, radii, structure.latt_vecs
+        )
+    return [
+        (i, j, 1.0, tuple(image)) if any(image) else (i, j, 1.0)
+        for i, j, image in zip(idx1.tolist(), idx2.tolist(), images.tolist())
+        ]
 
-        idx1 = atm1[0]
-        idx2 = atm2[0]
-        symb1 = atm1[1].symb
-        symb2 = atm2[1].symb
-        coord1 = atm1[1].coord
-        coord2 = atm2[1].coord
 
-        threshold = default_radii[symb1] + default_radii[symb2]
-        dist = linalg.norm(coord1 - coord2)
+def bond_key(bond):
 
-        if dist < threshold:
-            bonds.append(
-                (idx1, idx2, 1.0) if idx1 < idx2 else (idx2, idx1, 1.0)
-                )
+    """Gets the canonical key for a bond
 
-    return bonds
+    The key is a triple of the two atom indices in ascending order and the
+    periodic image of the second atom, which is an empty tuple for bonds within
+    the cell. When the two atoms are swapped, the image is negated. For bonds
+    from an atom to its own image, the image is made lexicographically
+    positive.
+
+    """
+
+    idx1, idx2 = bond[0], bond[1]
+    image = tuple(bond[3]) if len(bond) > 3 and any(bond[3]) else ()
+
+    if idx1 > idx2 or (idx1 == idx2 and image < (0, ) * len(image)):
+        return (idx2, idx1, tuple(-i for i in image))
+    else:
+        return (idx1, idx2, image)
+
+
+def _form_bond(key, order):
+
+    """Forms a bond tuple from its canonical key and order"""
+
+    if len(key[2]) == 0:
+        return (key[0], key[1], order)
+    else:
+        return (key[0], key[1], order, key[2])
 
 
 def update_bonds(existing_bonds, new_bonds):
@@ -78,37 +114,74 @@ def update_bonds(existing_bonds, new_bonds):
     the new bonds. If the new order is zero, the connection is going to be
     removed.
 
+    The bonds are indexed by their canonical key from :py:func:`bond_key` in an
+    ordered dictionary, so the merging takes linear time and the existing bonds
+    keep their order in the result.
+
     """
 
-    # make a shallow copy
-    bonds = list(existing_bonds)
+    index = collections.OrderedDict(
+        (bond_key(i), i[2]) for i in existing_bonds
+        )
 
     for b_i in new_bonds:
 
-        idxes = b_i[0:2] if b_i[0] < b_i[1] else (b_i[1], b_i[0])
-
-        try:
-            old_idx = next(i for i, e_b in enumerate(existing_bonds)
-                           if e_b[0:2] == idxes)
-        except StopIteration:
-            bonds.append(
-                b_i if b_i[0] < b_i[1] else (b_i[1], b_i[0], b_i[2])
-                )
-            continue
-
+        key = bond_key(b_i)
         if abs(b_i[2] - 0.0) < 0.1:
-            del bonds[old_idx]
+            index.pop(key, None)
         else:
-            bonds[old_idx] = b_i
+            index[key] = b_i[2]
 
-    return bonds
+    return [_form_bond(k, v) for k, v in index.iteritems()]
+
+
+def change_bond_set(bonds, symbs, elements, order):
+
+    """Changes the order of a whole set of bonds selected by the elements
+
+    :param bonds: The list of bonds
+    :param symbs: A sequence of the element symbols of the atoms
+    :param elements: A list of one or two element symbols. For one symbol,
+        all bonds to the element are selected. For two symbols, the bonds
+        between atoms of the two elements are selected.
+    :param order: The new order for the selected bonds, the bonds are going to
+        be removed if it is zero.
+    :returns: The new list of bonds
+    :raises ValueError: if the number of elements is invalid
+
+    """
+
+    if len(elements) == 1:
+        selected = [
+            elements[0] in (symbs[i[0]], symbs[i[1]]) for i in bonds
+            ]
+    elif len(elements) == 2:
+        pair = sorted(elements)
+        selected = [
+            sorted((symbs[i[0]], symbs[i[1]])) == pair for i in bonds
+            ]
+    else:
+        raise ValueError(
+            'One or two elements are expected for a bond set, %d given' %
+            len(elements)
+            )
+
+    if abs(order - 0.0) < 0.1:
+        return [i for i, sel in zip(bonds, selected) if not sel]
+    else:
+        return [
+            (i[0], i[1], order) + tuple(i[3:]) if sel else i
+            for i, sel in zip(bonds, selected)
+            ]
 
 
 def form_bonds_list(structure, ops_dict):
 
     """Forms the final list of bonds
 
-    The returned list contains the triples for each bond.
+    The returned list contains the triples for each bond. After the computed
+    bonds are updated by the bonds in the structure, the changes to whole sets
+    of bonds in the ``bond-set-changes`` option are applied in turn.
 
     """
 
@@ -119,58 +192,105 @@ def form_bonds_list(structure, ops_dict):
 
     bonds = update_bonds(raw_bonds, structure.bonds)
 
-    return bonds
+    set_changes = ops_dict['bond-set-changes']
+    if len(set_changes) > 0:
+        symbs = [i.symb for i in structure.atms]
+        for change in set_changes:
+            try:
+                bonds = change_bond_set(
+                    bonds, symbs, change['elements'], change['order']
+                    )
+            except ValueError as verr:
+                terminate_program(
+                    'Invalid bond set change: %s' % verr.args[0]
+                    )
 
+    return bonds
 
-def cylinder2pov(cylinders, ops_dict):
 
-    """Converts the internal cylinder data structure to pov-ray dictionaries
+def get_bond_texture(ops_dict):
 
-    The cylinders should be in the intern data structure as defined in
-    :py:mod:`bonds2cylinder` module. Here in this implementation, just the
-    beginning and end points are actually used. Other fields in the structure
-    were intended to be helpful for possible future features.
+    """Gets the texture dictionary for the bonds
 
-    The returned list of dictionaries has got the format documented in this
-    module.
+    The format is the same as the textures for the atoms from
+    :py:func:`drawatms.get_texture`.
 
     """
 
-    # Get the bond representation parameters
-    radius = ops_dict['bond-cylinder-radius']
     texture = ops_dict['bond-texture']
     pigment = ops_dict['bond-pigment']
     normal = ops_dict['bond-normal']
     finish = ops_dict['bond-finish']
 
+    return {
+        'texture': texture,
+        'pigment': pigment,
+        'has-pigment': len(pigment) != 0,
+        'normal': normal,
+        'has-normal': len(normal) != 0,
+        'finish': finish,
+        'has-finish': len(finish) != 0,
+        }
+
+
+def cylinder2pov(cylinders, ops_dict, texture_table):
+
+    """Converts the internal cylinder data structure to pov-ray dictionaries
+
+    The cylinders should be in the struct-of-arrays data structure
+    :py:class:`bonds2cylinder.BondCylinders`. Here in this implementation, just
+    the beginning and end points are actually used. Other fields in the
+    structure were intended to be helpful for possible future features.
+
+    The returned list of dictionaries has got the format documented in this
+    module. The texture for the bonds is added to the given texture table.
+
+    """
+
+    # Get the bond representation parameters
+    radius = '%8.4f' % ops_dict['bond-cylinder-radius']
+    texture_name = texture_table.get_name(get_bond_texture(ops_dict))
+
     return [
         {
-            'begin': format_vector(i.beg_coord),
-            'end': format_vector(i.end_coord),
-            'radius': '%8.4f' % radius,
-            # texture options
-            'texture': texture,
-            'pigment': pigment,
-            'has-pigment': len(pigment) != 0,
-            'normal': normal,
-            'has-normal': len(normal) != 0,
-            'finish': finish,
-            'has-finish': len(finish) != 0,
+            'begin': format_vector(beg),
+            'end': format_vector(end),
+            'radius': radius,
+            'texture-name': texture_name,
         }
-        for i in cylinders
+        for beg, end in zip(cylinders.beg_coords, cylinders.end_coords)
         ]
 
 
-def draw_bonds(structure, camera, ops_dict):
+def resolve_bonds(structure, camera, ops_dict, bonds=None):
 
-    """Forms the bonds list"""
+    """Resolves the bonds of the structure into cylinders
+
+    The bonds are formed by :py:func:`form_bonds_list` and then resolved into
+    the cylinders by the batched engine in :py:mod:`bonds2cylinder`.
+
+    :param bonds: The bonds already formed by :py:func:`form_bonds_list`, they
+        are formed when not given
+    :returns: A :py:class:`bonds2cylinder.BondCylinders` instance
+
+    """
 
     separation = ops_dict['multiple-bond-separation']
     dash_size = ops_dict['partial-bond-dash-size']
 
-    bonds = form_bonds_list(structure, ops_dict)
-    cylinders = bonds2cylinders(
-        bonds, structure.atms, camera, separation, dash_size
+    if bonds is None:
+        bonds = form_bonds_list(structure, ops_dict)
+
+    return bonds2cylinder_arrays(
+        bonds, get_coords(structure), camera, separation, dash_size,
+        latt_vecs=structure.latt_vecs
         )
 
-    return cylinder2pov(cylinders, ops_dict)
+
+def draw_bonds(structure, camera, ops_dict, texture_table):
+
+    """Forms the bonds list"""
+
+    cylinders = resolve_bonds(structure, camera, ops_dict)
+
+    return cylinder2pov(cylinders, ops_dict, texture_table)
@@ -3,17 +3,55 @@ Geting the options for a particular plotting
 ============================================
 
 This module contains driver functions that is able to get the options
-dictionary for a particular run of the plotting.
+dictionary for a particular run of the plotting. The default options are
+compiled into a schema only once in each process, which is reused for all the
+runs, see :py:meth:`chainoptions.ChainOptions.compile`. The options are frozen,
+with the nodes not changed by the configurations shared with the default.
+
+For batches of many molecules sharing the same project configuration, the
+options chained from the default and the project configuration are memoized
+for each project configuration file, so that just the molecule configuration
+is chained for each molecule. The memoized options of a file are reused when
+its modification time and size are unchanged, or else when the SHA-256 hash of
+its content is unchanged, so that touching the file without changing it does
+not invalidate them, while any change of the content does. The configuration
+files are parsed through the cache in :py:mod:`configcache`, and the YAML
+documents are parsed by the safe loader.
 
 """
 
+import hashlib
 import json
+import os
 import re
 
-import pkg_resources
-
 from .chainoptions import ChainOptions, UpdateError
-from .util import terminate_program
+from .configcache import get_config_cache, is_yaml_file, load_yaml
+from .util import terminate_program, get_data_json
+
+
+# The chainer for the options
+_CHAINER = ChainOptions(default_coercion=True)
+
+# The compiled schemas of the default options
+_SCHEMAS = {}
+
+
+def get_options_schema(name='defaultoptions.json'):
+
+    """Gets the compiled schema of the default options in the package
+
+    :param name: The name of the data file for the default options
+    :returns: The :py:class:`chainoptions.OptionSchema`
+
+    """
+
+    try:
+        return _SCHEMAS[name]
+    except KeyError:
+        schema = _CHAINER.compile(get_data_json(name))
+        _SCHEMAS[name] = schema
+        return schema
 
 
 def get_lines_sentinel(lines, beg_patt, end_patt):
@@ -49,6 +87,120 @@ def get_lines_sentinel(lines, beg_patt, end_patt):
     return lines[beg_pos:end_pos + 1]
 
 
+def _read_config(file_name):
+
+    """Reads the content of a configuration file
+
+    The program is terminated when the file cannot be read.
+
+    """
+
+    try:
+        with open(file_name, 'rb') as file_obj:
+            return file_obj.read()
+    except IOError:
+        terminate_program(
+            'Cannot open the configuration file %s.' % file_name
+            )
+
+
+def _load_config(file_name, content=None):
+
+    """Loads a configuration file through the cache of parsed files
+
+    If the file name ends with ``.yml`` or ``.yaml``, it is parsed as YAML,
+    or it is parsed as JSON. The content already read from the file can be
+    given to be parsed without reading the file again. The program is
+    terminated when the file cannot be read or parsed.
+
+    """
+
+    try:
+        return get_config_cache().load(file_name, content)
+    except (IOError, OSError):
+        terminate_program(
+            'Cannot open the configuration file %s.' % file_name
+            )
+    except ValueError as err:
+        terminate_program(
+            'Configuration file %s cannot be parsed as %s \n%s' % (
+                file_name, 'YAML' if is_yaml_file(file_name) else 'JSON', err
+                )
+            )
+
+
+def _chain_config(config, options):
+
+    """Chains a configuration onto the options
+
+    The program is terminated when the configuration is invalid.
+
+    """
+
+    try:
+        return get_options_schema().chain_options(config, options)
+    except UpdateError as err:
+        terminate_program(
+            'Invalid configuration: \n' +
+            _CHAINER.format_update_error(err)
+            )
+
+
+#
+# Memoized project options
+# ------------------------
+#
+
+
+# The memoized options chained from the default and the project configuration
+# files, from the absolute file names to the triples of the modification time
+# and size of the file, the hash of its content, and the options.
+_PROJECT_OPTIONS = {}
+
+
+def get_project_options(proj_ops):
+
+    """Gets the options chained from the default and a project configuration
+
+    The options are memoized for each file, and they are only chained again
+    when the content of the file is changed. A changed file is read only once,
+    and the content hashed is also the one parsed.
+
+    :param proj_ops: The file name for the project level configuration, or
+        None for the default options
+    :returns: The frozen options
+
+    """
+
+    if proj_ops is None:
+        return get_options_schema().default
+
+    path = os.path.abspath(proj_ops)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        terminate_program(
+            'Cannot open the configuration file %s.' % proj_ops
+            )
+    stamp = (stat.st_mtime, stat.st_size)
+
+    memoized = _PROJECT_OPTIONS.get(path)
+    if memoized is not None and memoized[0] == stamp:
+        return memoized[2]
+
+    content = _read_config(proj_ops)
+    digest = hashlib.sha256(content).hexdigest()
+    if memoized is not None and memoized[1] == digest:
+        options = memoized[2]
+    else:
+        options = _chain_config(
+            _load_config(proj_ops, content), get_options_schema().default
+            )
+
+    _PROJECT_OPTIONS[path] = (stamp, digest, options)
+    return options
+
+
 def get_options(mol_ops, mol, proj_ops):
 
     """Gets the options for this run
@@ -65,19 +217,12 @@ def get_options(mol_ops, mol, proj_ops):
     :param mol: The molecule
     :param proj_ops: The file name for the project level configuration, if it
         ends with ``.yml`` or ``.yaml``, it is going to be parsed as YAML, or
-        it is going to be parsed as JSON.
+        it is going to be parsed as JSON. The options chained from it are
+        memoized, see :py:func:`get_project_options`.
+    :returns: The frozen options, see :py:class:`chainoptions.FrozenMap`
 
     """
 
-    # pylint: disable=too-many-branches
-
-    default = json.loads(
-        pkg_resources.resource_string(__name__, 'data/defaultoptions.json')
-        )
-
-    config_dicts = []
-    # Configuration dictionaries, starting with ones with higher priority
-
     if mol_ops == 'input-title':
         yaml_lines = get_lines_sentinel(
             mol.title, r'^ *--- *$', r'^ *\.\.\. *$'
@@ -85,8 +230,8 @@ def get_options(mol_ops, mol, proj_ops):
         if len(yaml_lines) != 0:
             import yaml
             try:
-                mol_dict = yaml.load('\n'.join(yaml_lines))
-            except (yaml.parser.ParserError, yaml.parser.ScannerError) as err:
+                mol_dict = load_yaml('\n'.join(yaml_lines))
+            except yaml.YAMLError as err:
                 terminate_program(
                     'Input title cannot be parsed as YAML.\n' +
                     ('%s' % err)
@@ -108,50 +253,13 @@ def get_options(mol_ops, mol, proj_ops):
                     'The title of the input file cannot be '
                     'found to be JSON or YAML'
                     )
-        config_dicts.append(mol_dict)
-        config_files = [proj_ops, ]
+    elif mol_ops is not None:
+        mol_dict = _load_config(mol_ops)
     else:
-        config_files = [mol_ops, proj_ops]
-
-    for i in config_files:
-
-        if i is None:
-            continue
-
-        try:
-            file_obj = open(i, 'r')
-        except IOError:
-            terminate_program(
-                'Cannot open the configuration file %s.' % i
-                )
-        content = file_obj.read()
-        file_obj.close()
-
-        if i.endswith(('.yml', '.yaml')):
-            import yaml
-            try:
-                config_dicts.append(yaml.load(content))
-            except (yaml.parser.ParserError, yaml.parser.ScannerError) as err:
-                terminate_program(
-                    ('Configuration file %s cannot be parsed as YAML \n' % i)
-                    + ('%s' % err)
-                    )
-        else:
-            try:
-                config_dicts.append(json.loads(content))
-            except ValueError as err:
-                terminate_program(
-                    ('Configuration file %s cannot be parsed as JSON \n' % i)
-                    + ('%s' % err)
-                    )
+        mol_dict = None
 
-    config_dicts.append(default)
+    options = get_project_options(proj_ops)
+    if mol_dict is not None:
+        options = _chain_config(mol_dict, options)
 
-    chainer = ChainOptions(default_coercion=True)
-    try:
-        return chainer.chain_options(*config_dicts)  # pylint: disable=star-args
-    except UpdateError as err:
-        terminate_program(
-            'Invalid configuration: \n' +
-            chainer.format_update_error(err)
-            )
+    return options
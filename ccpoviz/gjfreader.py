@@ -12,7 +12,7 @@ import itertools
 
 import numpy as np
 
-from .structure import Atm, Structure
+from .structure import Atm, Structure, ArrayStructure
 
 
 def get_gjf_sections(file_name):
@@ -33,7 +33,7 @@ def get_gjf_sections(file_name):
         input_file = open(file_name, 'r')
     except IOError as err:
         raise IOError(
-            'The given Gaussian input file cannot be opened!\n' + err.args
+            'The given Gaussian input file cannot be opened!\n' + str(err)
             )
     lines = [i.strip() for i in input_file]
     return [
@@ -64,7 +64,7 @@ def parse_coord(lines):
             coord = np.array(fields[1:4], dtype=np.float64)
         except ValueError as verr:
             raise ValueError(
-                'Corrupt atomic coordinate in gjf file:\n' + verr.args
+                'Corrupt atomic coordinate in gjf file:\n' + str(verr)
                 )
         atms.append(Atm(symb=symb, coord=coord))
         continue
@@ -105,17 +105,19 @@ def parse_connectivity(lines):
                     )
         except ValueError as verr:
             raise ValueError(
-                'Corrupt connectivity in gjf file:\n' + verr.args
+                'Corrupt connectivity in gjf file:\n' + str(verr)
                 )
 
     return bonds
 
 
-def parse_gjf(file_name):
+def parse_gjf(file_name, array_backed=False):
 
     """Parses a Gaussian gjf file based on the input file name
 
     :param file_name: The name of the input file
+    :param array_backed: If an :py:class:`ArrayStructure` is going to be
+        returned rather than a plain :py:class:`Structure`
     :raises IOError: if the file cannot be opened
     :raises ValueError: if the file is not of correct format
 
@@ -133,7 +135,7 @@ def parse_gjf(file_name):
     else:
         bonds = []
 
-    structure = Structure(title)
+    structure = (ArrayStructure if array_backed else Structure)(title)
     structure.extend_atms(atms)
     structure.extend_bonds(bonds)
     structure.set_latt_vecs(latt_vecs)
@@ -3,7 +3,11 @@ The main driver module for the code
 ===================================
 
 This module contains the main driver function for the code, which should be
-called by the executable of the program.
+called by the executable of the program. When multiple input files or a
+manifest of jobs are given, or a checkpoint file is given for resuming the
+batch, the inputs are rendered in the batch mode of the :py:mod:`batchrender`
+module. The parsed configuration files can be cached on the disk, see
+:py:mod:`configcache`.
 
 """
 
@@ -11,18 +15,23 @@ called by the executable of the program.
 import argparse
 
 from .renderdriver import render_driver
+from .batchrender import form_jobs, read_manifest, run_batch
+from .configcache import get_config_cache
+from .util import terminate_program
 
 
-def main():
+def add_job_arguments(parser):
 
-    """The main driver function"""
+    """Adds the arguments specifying the rendering jobs to a parser
 
-    parser = argparse.ArgumentParser(
-        description='Plotting the molecule from an input file',
-        epilog='by Tschijnmo TSCHAU <tschijnmotschau@gmail.com>'
-        )
-    parser.add_argument('INPUT', metavar='FILE', type=str, nargs=1,
-                        help='The name of the input file')
+    The arguments are shared by the main program and the client of the render
+    daemon.
+
+    """
+
+    parser.add_argument('INPUT', metavar='FILE', type=str, nargs='*',
+                        help='The name of the input file, multiple input '
+                        'files are rendered in the batch mode')
     parser.add_argument('-r', '--reader', type=str, default='gjf',
                         choices=['gjf', ],
                         help='The reader for the input file')
@@ -37,11 +46,112 @@ def main():
                         help='The molecule level JSON/YAML configuration file'
                         ', can be set to `input-title` to use the title of'
                         ' the input file')
-    args = parser.parse_args()
+    parser.add_argument('--manifest', type=str,
+                        help='The JSON lines manifest of jobs for the batch '
+                        'mode')
+
+    return None
+
+
+def form_cli_jobs(parser, args):
+
+    """Forms the list of jobs from the parsed command line arguments
+
+    The output file can only be given when there is a single input file.
+
+    :param parser: The argument parser, for reporting the errors
+    :param args: The parsed arguments
+    :returns: The list of job dictionaries of the format in
+        :py:mod:`batchrender`
+
+    """
+
+    if len(args.INPUT) == 0 and args.manifest is None:
+        parser.error('No input file is given')
+    if args.output is not None and (
+            args.manifest is not None or len(args.INPUT) > 1
+    ):
+        parser.error('The output file cannot be given in the batch mode')
 
-    render_driver(
-        args.INPUT[0], args.reader, args.molecule_option,
-        args.project_option, args.output, args.keep
+    defaults = {
+        'output': None,
+        'reader': args.reader,
+        'molecule-option': args.molecule_option,
+        'project-option': args.project_option,
+        'keep': args.keep,
+        }
+    jobs = form_jobs(args.INPUT, defaults)
+    if args.output is not None:
+        jobs[0]['output'] = args.output
+
+    if args.manifest is not None:
+        try:
+            jobs.extend(read_manifest(args.manifest, defaults))
+        except IOError:
+            terminate_program(
+                'Manifest file %s cannot be opened!' % args.manifest
+                )
+        except ValueError as verr:
+            terminate_program(verr.args[0])
+
+    return jobs
+
+
+def main():
+
+    """The main driver function"""
+
+    parser = argparse.ArgumentParser(
+        description='Plotting the molecule from an input file',
+        epilog='by Tschijnmo TSCHAU <tschijnmotschau@gmail.com>'
         )
+    add_job_arguments(parser)
+    parser.add_argument('-j', '--workers', type=int,
+                        help='The number of processes for generating the '
+                        'scenes in the batch mode, default to the number of '
+                        'processors')
+    parser.add_argument('--max-renders', type=int, default=1,
+                        help='The maximum number of concurrent pov-ray '
+                        'processes in the batch mode')
+    parser.add_argument('--cpus', type=int,
+                        help='The number of processors shared by the pov-ray '
+                        'processes in the batch mode, default to all the '
+                        'available ones')
+    parser.add_argument('--pin-cpus', action='store_true',
+                        help='Pin the pov-ray processes to their allocated '
+                        'processors in the batch mode')
+    parser.add_argument('--checkpoint', type=str,
+                        help='The checkpoint file for resuming the batch '
+                        'mode, the jobs recorded as done are skipped unless '
+                        'their input, options, or the package version changed')
+    parser.add_argument('--config-cache-dir', type=str,
+                        help='The directory for caching the parsed '
+                        'configuration files on the disk')
+    args = parser.parse_args()
+
+    jobs = form_cli_jobs(parser, args)
+
+    if args.config_cache_dir is not None:
+        try:
+            get_config_cache().set_cache_dir(args.config_cache_dir)
+        except OSError as err:
+            terminate_program('Config cache cannot be created: %s' % err)
+
+    if args.manifest is None and args.checkpoint is None and len(jobs) == 1:
+        render_driver(
+            args.INPUT[0], args.reader, args.molecule_option,
+            args.project_option, args.output, args.keep
+            )
+        return 0
+
+    try:
+        results = run_batch(
+            jobs, args.workers, args.max_renders, args.cpus, args.pin_cpus,
+            args.checkpoint
+            )
+    except ValueError as verr:
+        terminate_program(verr.args[0])
+    except IOError as err:
+        terminate_program('Checkpoint file cannot be read: %s' % err)
 
-    return 0
+    return 0 if all(i.status == 'ok' for i in results) else 1
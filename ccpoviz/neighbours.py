@@ -0,0 +1,342 @@
+"""
+Fast neighbour search for bond detection
+========================================
+
+Testing every pair of atoms for bonding is quadratic in the number of atoms.
+Here a binned cell-list search is implemented instead. The space is divided
+into cubic cells with the edge being the largest possible bonding cutoff, so
+that any two bonded atoms are either in the same cell or in two adjacent cells.
+Only the pairs of atoms within these cells are tested.
+
+Rather than looping over the cells in Python, the candidate pairs for all the
+cell pairs with the same relative offset are generated at once by numpy, in
+chunks of bounded size to limit the memory usage for very large systems.
+
+For periodic structures, the atoms are first wrapped into the unit cell. Then
+ghost images of the atoms lying within the cutoff of the cell faces are added
+before the search, so that the bonds across the cell boundaries can be found
+without building any supercell. The lattice vectors can be of any triclinic
+shape, and one- and two-dimensional periodicity is also supported.
+
+"""
+
+import itertools
+
+import numpy as np
+from numpy import linalg
+
+
+# The maximum number of candidate pairs to be tested in one numpy batch, for
+# bounding the memory usage.
+CHUNK_SIZE = 2 ** 22
+
+
+def _half_shell_offsets():
+
+    """Gets the cell offsets to be searched for each cell
+
+    Only half of the 26 neighbouring cells needs to be searched since the
+    other half is covered when the search is started from the neighbour. The
+    zero offset for the cell itself comes first.
+
+    """
+
+    zero = (0, 0, 0)
+    return [zero] + [
+        i for i in itertools.product((-1, 0, 1), repeat=3) if i > zero
+        ]
+
+
+def bin_atoms(coords, cell_size):
+
+    """Puts the atoms into cubic cells
+
+    :param coords: The (N, 3) array of the coordinates
+    :param cell_size: The edge length of the cubic cells
+    :returns: A tuple of the (3, ) array for the number of cells in each
+        direction, the atom indices sorted by their cell, the sorted array of
+        linear indices of the occupied cells, the (K, 3) array of the three-
+        dimensional indices of the occupied cells, and the arrays of the
+        beginning positions and the numbers of atoms for the occupied cells in
+        the sorted atom indices.
+
+    """
+
+    origin = coords.min(axis=0)
+    idx3 = np.floor((coords - origin) / cell_size).astype(np.int64)
+    dims = idx3.max(axis=0) + 1
+
+    linear = (idx3[:, 0] * dims[1] + idx3[:, 1]) * dims[2] + idx3[:, 2]
+    order = np.argsort(linear, kind='mergesort')
+    cell_ids, starts, counts = np.unique(
+        linear[order], return_index=True, return_counts=True
+        )
+    cell_idx3 = idx3[order[starts]]
+
+    return dims, order, cell_ids, cell_idx3, starts, counts
+
+
+def _find_neighbour_cells(dims, cell_ids, cell_idx3, offset):
+
+    """Finds the pairs of occupied cells with the given offset
+
+    :returns: A pair of arrays for the positions of the first and the second
+        cells of the pairs in the occupied cells list.
+
+    """
+
+    nb_idx3 = cell_idx3 + np.array(offset, dtype=np.int64)
+    valid = np.all((nb_idx3 >= 0) & (nb_idx3 < dims), axis=1)
+    nb_ids = (
+        (nb_idx3[:, 0] * dims[1] + nb_idx3[:, 1]) * dims[2] + nb_idx3[:, 2]
+        )
+
+    pos = np.searchsorted(cell_ids, nb_ids)
+    pos = np.minimum(pos, len(cell_ids) - 1)
+    valid &= cell_ids[pos] == nb_ids
+
+    return np.nonzero(valid)[0], pos[valid]
+
+
+def _expand_cell_pairs(order, beg1, cnt1, beg2, cnt2):
+
+    """Expands pairs of cells into the pairs of atoms in them
+
+    :param order: The atom indices sorted by their cells
+    :param beg1: The beginning positions of the first cells
+    :param cnt1: The number of atoms in the first cells
+    :param beg2: The beginning positions of the second cells
+    :param cnt2: The number of atoms in the second cells
+    :returns: Two arrays for the atom indices of the pairs
+
+    """
+
+    n_pairs = cnt1 * cnt2
+    ends = np.cumsum(n_pairs)
+    if len(ends) == 0 or ends[-1] == 0:
+        empty = np.empty((0, ), dtype=np.int64)
+        return empty, empty
+
+    owner = np.repeat(np.arange(len(n_pairs)), n_pairs)
+    local = np.arange(ends[-1]) - (ends - n_pairs)[owner]
+    stride = cnt2[owner]
+
+    return (
+        order[beg1[owner] + local // stride],
+        order[beg2[owner] + local % stride]
+        )
+
+
+def _gen_candidates(order, starts, counts, cells1, cells2):
+
+    """Generates the candidate atom pairs in chunks of bounded size"""
+
+    n_pairs = counts[cells1] * counts[cells2]
+    cum = np.cumsum(n_pairs)
+    if len(cum) == 0:
+        return
+
+    bounds = [0] + list(
+        np.searchsorted(cum, np.arange(CHUNK_SIZE, cum[-1], CHUNK_SIZE))
+        ) + [len(cum)]
+
+    for beg, end in zip(bounds[:-1], bounds[1:]):
+        if beg == end:
+            continue
+        sel1 = cells1[beg:end]
+        sel2 = cells2[beg:end]
+        yield _expand_cell_pairs(
+            order, starts[sel1], counts[sel1], starts[sel2], counts[sel2]
+            )
+
+
+def find_bonded_pairs(coords, radii):
+
+    """Finds all the pairs of atoms closer than the sum of their radii
+
+    :param coords: The (N, 3) array of the coordinates of the atoms
+    :param radii: The (N, ) array of the covalent radii of the atoms
+    :returns: Two integral arrays for the indices of the first and the second
+        atoms in the bonded pairs. The first index is always less than the
+        second one, and the pairs are sorted.
+
+    """
+
+    coords = np.asarray(coords, dtype=np.float64).reshape((-1, 3))
+    radii = np.asarray(radii, dtype=np.float64)
+
+    idx1_list = []
+    idx2_list = []
+    cutoff = 2.0 * radii.max() if coords.shape[0] > 1 else 0.0
+    if cutoff > 0.0:
+
+        dims, order, cell_ids, cell_idx3, starts, counts = bin_atoms(
+            coords, cutoff
+            )
+
+        for offset in _half_shell_offsets():
+            cells1, cells2 = _find_neighbour_cells(
+                dims, cell_ids, cell_idx3, offset
+                )
+            for idx1, idx2 in _gen_candidates(
+                    order, starts, counts, cells1, cells2
+            ):
+                if offset == (0, 0, 0):
+                    # Atoms in the same cell, count each pair once
+                    sel = idx1 < idx2
+                    idx1 = idx1[sel]
+                    idx2 = idx2[sel]
+
+                diff = coords[idx2] - coords[idx1]
+                dist2 = np.einsum('ij,ij->i', diff, diff)
+                threshold = radii[idx1] + radii[idx2]
+                bonded = dist2 < threshold * threshold
+
+                idx1_list.append(np.minimum(idx1, idx2)[bonded])
+                idx2_list.append(np.maximum(idx1, idx2)[bonded])
+
+    if len(idx1_list) == 0:
+        empty = np.empty((0, ), dtype=np.int64)
+        return empty, empty
+
+    idx1 = np.concatenate(idx1_list)
+    idx2 = np.concatenate(idx2_list)
+    sort_order = np.lexsort((idx2, idx1))
+
+    return idx1[sort_order], idx2[sort_order]
+
+
+def _complete_basis(latt_vecs):
+
+    """Completes the lattice vectors into a basis for the space
+
+    For lower-dimensional periodicity, unit vectors perpendicular to the given
+    lattice vectors are added for the non-periodic directions.
+
+    :returns: The (3, 3) array with the basis vectors as rows, and the number
+        of periodic directions, which come first in the basis.
+
+    """
+
+    latt = np.array(latt_vecs, dtype=np.float64).reshape((-1, 3))
+    n_periodic = latt.shape[0]
+
+    if n_periodic == 0:
+        basis = np.identity(3)
+    elif n_periodic == 1:
+        trial = np.identity(3)[np.argmin(np.abs(latt[0]))]
+        extra1 = np.cross(latt[0], trial)
+        extra2 = np.cross(latt[0], extra1)
+        basis = np.vstack((
+            latt, extra1 / linalg.norm(extra1), extra2 / linalg.norm(extra2)
+            ))
+    elif n_periodic == 2:
+        extra = np.cross(latt[0], latt[1])
+        basis = np.vstack((latt, extra / linalg.norm(extra)))
+    elif n_periodic == 3:
+        basis = latt
+    else:
+        raise ValueError('More than three lattice vectors are given')
+
+    return basis, n_periodic
+
+
+def _is_positive_image(images):
+
+    """Tests if the images are lexicographically positive"""
+
+    return (
+        (images[:, 0] > 0) |
+        ((images[:, 0] == 0) & (images[:, 1] > 0)) |
+        ((images[:, 0] == 0) & (images[:, 1] == 0) & (images[:, 2] > 0))
+        )
+
+
+def find_periodic_bonded_pairs(coords, radii, latt_vecs):
+
+    """Finds the bonded pairs of atoms with periodic boundary conditions
+
+    :param coords: The (N, 3) array of the coordinates of the atoms
+    :param radii: The (N, ) array of the covalent radii of the atoms
+    :param latt_vecs: The list of lattice vectors, can be empty for molecules
+    :returns: Three integral arrays, the first two give the indices of the
+        atoms in the bonded pairs, as in :py:func:`find_bonded_pairs`. The
+        third one is an (M, P) array, with P being the number of lattice
+        vectors, for the periodic image of the second atom that the first atom
+        is bonded to, in units of the lattice vectors. So the second end of
+        the bond is at the coordinate of the second atom translated by the
+        image dotted into the lattice vectors. Note that for small cells, the
+        same pair of atoms could be bonded with several images, or an atom
+        could be bonded to its own image, with the first index equal to the
+        second one.
+
+    """
+
+    # pylint: disable=too-many-locals
+
+    coords = np.asarray(coords, dtype=np.float64).reshape((-1, 3))
+    radii = np.asarray(radii, dtype=np.float64)
+    n_atms = coords.shape[0]
+    basis, n_periodic = _complete_basis(latt_vecs)
+
+    cutoff = 2.0 * radii.max() if n_atms > 0 else 0.0
+    if n_periodic == 0 or cutoff <= 0.0:
+        idx1, idx2 = find_bonded_pairs(coords, radii)
+        return idx1, idx2, np.zeros((len(idx1), n_periodic), dtype=np.int64)
+
+    # Wrap the atoms into the unit cell
+    recip = linalg.inv(basis)
+    frac = np.dot(coords, recip)
+    shifts = np.zeros((n_atms, 3), dtype=np.int64)
+    shifts[:, :n_periodic] = np.floor(frac[:, :n_periodic])
+    frac -= shifts
+    wrapped = coords - np.dot(shifts, basis)
+
+    # The thickness of the slab within the cutoff of the cell faces, in
+    # fractional coordinates.
+    thickness = cutoff * np.sqrt((recip ** 2).sum(axis=0))[:n_periodic]
+    n_images = np.ceil(thickness).astype(np.int64)
+
+    ext_coords = [wrapped]
+    ext_radii = [radii]
+    owners = [np.arange(n_atms)]
+    trans = [np.zeros((n_atms, 3), dtype=np.int64)]
+    for image in itertools.product(*(
+            [xrange(-i, i + 1) for i in n_images] +
+            [[0]] * (3 - n_periodic)
+    )):
+        if not any(image):
+            continue
+        image = np.array(image, dtype=np.int64)
+        moved = frac[:, :n_periodic] + image[:n_periodic]
+        sel = np.nonzero(np.all(
+            (moved > -thickness) & (moved < 1.0 + thickness), axis=1
+            ))[0]
+        ext_coords.append(wrapped[sel] + np.dot(image, basis))
+        ext_radii.append(radii[sel])
+        owners.append(sel)
+        trans.append(np.tile(image, (len(sel), 1)))
+
+    ext1, ext2 = find_bonded_pairs(
+        np.concatenate(ext_coords), np.concatenate(ext_radii)
+        )
+    owners = np.concatenate(owners)
+    trans = np.concatenate(trans)
+
+    # Only keep the bonds from the atoms in the cell, with each bond across
+    # the boundary kept only once.
+    home = ext1 < n_atms
+    idx1 = ext1[home]
+    idx2 = owners[ext2[home]]
+    images = trans[ext2[home]]
+    kept = (idx1 < idx2) | ((idx1 == idx2) & _is_positive_image(images))
+    idx1 = idx1[kept]
+    idx2 = idx2[kept]
+    images = (images[kept] + shifts[idx1] - shifts[idx2])[:, :n_periodic]
+
+    sort_order = np.lexsort(
+        tuple(images[:, i] for i in reversed(xrange(n_periodic))) +
+        (idx2, idx1)
+        )
+
+    return idx1[sort_order], idx2[sort_order], images[sort_order]
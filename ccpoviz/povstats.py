@@ -0,0 +1,276 @@
+"""
+Statistics of the pov-ray renders
+=================================
+
+At the end of a render, pov-ray prints the statistics of the parsing and
+tracing of the scene, and the progress of the tracing is printed during the
+render. In this module, the output of pov-ray is parsed into a dictionary of
+the statistics, which can be written into a JSON file for tracking the cost of
+the renders. The output formats of both pov-ray 3.6 and 3.7 are supported,
+and the statistics not found in the output are set to None. The fields are
+
+parse_time, bounding_time, photon_time, radiosity_time, trace_time
+  The wall times of the stages in seconds.
+
+trace_threads, trace_cpu_time
+  The number of threads for tracing and their total processor time.
+
+pixels, samples, rays, rays_saved
+  The numbers of the pixels, samples, and rays traced, and the rays saved.
+
+finite_objects, infinite_objects, light_sources, total_objects
+  The numbers of the objects in the scene.
+
+bounding_boxes, bounding_threshold
+  If bounding boxes are used, and the threshold number of objects for them.
+
+intersections
+  The dictionary from the kinds of shapes to the pairs of the numbers of the
+  ray intersection tests and the succeeded ones.
+
+peak_memory
+  The peak memory used in bytes.
+
+percent_complete
+  The percentage of the tracing that is done, according to the last progress
+  report, and 100 when the tracing is finished.
+
+The statistics are written to a file with the extension ``.stats.json`` next
+to the image when the ``render-stats`` option is set, with the wall time of
+the whole pov-ray run and the number of work threads added.
+
+"""
+
+import json
+import re
+
+
+# The pattern for the times in the statistics, like
+#     0 hours  0 minutes  1 seconds (1.258 seconds)
+# where the part in the parentheses is absent for pov-ray 3.6
+_TIME = (
+    r'(\d+) hours?\s+(\d+) minutes?\s+([\d.]+) seconds?'
+    r'(?:\s*\(([\d.]+) seconds?\))?'
+    )
+
+# The patterns for the times of the stages
+TIME_PATTERNS = [
+    ('parse_time', r'(?:Parse Time:|Time For Parse:)'),
+    ('bounding_time', r'Bounding Time:'),
+    ('photon_time', r'(?:Photon Time:|Time For Photon:)'),
+    ('radiosity_time', r'Radiosity Time:'),
+    ('trace_time', r'(?:Trace Time:|Time For Trace:)'),
+    ]
+
+# The patterns for the integral statistics
+COUNT_PATTERNS = [
+    ('pixels', r'^\s*Pixels:\s+(\d+)'),
+    ('samples', r'Samples:\s+(\d+)'),
+    ('rays', r'^\s*(?:Number of )?Rays:\s+(\d+)'),
+    ('rays_saved', r'Saved:\s+(\d+)'),
+    ('finite_objects', r'Finite Objects:\s+(\d+)'),
+    ('infinite_objects', r'Infinite Objects:\s+(\d+)'),
+    ('light_sources', r'Light Sources:\s+(\d+)'),
+    ('total_objects', r'^\s*Total:\s+(\d+)'),
+    ('bounding_threshold', r'Bounding threshold:\s*(\d+)'),
+    ('peak_memory', r'Peak memory used:\s+(\d+) bytes'),
+    ]
+
+# The pattern for the threads and processor time of the tracing
+_TRACE_CPU = re.compile(
+    r'Trace Time:[^\n]*\n\s*using (\d+) thread\(s\) with ([\d.]+) '
+    r'CPU-seconds'
+    )
+
+# The pattern for the usage of bounding boxes
+_BOUNDING_BOXES = re.compile(r'Bounding boxes\.*\s*(On|Off)', re.IGNORECASE)
+
+# The patterns for the progress reports of pov-ray 3.7 and 3.6
+_PROGRESS = re.compile(
+    r'Rendered (\d+) of (\d+) pixels|Rendering line (\d+) of (\d+)'
+    )
+
+# The pattern for the rows of the table of intersection tests
+_INTERSECTION_HEAD = re.compile(r'Ray->Shape Intersection')
+_INTERSECTION_ROW = re.compile(
+    r'^\s*([A-Za-z][\w ./-]*?)\s+(\d+)\s+(\d+)(?:\s+[\d.]+)?\s*$'
+    )
+
+# The extension of the statistics files
+STATS_EXT = '.stats.json'
+
+
+def _parse_time(match):
+
+    """Gets the time in seconds from a match of the time pattern"""
+
+    if match.group(4) is not None:
+        return float(match.group(4))
+    else:
+        return (
+            int(match.group(1)) * 3600.0 + int(match.group(2)) * 60.0 +
+            float(match.group(3))
+            )
+
+
+def _parse_intersections(output):
+
+    """Parses the table of the ray intersection tests
+
+    The table starts after its header and a line of dashes, and ends at the
+    next line of dashes.
+
+    """
+
+    intersections = {}
+    lines = output.splitlines()
+
+    for idx, line in enumerate(lines):
+        if _INTERSECTION_HEAD.search(line) is None:
+            continue
+        for row in lines[idx + 2:]:
+            if row.strip().startswith('---'):
+                break
+            match = _INTERSECTION_ROW.match(row)
+            if match is not None:
+                intersections[match.group(1)] = [
+                    int(match.group(2)), int(match.group(3))
+                    ]
+        break
+
+    return intersections
+
+
+def parse_progress(output):
+
+    """Gets the percentage of the tracing done from the last progress report
+
+    :returns: The percentage, or None when no progress is reported
+
+    """
+
+    matches = _PROGRESS.findall(output)
+    if len(matches) == 0:
+        return None
+
+    last = matches[-1]
+    done, total = (last[0], last[1]) if last[0] != '' else (last[2], last[3])
+    if int(total) == 0:
+        return None
+
+    return 100.0 * int(done) / int(total)
+
+
+def parse_stats(output):
+
+    """Parses the statistics from the output of pov-ray
+
+    :param output: The string of the output of pov-ray
+    :returns: The dictionary of the statistics
+
+    """
+
+    stats = {}
+
+    for field, head in TIME_PATTERNS:
+        match = re.search(head + r'\s*' + _TIME, output)
+        stats[field] = None if match is None else _parse_time(match)
+
+    for field, pattern in COUNT_PATTERNS:
+        match = re.search(pattern, output, re.MULTILINE)
+        stats[field] = None if match is None else int(match.group(1))
+
+    match = _TRACE_CPU.search(output)
+    if match is None:
+        stats['trace_threads'] = None
+        stats['trace_cpu_time'] = None
+    else:
+        stats['trace_threads'] = int(match.group(1))
+        stats['trace_cpu_time'] = float(match.group(2))
+
+    match = _BOUNDING_BOXES.search(output)
+    if match is None:
+        stats['bounding_boxes'] = None
+    else:
+        stats['bounding_boxes'] = match.group(1).lower() == 'on'
+
+    stats['intersections'] = _parse_intersections(output)
+
+    if stats['trace_time'] is not None:
+        stats['percent_complete'] = 100.0
+    else:
+        stats['percent_complete'] = parse_progress(output)
+
+    return stats
+
+
+def merge_stats(stats_list):
+
+    """Merges the statistics of the tiles of a tiled render
+
+    The numbers of the pixels, rays, and intersection tests, and the processor
+    times are added. The wall times, the peak memory, and the threads are
+    taken as their maxima, and the other statistics from the first tile, while
+    the percentage of completion is the average over the tiles reporting it.
+
+    """
+
+    if len(stats_list) == 0:
+        return parse_stats('')
+
+    added = [
+        'pixels', 'samples', 'rays', 'rays_saved', 'trace_cpu_time'
+        ]
+    maximum = [i[0] for i in TIME_PATTERNS] + ['peak_memory', 'trace_threads']
+
+    merged = dict(stats_list[0])
+
+    for field in added + maximum:
+        values = [i[field] for i in stats_list if i[field] is not None]
+        if len(values) == 0:
+            merged[field] = None
+        elif field in added:
+            merged[field] = sum(values)
+        else:
+            merged[field] = max(values)
+
+    intersections = {}
+    for stats in stats_list:
+        for shape, counts in stats['intersections'].items():
+            prev = intersections.get(shape, [0, 0])
+            intersections[shape] = [prev[0] + counts[0], prev[1] + counts[1]]
+    merged['intersections'] = intersections
+
+    percents = [
+        i['percent_complete'] for i in stats_list
+        if i['percent_complete'] is not None
+        ]
+    if len(percents) == 0:
+        merged['percent_complete'] = None
+    else:
+        merged['percent_complete'] = sum(percents) / len(percents)
+
+    return merged
+
+
+def get_stats_file(output_file):
+
+    """Gets the name of the statistics file for an output file"""
+
+    return output_file.split('.')[0] + STATS_EXT
+
+
+def write_stats(output_file, stats):
+
+    """Writes the statistics into the file next to the output file
+
+    :returns: The name of the statistics file
+
+    """
+
+    stats_file = get_stats_file(output_file)
+    with open(stats_file, 'w') as stats_out:
+        json.dump(stats, stats_out, indent=2, sort_keys=True)
+        stats_out.write('\n')
+
+    return stats_file
@@ -10,17 +10,19 @@ given input file with a given reader. The reader is given as a string.
 from .gjfreader import parse_gjf
 
 
-def read_structure(input_file, reader):
+def read_structure(input_file, reader, array_backed=False):
 
     """Reads a structure from a input file
 
     :param input_file: The file name of the input file
     :param reader: A string giving the reader for reading the file
+    :param array_backed: If the structure is going to be read into the
+        array-backed structure class, which is advised for large systems
     :returns: A structure object containing the molecule that is read
 
     """
 
     if reader == 'gjf':
-        return parse_gjf(input_file)
+        return parse_gjf(input_file, array_backed=array_backed)
     else:
         raise ValueError('Input file unreadable')
@@ -0,0 +1,386 @@
+"""
+Content-addressed cache of rendered images
+==========================================
+
+Rendering the same scene with the same pov-ray settings always gives the same
+image, so the rendered images can be cached and reused. In this module, the
+images are cached in a directory under keys formed from the hash of the
+content of the pov-ray scene, including the side data files of the compact
+encoding, together with the pov-ray arguments affecting the image, like the
+size, quality, anti-aliasing, and alpha channel. On a hit, the cached image is
+copied, or hard-linked when requested, to the output file rather than invoking
+pov-ray. Since pov-ray overwrites the output file in place, the output file is
+always removed before rendering, see :py:func:`remove_output`, so that a new
+image never goes into a cached one linked to it, and the cached images are
+made read-only.
+
+The total size of the cached images is bounded, with the least recently used
+images evicted first. The use of an image is recorded by its modification
+time, which is updated on every hit. The numbers of hits, misses, stores, and
+evictions are counted for the current process, and accumulated across runs in
+the file ``stats.json`` in the cache directory.
+
+The cache is enabled by setting the ``render-cache-dir`` option to the cache
+directory, and its size in megabytes is set by ``render-cache-size``.
+
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from .streampov import DATA_FILE_SUFFIXES
+from .turntable import is_turntable
+
+
+# The version of the format of the keys, to be bumped when it is changed
+KEY_VERSION = 'ccpoviz-render-cache-1'
+
+# The size of the chunks for hashing files in bytes
+HASH_CHUNK_SIZE = 2 ** 20
+
+# The extension of the cached images
+IMAGE_EXT = '.png'
+
+# The permissions of the cached images, read-only for everyone
+IMAGE_MODE = 0o444
+
+# The name of the file for the accumulated statistics
+STATS_FILE = 'stats.json'
+
+# The fields of the statistics
+STATS_FIELDS = ['hits', 'misses', 'stores', 'evictions']
+
+
+def hash_file(hasher, file_name):
+
+    """Updates the hasher by the content of a file"""
+
+    with open(file_name, 'rb') as input_file:
+        while True:
+            chunk = input_file.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+
+    return None
+
+
+def remove_output(output_file):
+
+    """Removes the existing output file before rendering into it
+
+    The output file can be hard-linked to an image in the cache, which would
+    be overwritten by the new image, so it is removed to have the new image
+    written into a new file.
+
+    :raises OSError: if the existing file cannot be removed
+
+    """
+
+    if os.path.lexists(output_file):
+        os.remove(output_file)
+
+    return None
+
+
+def normalize_args(pov_args):
+
+    """Normalizes the pov-ray arguments for forming the cache keys
+
+    The input and output files and the number of work threads do not affect
+    the rendered image, so they are removed from the arguments.
+
+    """
+
+    return [
+        i for i in pov_args
+        if not (i.startswith('+I') or i.startswith('+O') or
+                i.startswith('+WT'))
+        ]
+
+
+def form_key(pov_args, input_file, extra=()):
+
+    """Forms the cache key for rendering a scene
+
+    When side data files exist for the scene, their contents are hashed
+    after the scene, where their absolute paths are replaced by their
+    suffixes, so that the key does not depend on the name of the output.
+
+    :param pov_args: The list of pov-ray arguments, with the program first
+    :param input_file: The name of the pov-ray input file
+    :param extra: Additional strings affecting the rendered image
+    :returns: The hexadecimal string for the key
+
+    """
+
+    hasher = hashlib.sha256()
+
+    for field in [KEY_VERSION] + normalize_args(pov_args) + list(extra):
+        hasher.update(field.encode('utf-8') + b'\0')
+
+    base_name = input_file[0:-len('.pov')]
+    data_files = [
+        (suffix, base_name + suffix) for suffix in DATA_FILE_SUFFIXES
+        if os.path.exists(base_name + suffix)
+        ]
+
+    if len(data_files) == 0:
+        hash_file(hasher, input_file)
+    else:
+        with open(input_file, 'rb') as pov_file:
+            scene = pov_file.read()
+        for suffix, data_file in data_files:
+            scene = scene.replace(
+                os.path.abspath(data_file).encode('utf-8'),
+                suffix.encode('utf-8')
+                )
+        hasher.update(scene)
+        for suffix, data_file in data_files:
+            hasher.update(b'\0' + suffix.encode('utf-8') + b'\0')
+            hash_file(hasher, data_file)
+
+    return hasher.hexdigest()
+
+
+class RenderCache(object):
+
+    """The cache of rendered images in a directory
+
+    .. py:attribute:: cache_dir
+
+      The directory of the cache.
+
+    .. py:attribute:: max_size
+
+      The maximum total size of the cached images in bytes.
+
+    .. py:attribute:: link
+
+      If the cached images are hard-linked to the output files rather than
+      copied.
+
+    .. py:attribute:: stats
+
+      The dictionary of the statistics of the current process.
+
+    """
+
+    __slots__ = [
+        'cache_dir',
+        'max_size',
+        'link',
+        'stats',
+        ]
+
+    def __init__(self, cache_dir, max_size, link=False):
+
+        """Initializes the cache, creating the directory when needed
+
+        :param cache_dir: The directory of the cache, with ``~`` expanded
+        :param max_size: The maximum total size of the images in megabytes
+        :param link: If the images are hard-linked to the output files
+        :raises ValueError: if the size is not positive
+        :raises OSError: if the directory cannot be created
+
+        """
+
+        if max_size <= 0:
+            raise ValueError(
+                'The size of the render cache needs to be positive'
+                )
+
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_size = int(max_size * 2 ** 20)
+        self.link = link
+        self.stats = dict((i, 0) for i in STATS_FIELDS)
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def _get_path(self, key):
+
+        """Gets the path of the cached image for a key"""
+
+        return os.path.join(self.cache_dir, key + IMAGE_EXT)
+
+    def fetch(self, key, output_file):
+
+        """Fetches the cached image for a key into the output file
+
+        The existing output file is removed even on a miss, so that it is
+        never a link to a cached image when it is rendered again.
+
+        :returns: If the image is found in the cache
+
+        """
+
+        path = self._get_path(key)
+
+        try:
+            remove_output(output_file)
+            os.utime(path, None)
+            if self.link:
+                try:
+                    os.link(path, output_file)
+                except OSError:
+                    shutil.copyfile(path, output_file)
+            else:
+                shutil.copyfile(path, output_file)
+        except (IOError, OSError):
+            self.stats['misses'] += 1
+            return False
+
+        self.stats['hits'] += 1
+        return True
+
+    def store(self, key, output_file):
+
+        """Stores a rendered image into the cache under a key
+
+        The image is first copied to a temporary file in the cache directory
+        and then made read-only and renamed, so that a partial image is never
+        visible and the linked output files cannot change it. The least
+        recently used images are evicted afterwards when the cache is over
+        its size.
+
+        """
+
+        handle, tmp_name = tempfile.mkstemp(
+            suffix='.tmp', dir=self.cache_dir
+            )
+        os.close(handle)
+
+        try:
+            shutil.copyfile(output_file, tmp_name)
+            os.chmod(tmp_name, IMAGE_MODE)
+            os.rename(tmp_name, self._get_path(key))
+        except (IOError, OSError):
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+        self.stats['stores'] += 1
+        self.evict()
+
+        return None
+
+    def evict(self):
+
+        """Evicts the least recently used images until the cache fits"""
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(IMAGE_EXT):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total_size = sum(i[1] for i in entries)
+
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            self.stats['evictions'] += 1
+
+        return None
+
+    def save_stats(self):
+
+        """Adds the statistics of the current process to the saved ones
+
+        The statistics are saved on a best-effort basis, so failures are
+        silently ignored.
+
+        :returns: The dictionary of the accumulated statistics
+
+        """
+
+        stats_file = os.path.join(self.cache_dir, STATS_FILE)
+        try:
+            with open(stats_file, 'r') as saved:
+                total = json.load(saved)
+        except (IOError, ValueError):
+            total = {}
+
+        for field in STATS_FIELDS:
+            total[field] = total.get(field, 0) + self.stats[field]
+
+        try:
+            handle, tmp_name = tempfile.mkstemp(
+                suffix='.tmp', dir=self.cache_dir
+                )
+            with os.fdopen(handle, 'w') as tmp_file:
+                json.dump(total, tmp_file)
+            os.rename(tmp_name, stats_file)
+        except (IOError, OSError):
+            pass
+
+        return total
+
+    def format_stats(self):
+
+        """Formats the statistics of the current process for the report"""
+
+        n_lookups = self.stats['hits'] + self.stats['misses']
+        if n_lookups > 0:
+            ratio = 100.0 * self.stats['hits'] / n_lookups
+        else:
+            ratio = 0.0
+
+        return (
+            'Render cache %s: %d hits, %d misses (%.1f%% hit rate), '
+            '%d stored, %d evicted'
+            ) % (
+                self.cache_dir, self.stats['hits'], self.stats['misses'],
+                ratio, self.stats['stores'], self.stats['evictions']
+                )
+
+
+def form_render_key(pov_args, input_file, ops_dict):
+
+    """Forms the cache key for the final render according to the options
+
+    The tiling of the image is also included in the key, since the borders of
+    the tiles can be slightly different from the image rendered at once.
+
+    """
+
+    if ops_dict['tile-count'] > 1:
+        extra = ['tiles', str(ops_dict['tile-count']), ops_dict['tile-shape']]
+    else:
+        extra = []
+
+    return form_key(pov_args, input_file, extra)
+
+
+def get_cache(ops_dict):
+
+    """Gets the render cache according to the options
+
+    :returns: The :py:class:`RenderCache`, or None when it is disabled. The
+        cache is always disabled for turntable animations, which do not give
+        a single image.
+
+    """
+
+    if ops_dict['render-cache-dir'] == '' or is_turntable(ops_dict):
+        return None
+    else:
+        return RenderCache(
+            ops_dict['render-cache-dir'], ops_dict['render-cache-size'],
+            ops_dict['render-cache-link']
+            )
@@ -0,0 +1,836 @@
+"""
+The render daemon and its client
+================================
+
+Every invocation of the program pays for starting the interpreter, importing
+the modules, and reading the data files in the package, which can be a
+significant part of the time for small molecules. The render daemon in this
+module keeps all of these loaded in a long-running process, and accepts render
+jobs over a Unix socket.
+
+The jobs are queued by their priority, with the jobs of the same priority run
+in the order of submission. Identical jobs that are queued or running at the
+same time are rendered only once, with all the requests answered by the same
+render, and with the higher priority among them taking effect. The queued jobs
+are dispatched to a :py:class:`asyncrender.RenderLoop`, which generates the
+scenes in a pool of worker processes forked after the data files are loaded.
+Besides the jobs being rendered, as many jobs as the worker processes are
+dispatched, so that the next scenes are generated during the renders.
+
+The protocol is line based, with each line a JSON object. A client sends one
+request on each line, which has the field ``command`` with one of the values
+
+render
+  To render the job in the field ``job``, which is a job dictionary of the
+  format of :py:mod:`batchrender` with all the file names absolute. The
+  optional field ``priority`` gives the priority of the job, higher first, and
+  the response is sent after the render is finished unless the field ``wait``
+  is false.
+
+status
+  To query the status of the daemon.
+
+shutdown
+  To cancel all the jobs and shut down the daemon.
+
+The response to each request is a line of a JSON object, which carries the
+``id`` field of the request when it is given, since the responses to the
+renders are sent in the order of finishing.
+
+The client, :py:func:`client_main`, takes the same command line arguments as
+the main program, so that the program can be used with the daemon by simply
+changing the executable.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import errno
+import heapq
+import json
+import multiprocessing
+import os
+import select
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from .asyncrender import RenderLoop
+from .batchrender import JOB_FIELDS, absolutize_job
+from .getoptions import get_options_schema
+from .main import add_job_arguments, form_cli_jobs
+from .renderdriver import get_output_file
+from .util import get_data_json, get_data_string, terminate_program
+
+
+#
+# Common utilities
+# ----------------
+#
+
+
+# The data files read by the scene generation
+DATA_JSONS = ['defaultoptions.json', 'defaultcolour.json', 'covradius.json']
+DATA_STRINGS = ['default.pov.mustache', 'texturedef.pov.mustache']
+
+# The size of the chunks for reading from the sockets in bytes
+RECV_SIZE = 65536
+
+# The interval in seconds for polling the render loop
+POLL_INTERVAL = 0.05
+
+
+def get_default_socket():
+
+    """Gets the default path of the socket of the daemon for the current user
+    """
+
+    return os.path.join(
+        tempfile.gettempdir(), 'ccpoviz-%d.sock' % os.getuid()
+        )
+
+
+def preload_data():
+
+    """Reads all the data files in the package into the current process
+
+    The default options are also compiled into their schema.
+
+    """
+
+    for name in DATA_JSONS:
+        get_data_json(name)
+    for name in DATA_STRINGS:
+        get_data_string(name)
+    get_options_schema()
+
+    return None
+
+
+def encode_message(message):
+
+    """Encodes a message dictionary into a line of bytes"""
+
+    return json.dumps(message, sort_keys=True).encode('utf-8') + b'\n'
+
+
+def split_messages(buf):
+
+    """Splits the complete lines of messages from a buffer of bytes
+
+    :returns: The list of the decoded messages and the remaining bytes
+    :raises ValueError: if a line is not a valid JSON object
+
+    """
+
+    lines = buf.split(b'\n')
+    messages = []
+    for line in lines[:-1]:
+        if line.strip() == b'':
+            continue
+        message = json.loads(line.decode('utf-8'))
+        if not isinstance(message, dict):
+            raise ValueError('Message is not a JSON object')
+        messages.append(message)
+
+    return messages, lines[-1]
+
+
+def normalize_job(job):
+
+    """Normalizes a job from a request
+
+    The absent fields are filled with their default values, and the default
+    output file is made explicit, so that identical jobs have identical
+    dictionaries.
+
+    :returns: The normalized job dictionary
+    :raises ValueError: if the job is invalid
+
+    """
+
+    if not isinstance(job, dict) or 'input' not in job:
+        raise ValueError('The job needs to be an object with the input file')
+    unknown = sorted(set(job) - set(JOB_FIELDS))
+    if len(unknown) > 0:
+        raise ValueError('Unknown job fields %s' % ', '.join(unknown))
+
+    normalized = {
+        'output': None,
+        'reader': 'gjf',
+        'molecule-option': None,
+        'project-option': None,
+        'keep': False,
+        }
+    normalized.update(job)
+    normalized['output'] = get_output_file(
+        normalized['input'], normalized['output']
+        )
+
+    return normalized
+
+
+#
+# The daemon
+# ----------
+#
+
+
+class Entry(object):
+
+    """The entry of a distinct job in the daemon
+
+    .. py:attribute:: job
+
+      The normalized job dictionary.
+
+    .. py:attribute:: priority
+
+      The highest priority among the requests for the job.
+
+    .. py:attribute:: waiters
+
+      The list of the pairs of the connections and request identifiers to be
+      answered when the job is finished.
+
+    .. py:attribute:: render_job
+
+      The :py:class:`asyncrender.RenderJob` for the job after it is
+      dispatched, None when it is still queued.
+
+    """
+
+    __slots__ = [
+        'job',
+        'priority',
+        'waiters',
+        'render_job',
+        'beg_time',
+        ]
+
+    def __init__(self, job, priority):
+
+        """Initializes a queued entry"""
+
+        self.job = job
+        self.priority = priority
+        self.waiters = []
+        self.render_job = None
+        self.beg_time = time.time()
+
+
+class Connection(object):
+
+    """A connection from a client to the daemon"""
+
+    __slots__ = [
+        'sock',
+        'in_buf',
+        'out_buf',
+        'closing',
+        ]
+
+    def __init__(self, sock):
+
+        """Initializes the connection for a socket"""
+
+        self.sock = sock
+        self.in_buf = b''
+        self.out_buf = b''
+        self.closing = False
+
+    def send(self, message):
+
+        """Queues a message to be sent to the client"""
+
+        self.out_buf += encode_message(message)
+
+        return None
+
+
+class RenderDaemon(object):
+
+    """The render daemon
+
+    .. py:attribute:: socket_path
+
+      The path of the Unix socket that the daemon listens on.
+
+    .. py:attribute:: max_dispatched
+
+      The maximum number of jobs dispatched to the render loop at the same
+      time, the render slots plus the worker processes for the scenes.
+
+    .. py:attribute:: stats
+
+      The dictionary of the counts of the requests and the finished jobs.
+
+    """
+
+    __slots__ = [
+        'socket_path',
+        'max_renders',
+        'max_dispatched',
+        'stats',
+        '_server',
+        '_loop',
+        '_conns',
+        '_entries',
+        '_queue',
+        '_serial',
+        '_running',
+        ]
+
+    def __init__(self, socket_path, n_workers=None, max_renders=1):
+
+        """Initializes the daemon and starts listening on the socket
+
+        :param socket_path: The path of the Unix socket
+        :param n_workers: The number of worker processes for the scene
+            generation, default to the number of processors
+        :param max_renders: The maximum number of jobs rendered at the same
+            time
+        :raises ValueError: if the parameters are invalid or another daemon
+            is already listening on the socket
+        :raises socket.error: if the socket cannot be created
+
+        """
+
+        if max_renders < 1:
+            raise ValueError(
+                'The number of concurrent renders needs to be positive'
+                )
+        if n_workers is None:
+            n_workers = multiprocessing.cpu_count()
+        elif n_workers < 1:
+            raise ValueError(
+                'The number of worker processes needs to be positive'
+                )
+
+        self.socket_path = socket_path
+        self.max_renders = max_renders
+        self.max_dispatched = max_renders + n_workers
+        self.stats = dict(
+            (i, 0) for i in [
+                'requests', 'deduplicated', 'done', 'failed', 'cancelled'
+                ]
+            )
+
+        self._server = _listen(socket_path)
+
+        # The workers are forked after the data files are read, so that they
+        # are shared by all the workers.
+        preload_data()
+        self._loop = RenderLoop(n_workers, max_renders)
+
+        self._conns = {}
+        self._entries = {}
+        self._queue = []
+        self._serial = 0
+        self._running = False
+
+    def serve_forever(self):
+
+        """Serves the requests until the daemon is shut down"""
+
+        self._running = True
+
+        try:
+            while self._running:
+                self.serve_once(POLL_INTERVAL)
+        finally:
+            self.close()
+
+        return None
+
+    def shutdown(self):
+
+        """Requests the daemon to be shut down after the current iteration"""
+
+        self._running = False
+
+        return None
+
+    def serve_once(self, timeout=0.0):
+
+        """Runs one iteration of serving
+
+        :param timeout: The maximum time in seconds to wait for the sockets
+            and the output of pov-ray
+
+        """
+
+        readable = [self._server] + [
+            i.sock for i in self._conns.values() if not i.closing
+            ]
+        writable = [
+            i.sock for i in self._conns.values() if len(i.out_buf) > 0
+            ]
+
+        try:
+            readable, writable, _ = select.select(
+                readable + self._loop.get_fds(), writable, [], timeout
+                )
+        except select.error as err:
+            if err.args[0] != errno.EINTR:
+                raise
+            readable, writable = [], []
+
+        for sock in readable:
+            if sock is self._server:
+                self._accept()
+            elif sock in self._conns:
+                self._read(self._conns[sock])
+
+        for sock in writable:
+            if sock in self._conns:
+                self._write(self._conns[sock])
+
+        self._loop.poll(0.0)
+        self._dispatch()
+
+        for conn in list(self._conns.values()):
+            if conn.closing and len(conn.out_buf) == 0 and not any(
+                    i[0] is conn for j in self._entries.values()
+                    for i in j.waiters
+            ):
+                self._drop(conn)
+
+        return None
+
+    def close(self):
+
+        """Cancels all the jobs, answers the clients, and closes the sockets
+        """
+
+        self._queue = []
+        for entry in list(self._entries.values()):
+            if entry.render_job is None:
+                self._answer(entry, 'cancelled', 'Daemon shut down')
+        self._loop.close()
+
+        for conn in list(self._conns.values()):
+            try:
+                conn.sock.setblocking(True)
+                conn.sock.sendall(conn.out_buf)
+            except socket.error:
+                pass
+            self._drop(conn)
+
+        self._server.close()
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+        return None
+
+    def _accept(self):
+
+        """Accepts a new connection"""
+
+        try:
+            sock, _ = self._server.accept()
+        except socket.error:
+            return None
+
+        sock.setblocking(False)
+        self._conns[sock] = Connection(sock)
+
+        return None
+
+    def _drop(self, conn):
+
+        """Closes a connection and forgets its pending answers"""
+
+        for entry in self._entries.values():
+            entry.waiters = [i for i in entry.waiters if i[0] is not conn]
+        conn.sock.close()
+        del self._conns[conn.sock]
+
+        return None
+
+    def _read(self, conn):
+
+        """Reads and handles the requests from a connection"""
+
+        try:
+            chunk = conn.sock.recv(RECV_SIZE)
+        except socket.error:
+            chunk = b''
+
+        if not chunk:
+            # The client finished sending, the connection is closed after all
+            # the answers are sent.
+            conn.closing = True
+            return None
+
+        try:
+            requests, conn.in_buf = split_messages(conn.in_buf + chunk)
+        except ValueError as err:
+            conn.send({
+                'status': 'error', 'message': 'Invalid request: %s' % err
+                })
+            conn.in_buf = b''
+            conn.closing = True
+            return None
+
+        for request in requests:
+            self._handle(conn, request)
+
+        return None
+
+    def _write(self, conn):
+
+        """Sends the queued messages to a connection"""
+
+        try:
+            n_sent = conn.sock.send(conn.out_buf)
+        except socket.error:
+            self._drop(conn)
+            return None
+
+        conn.out_buf = conn.out_buf[n_sent:]
+
+        return None
+
+    def _handle(self, conn, request):
+
+        """Handles a request from a connection"""
+
+        req_id = request.get('id')
+        command = request.get('command')
+
+        if command == 'render':
+            try:
+                self._submit(conn, req_id, request)
+            except (ValueError, TypeError) as err:
+                conn.send({
+                    'id': req_id, 'status': 'error', 'message': str(err)
+                    })
+        elif command == 'status':
+            conn.send(self._form_status(req_id))
+        elif command == 'shutdown':
+            conn.send({'id': req_id, 'status': 'ok'})
+            self.shutdown()
+        else:
+            conn.send({
+                'id': req_id, 'status': 'error',
+                'message': 'Unknown command %s' % command
+                })
+
+        return None
+
+    def _submit(self, conn, req_id, request):
+
+        """Submits a render request, deduplicating identical jobs
+
+        :raises ValueError: if the request is invalid
+
+        """
+
+        job = normalize_job(request.get('job'))
+        priority = int(request.get('priority', 0))
+        wait = bool(request.get('wait', True))
+
+        self.stats['requests'] += 1
+        key = json.dumps(job, sort_keys=True)
+
+        if key in self._entries:
+            self.stats['deduplicated'] += 1
+            entry = self._entries[key]
+            if entry.render_job is None and priority > entry.priority:
+                entry.priority = priority
+                self._push(key, entry)
+        else:
+            entry = Entry(job, priority)
+            self._entries[key] = entry
+            self._push(key, entry)
+
+        if wait:
+            entry.waiters.append((conn, req_id))
+        else:
+            conn.send({
+                'id': req_id, 'status': 'queued', 'output': job['output'],
+                'message': ''
+                })
+
+        return None
+
+    def _push(self, key, entry):
+
+        """Pushes an entry into the priority queue
+
+        The entry can be pushed again with a higher priority, and the outdated
+        items in the queue are skipped when popped.
+
+        """
+
+        heapq.heappush(self._queue, (-entry.priority, self._serial, key))
+        self._serial += 1
+
+        return None
+
+    def _dispatch(self):
+
+        """Dispatches the queued jobs to the render loop
+
+        The jobs are dispatched up to :py:attr:`max_dispatched`, so that the
+        scenes are generated by the free workers while the render slots are
+        busy, and the rest are kept in the queue for the priorities to take
+        effect.
+
+        """
+
+        n_dispatched = len([
+            i for i in self._entries.values() if i.render_job is not None
+            ])
+
+        while n_dispatched < self.max_dispatched and len(self._queue) > 0:
+            neg_priority, _, key = heapq.heappop(self._queue)
+            entry = self._entries.get(key)
+            if (entry is None or entry.render_job is not None or
+                    -neg_priority != entry.priority):
+                continue
+
+            entry.render_job = self._loop.submit(entry.job)
+            entry.render_job.add_done_callback(
+                lambda render_job, key=key: self._finish(key, render_job)
+                )
+            n_dispatched += 1
+
+        return None
+
+    def _finish(self, key, render_job):
+
+        """Answers the requests for a finished job"""
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        self._answer(entry, render_job.status, render_job.message)
+
+        return None
+
+    def _answer(self, entry, status, message):
+
+        """Answers all the requests for an entry and forgets it"""
+
+        stats_field = status if status in self.stats else 'failed'
+        self.stats[stats_field] += 1
+
+        for conn, req_id in entry.waiters:
+            conn.send({
+                'id': req_id, 'status': status,
+                'output': entry.job['output'], 'message': message,
+                'time': time.time() - entry.beg_time
+                })
+        entry.waiters = []
+
+        del self._entries[json.dumps(entry.job, sort_keys=True)]
+
+        return None
+
+    def _form_status(self, req_id):
+
+        """Forms the answer to the status request"""
+
+        status = dict(self.stats)
+        status.update({
+            'id': req_id,
+            'status': 'ok',
+            'pid': os.getpid(),
+            'queued': len([
+                i for i in self._entries.values() if i.render_job is None
+                ]),
+            'running': len([
+                i for i in self._entries.values() if i.render_job is not None
+                ]),
+            'clients': len(self._conns),
+            })
+
+        return status
+
+
+def _listen(socket_path):
+
+    """Creates the listening socket of the daemon
+
+    A socket file left by a daemon that is no longer running is removed.
+
+    :raises ValueError: if another daemon is listening on the socket
+
+    """
+
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except socket.error:
+            os.remove(socket_path)
+        else:
+            raise ValueError(
+                'Another daemon is listening on %s' % socket_path
+                )
+        finally:
+            probe.close()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen(16)
+    server.setblocking(False)
+
+    return server
+
+
+def daemon_main():
+
+    """The main function of the daemon"""
+
+    parser = argparse.ArgumentParser(
+        description='The daemon for rendering molecules',
+        epilog='by Tschijnmo TSCHAU <tschijnmotschau@gmail.com>'
+        )
+    parser.add_argument('-s', '--socket', type=str,
+                        default=get_default_socket(),
+                        help='The path of the Unix socket to listen on')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='The number of processes for generating the '
+                        'scenes, default to the number of processors')
+    parser.add_argument('--max-renders', type=int, default=1,
+                        help='The maximum number of concurrent pov-ray '
+                        'processes')
+    args = parser.parse_args()
+
+    try:
+        daemon = RenderDaemon(args.socket, args.workers, args.max_renders)
+    except ValueError as verr:
+        terminate_program(verr.args[0])
+    except socket.error as err:
+        terminate_program(
+            'Socket %s cannot be created: %s' % (args.socket, err)
+            )
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.shutdown())
+    print('Listening on %s' % args.socket)
+    sys.stdout.flush()
+
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+#
+# The client
+# ----------
+#
+
+
+def request_daemon(socket_path, requests):
+
+    """Sends the requests to the daemon and collects the answers
+
+    :param socket_path: The path of the socket of the daemon
+    :param requests: The list of request dictionaries, whose ``id`` fields are
+        set to their indices
+    :returns: The generator of the answers in the order that they arrive
+    :raises socket.error: if the daemon cannot be reached
+    :raises ValueError: if an answer is invalid
+
+    """
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        for idx, request in enumerate(requests):
+            request['id'] = idx
+            sock.sendall(encode_message(request))
+        sock.shutdown(socket.SHUT_WR)
+
+        buf = b''
+        while True:
+            chunk = sock.recv(RECV_SIZE)
+            if not chunk:
+                break
+            answers, buf = split_messages(buf + chunk)
+            for answer in answers:
+                yield answer
+    finally:
+        sock.close()
+
+
+def client_main():
+
+    """The main function of the client
+
+    The command line arguments are the same as those of the main program,
+    together with those for the daemon.
+
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Plotting the molecule from an input file by the daemon',
+        epilog='by Tschijnmo TSCHAU <tschijnmotschau@gmail.com>'
+        )
+    add_job_arguments(parser)
+    parser.add_argument('-s', '--socket', type=str,
+                        default=get_default_socket(),
+                        help='The path of the Unix socket of the daemon')
+    parser.add_argument('--priority', type=int, default=0,
+                        help='The priority of the jobs, higher first')
+    parser.add_argument('--no-wait', action='store_true',
+                        help='Return after the jobs are queued rather than '
+                        'rendered')
+    parser.add_argument('--status', action='store_true',
+                        help='Print the status of the daemon')
+    parser.add_argument('--shutdown', action='store_true',
+                        help='Shut down the daemon')
+    args = parser.parse_args()
+
+    if args.status or args.shutdown:
+        requests = [{'command': 'status' if args.status else 'shutdown'}]
+    else:
+        requests = [
+            {
+                'command': 'render', 'job': absolutize_job(i),
+                'priority': args.priority, 'wait': not args.no_wait
+                }
+            for i in form_cli_jobs(parser, args)
+            ]
+
+    failed = False
+    try:
+        for answer in request_daemon(args.socket, requests):
+            if args.status:
+                for key in sorted(answer):
+                    if key not in ['id', 'status']:
+                        print('%-14s %s' % (key, answer[key]))
+                continue
+            if answer['status'] not in ['ok', 'done', 'queued']:
+                failed = True
+            req_id = answer.get('id')
+            if req_id is not None and 'job' in requests[req_id]:
+                head = '%-9s %s' % (
+                    answer['status'], requests[req_id]['job']['input']
+                    )
+            else:
+                head = answer['status']
+            if answer.get('message'):
+                head += ': ' + answer['message']
+            print(head)
+    except socket.error as err:
+        terminate_program(
+            'Daemon on %s cannot be reached: %s' % (args.socket, err)
+            )
+    except ValueError as verr:
+        terminate_program('Invalid answer from the daemon: %s' % verr)
+
+    return 1 if failed else 0
@@ -3,32 +3,78 @@ The driver function for rendering
 =================================
 
 This module contains the main driver function for the entire rendering process
-from the template initialization to the pov-ray invocation.
+from the template initialization to the pov-ray invocation. The generation of
+the pov-ray scene is also available separately in :py:func:`gen_scene`, for
+drivers like the batch mode that invokes pov-ray by themselves.
 
 """
 
 
-from .readstructure import read_structure
 from .getoptions import get_options
 from .renderpov import render_pov
 from .runpov import run_pov
+from .scenestages import get_input_stages
+from .timebudget import tune_options, format_choice
 
 
-def render_driver(input_file, input_reader, molecule_option, project_option,
-                  output_file, if_keep):
+def get_output_file(input_file, output_file=None):
 
-    """The main driver function"""
+    """Gets the output file name for an input file
+
+    When no output file is explicitly given, the default is the input file name
+    with the extension changed to png.
+
+    """
+
+    if output_file is None:
+        return input_file.split('.')[0] + '.png'
+    else:
+        return output_file
+
+
+def gen_scene(input_file, input_reader, molecule_option, project_option,
+              output_file):
+
+    """Generates the pov-ray scene for an input file
+
+    When a budget of render time is given in the options, the quality
+    settings are tuned for it before the scene is generated, and the chosen
+    settings are reported. The structure and the outputs of the stages of the
+    scene generation are reused from the earlier scenes of the same input file
+    in the process, see :py:mod:`scenestages`.
+
+    :returns: The pair of the output file name and the options dictionary
+        that the scene is generated with.
+
+    """
 
     # Read the molecule
-    structure = read_structure(input_file, input_reader)
+    stages = get_input_stages(input_file, input_reader)
+    structure = stages.structure
 
     # Get the options
     options = get_options(molecule_option, structure, project_option)
 
-    if output_file is None:
-        output_file = input_file.split('.')[0] + '.png'
+    output_file = get_output_file(input_file, output_file)
+
+    choice = tune_options(options, structure)
+    if choice is not None:
+        options = options.derive(choice.settings)
+        print('%s: %s' % (output_file, format_choice(choice)))
+
+    render_pov(structure, output_file, options, stages)
+
+    return output_file, options
+
+
+def render_driver(input_file, input_reader, molecule_option, project_option,
+                  output_file, if_keep):
+
+    """The main driver function"""
 
-    render_pov(structure, output_file, options)
+    output_file, options = gen_scene(
+        input_file, input_reader, molecule_option, project_option, output_file
+        )
     run_pov(output_file, if_keep, options)
 
     return 0
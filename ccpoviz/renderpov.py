@@ -5,37 +5,60 @@ Pov-ray template rendering
 This is a driver module that renders the pov-ray template for the given
 molecule and user configuration based on the several other modules for
 transforming molecular information into more and more primtive pov-ray objects.
+The stages of the generation are run through the cache in
+:py:mod:`scenestages`, so that only the stages affected by the changed options
+are run again when the same structure is rendered again.
 
 """
 
 import pystache
-import pkg_resources
 
-from .defcamera import gen_camera_ops
-from .deflightsource import gen_light_ops
-from .drawatms import draw_atms
-from .drawbonds import draw_bonds
-from .drawaxes import draw_axes
+from .drawbonds import cylinder2pov
+from .scenestages import StageCache
+from .streampov import TEMPLATE_NAME, write_scene
+from .texturetable import TextureTable
+from .util import terminate_program, get_data_string
 
 
-def gen_render_dict(structure, ops_dict):
+def gen_render_dict(structure, ops_dict, stages=None):
 
-    """Generates the dictionary for rendering the template"""
+    """Generates the dictionary for rendering the template
+
+    :param structure: The structure to render
+    :param ops_dict: The options dictionary
+    :param stages: The :py:class:`scenestages.StageCache` for the structure,
+        a new one is used when not given
+
+    """
+
+    if stages is None:
+        stages = StageCache(structure)
 
     render_dict = {}
 
-    cam_dict, cam_loc, cam_foc = gen_camera_ops(ops_dict, structure)
+    cam_dict, lightsouce_dict, declarations, _, _ = stages.get_view(ops_dict)
     render_dict['camera'] = cam_dict
-
-    lightsouce_dict = gen_light_ops(cam_loc, cam_foc, ops_dict)
     render_dict.update(lightsouce_dict)
 
-    atms_list = draw_atms(structure, ops_dict)
+    if declarations is None:
+        render_dict['animation'] = False
+    else:
+        render_dict['animation'] = {'declarations': declarations}
+
+    # The atom textures are added first to get the same names as the atoms
+    atms_list, atm_textures = stages.get('atoms', ops_dict)
+    texture_table = TextureTable()
+    for texture in atm_textures:
+        texture_table.get_name(texture)
     render_dict['atoms'] = atms_list
 
-    bonds_list = draw_bonds(structure, cam_loc, ops_dict)
+    bonds_list = cylinder2pov(
+        stages.get('cylinders', ops_dict), ops_dict, texture_table
+        )
     render_dict['bonds'] = bonds_list
 
+    render_dict['textures'] = texture_table.to_render_list()
+
     bkg_colour = ops_dict['background-colour']
     if bkg_colour == '':
         bkg_list = []
@@ -48,41 +71,76 @@ def gen_render_dict(structure, ops_dict):
     render_dict['use-background'] = if_bkg
     render_dict['background-settings'] = bkg_list
 
-    if ops_dict['draw-axes']:
-        axes_list = draw_axes(cam_foc, ops_dict)
-    else:
-        axes_list = []
-    render_dict['axes'] = axes_list
+    render_dict['axes'] = stages.get('axes', ops_dict)
 
     return render_dict
 
 
-def render_pov(structure, output_file, ops_dict):
+def render_pov_template(structure, pov_file, ops_dict, stages=None):
 
-    """Renders the pov-ray template to output file
+    """Renders the pov-ray template into a file object
+
+    The whole rendering dictionary is formed and the default template is
+    rendered into a string in memory before being written.
 
     :param structure: The structure to render
-    :param output_file: The name of the output file
+    :param pov_file: The file-like object to write into
     :param ops_dict: The options dictionary
+    :param stages: The :py:class:`scenestages.StageCache` for the structure
 
     """
 
-    render_dict = gen_render_dict(structure, ops_dict)
+    render_dict = gen_render_dict(structure, ops_dict, stages)
 
-    template = pkg_resources.resource_string(
-        __name__, 'data/default.pov.mustache'
-        )
-    texture_partial = pkg_resources.resource_string(
-        __name__, 'data/texturedef.pov.mustache'
-        )
+    template = get_data_string(TEMPLATE_NAME)
+    texture_partial = get_data_string('texturedef.pov.mustache')
 
     renderer = pystache.Renderer(partials={'texturedef': texture_partial})
     result = renderer.render(template, render_dict)
 
-    pov_file = open(
-        output_file.split('.')[0] + '.pov',
-        'w'
-        )
     pov_file.write(result)
 
     return None
+
+
+def render_pov(structure, output_file, ops_dict, stages=None):
+
+    """Renders the pov-ray template to output file
+
+    Depending on the ``pov-writer`` option, the scene is either written by the
+    streaming writer in :py:mod:`streampov` or rendered from the mustache
+    template as a whole. Both of them give the same result for the literal
+    scene encoding, while the compact encodings selected by the
+    ``scene-encoding`` option are only supported by the streaming writer.
+
+    :param structure: The structure to render
+    :param output_file: The name of the output file
+    :param ops_dict: The options dictionary
+    :param stages: The :py:class:`scenestages.StageCache` for the structure,
+        for reusing the outputs of the stages of earlier renders
+
+    """
+
+    base_name = output_file.split('.')[0]
+    writer = ops_dict['pov-writer']
+
+    if writer == 'stream':
+        with open(base_name + '.pov', 'w') as pov_file:
+            try:
+                write_scene(
+                    structure, pov_file, ops_dict, data_prefix=base_name,
+                    stages=stages
+                    )
+            except ValueError as verr:
+                terminate_program(verr.args[0])
+    elif writer == 'template':
+        if ops_dict['scene-encoding'] != 'literal':
+            terminate_program(
+                'Only the literal scene encoding is supported by the template'
+                )
+        with open(base_name + '.pov', 'w') as pov_file:
+            render_pov_template(structure, pov_file, ops_dict, stages)
+    else:
+        terminate_program('Invalid pov-writer option %s' % writer)
+
+    return None
@@ -8,14 +8,90 @@ program must reside somewhere in the system ``PATH`` so that it can be invoked
 with only ``povray``, or the ``povray-program`` setting can be set for an
 alternative location.
 
+The number of work threads of pov-ray is set by the ``work-threads`` option.
+When it is zero, all the processors available to the current process are used,
+up to the number of blocks in the image, see :py:mod:`cpubudget`. When the
+``tile-count`` option is larger than one, the image is rendered by tiles in
+parallel processes, see :py:mod:`tilerender`. When the ``turntable-frames``
+option is larger than one, the frames of the turntable animation are rendered
+by parallel processes instead, see :py:mod:`turntable`.
+
+When the ``progressive`` option is set, a fast draft is rendered before the
+final picture, at the width scaled by ``preview-scale`` and the quality capped
+by ``preview-quality``, without anti-aliasing. The default cap of four leaves
+out the area lights. The draft is written to a side file with ``.preview.png``
+extension or to the output file itself, according to ``preview-target``, and
+the final render can be aborted after the draft by interruption from the
+keyboard, or by answering the prompt when ``preview-confirm`` is set. The
+side file of the draft is removed together with the pov-ray input file after
+the final render.
+
+The final render is anti-aliased with the ``antialias-threshold`` when the
+``antialias`` option is set. These settings and the quality can be tuned for a
+budget of render time when the scene is generated, see :py:mod:`timebudget`.
+
+When the render cache is enabled by the ``render-cache-dir`` option, the
+cached image is used when the same scene has been rendered with the same
+settings before, see :py:mod:`rendercache`.
+
+The output of pov-ray is always captured, and passed through only when
+``suppress-povray-out`` is false. The statistics of the final render are
+parsed from the output and returned from :py:func:`run_pov`, and they are
+written into a JSON file next to the image when the ``render-stats`` option is
+set, see :py:mod:`povstats`.
+
 """
 
 import subprocess
 import os
+import sys
+import time
 
+from .cpubudget import get_available_cpus, count_blocks, decide_threads
+from .povstats import parse_stats, merge_stats, write_stats
+from .rendercache import get_cache, form_render_key, remove_output
+from .streampov import DATA_FILE_SUFFIXES
+from .tilerender import run_tiles
+from .turntable import (
+    gen_animation_args, get_frame_files, is_turntable, run_frames
+    )
 from .util import terminate_program
 
 
+# The size of the chunks for reading the output of pov-ray in bytes
+READ_SIZE = 65536
+
+
+def form_pov_args(povray_prog, input_file, output_file, width, aspect_ratio,
+                  additional_arg=None):
+
+    """Forms the command line for invoking the pov-ray program
+
+    :param povray_prog: The string for the pov-ray program
+    :param input_file: The name of the pov-ray input file
+    :param output_file: The name of the output file, which is not set when it
+        is None
+    :param width: The width of the render in pixels
+    :param aspect_ratio: The width to height aspect ratio
+    :param additional_arg: The list of additional arguments
+    :returns: The list of arguments, with the program as the first one
+
+    """
+
+    # pylint: disable=too-many-arguments
+
+    additional_arg = additional_arg or []
+    height = round(width / aspect_ratio)
+
+    args = [
+        povray_prog, '+I%s' % input_file, '+W%d' % width, '+H%d' % height
+        ]
+    if output_file is not None:
+        args.append('+O%s' % output_file)
+
+    return args + additional_arg
+
+
 def run_pov_core(povray_prog, input_file, output_file, width, aspect_ratio,
                  additional_arg=None, suppress_out=True, add_print=False):
 
@@ -29,67 +105,458 @@ def run_pov_core(povray_prog, input_file, output_file, width, aspect_ratio,
         have the same base name just a different extension.
     :param width: The width of the render in pixels
     :param aspect_ratio: The width to height aspect ratio
+    :param suppress_out: If the output of pov-ray is not passed through to
+        the standard output, it is captured in both cases
+    :returns: The pair of the return code and the output of pov-ray
 
     """
 
     # pylint: disable=too-many-arguments
 
-    additional_arg = [] or additional_arg
-    height = round(width / aspect_ratio)
-
-    args = [
-        povray_prog, '+I%s' % input_file, '+W%d' % width,
-        '+H%d' % height, '+O%s' % output_file
-        ] + additional_arg
+    args = form_pov_args(
+        povray_prog, input_file, output_file, width, aspect_ratio,
+        additional_arg
+        )
 
     if add_print:
         print("Calling Pov-ray as:")
         print(' '.join(args))
 
     proc = subprocess.Popen(
-        args, stdout=(subprocess.PIPE if suppress_out else None),
-        stderr=subprocess.STDOUT
+        args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
         )
+    pass_through = getattr(sys.stdout, 'buffer', sys.stdout)
 
-    _ = proc.communicate()
+    chunks = []
+    try:
+        while True:
+            chunk = os.read(proc.stdout.fileno(), READ_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if not suppress_out:
+                pass_through.write(chunk)
+                pass_through.flush()
+        proc.wait()
+    except KeyboardInterrupt:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        raise
+    finally:
+        proc.stdout.close()
 
-    return proc.poll()
+    return proc.poll(), b''.join(chunks).decode('utf-8', 'replace')
 
 
-def run_pov(output_file, if_keep, ops_dict):
+def get_pov_input(output_file):
 
-    """The driver for invoking pov-ray
+    """Gets the name of the pov-ray input file for an output file"""
+
+    return output_file.split('.')[0] + '.pov'
+
+
+def get_graph_height(ops_dict):
+
+    """Gets the height of the image in pixels from the options"""
+
+    return round(ops_dict['graph-width'] / ops_dict['aspect-ratio'])
+
+
+def gen_additional_args(ops_dict, n_threads=None, draft=False):
+
+    """Generates the additional pov-ray arguments according to the options
 
-    :param output_file: The name of the output file
-    :param if_keep: if the pov-ray input file is going to be kept after
-        rendering
     :param ops_dict: The options dictionary
+    :param n_threads: The number of work threads, no setting is given to
+        pov-ray when it is None
+    :param draft: If the arguments are for the draft of the progressive mode,
+        which has no anti-aliasing and lowered quality. Otherwise the
+        animation options are added for the turntable animation.
+    :returns: The list of arguments other than the input, output, and size
 
     """
 
-    input_file = output_file.split('.')[0] + '.pov'
-    additional_arg = [
-        '+A',
-        ('+Q%d' % ops_dict['quality']),
-        ]
+    if draft:
+        additional_arg = [
+            '+Q%d' % min(ops_dict['quality'], ops_dict['preview-quality'])
+            ]
+    else:
+        additional_arg = []
+        if ops_dict['antialias']:
+            additional_arg.append('+A%g' % ops_dict['antialias-threshold'])
+        additional_arg.append('+Q%d' % ops_dict['quality'])
     if ops_dict['background-colour'] == '':
         additional_arg.append('+UA')
+    if not draft and is_turntable(ops_dict):
+        additional_arg.extend(
+            gen_animation_args(ops_dict['turntable-frames'])
+            )
+    if n_threads is not None:
+        additional_arg.append('+WT%d' % n_threads)
 
+    return additional_arg
+
+
+def gen_pov_args(output_file, ops_dict, n_threads=None):
+
+    """Generates the command line for rendering according to the options
+
+    :param output_file: The name of the output file
+    :param ops_dict: The options dictionary
+    :param n_threads: The number of work threads, no setting is given to
+        pov-ray when it is None
+    :returns: The list of arguments, with the program as the first one
+
+    """
+
+    return form_pov_args(
+        ops_dict['pov-ray-program'], get_pov_input(output_file), output_file,
+        ops_dict['graph-width'], ops_dict['aspect-ratio'],
+        additional_arg=gen_additional_args(ops_dict, n_threads)
+        )
+
+
+def decide_single_threads(ops_dict):
+
+    """Decides the number of work threads for a single render
+
+    :param ops_dict: The options dictionary
+    :returns: The number of threads
+
+    """
+
+    n_blocks = count_blocks(
+        ops_dict['graph-width'], get_graph_height(ops_dict)
+        )
+    return decide_threads(
+        len(get_available_cpus()), 1, n_blocks, ops_dict['work-threads']
+        )
+
+
+def remove_pov_files(output_file):
+
+    """Removes the pov-ray input file and the side data files of a render
+
+    :param output_file: The name of the output file
+
+    """
+
+    os.remove(get_pov_input(output_file))
+    for suffix in DATA_FILE_SUFFIXES:
+        data_file = output_file.split('.')[0] + suffix
+        if os.path.exists(data_file):
+            os.remove(data_file)
+
+    return None
+
+
+def run_pov_tiles(output_file, ops_dict):
+
+    """Invokes pov-ray for rendering the image by tiles
+
+    :param output_file: The name of the output file
+    :param ops_dict: The options dictionary
+    :returns: The pair of the return code of pov-ray and the list of the
+        outputs of the tiles
+
+    """
+
+    base_args = form_pov_args(
+        ops_dict['pov-ray-program'], get_pov_input(output_file), None,
+        ops_dict['graph-width'], ops_dict['aspect-ratio'],
+        additional_arg=gen_additional_args(ops_dict)
+        )
+
+    if ops_dict['additional-printing']:
+        print("Calling Pov-ray for %d tiles as:" % ops_dict['tile-count'])
+        print(' '.join(base_args))
+
+    return run_tiles(
+        base_args, output_file, ops_dict['graph-width'],
+        int(get_graph_height(ops_dict)), ops_dict['tile-count'],
+        ops_dict['tile-shape'], suppress_out=ops_dict['suppress-povray-out'],
+        max_threads=ops_dict['work-threads']
+        )
+
+
+def run_pov_turntable(output_file, if_keep, ops_dict):
+
+    """Invokes pov-ray for rendering the frames of the turntable animation
+
+    The render cache, the tiles, and the progressive mode are not used for
+    animations.
+
+    :param output_file: The name of the output file, with the frame numbers
+        appended for the frames
+    :param if_keep: If the pov-ray input files are kept
+    :param ops_dict: The options dictionary
+    :returns: The dictionary of the statistics merged over the processes
+
+    """
+
+    if ops_dict['turntable-processes'] < 0:
+        terminate_program('Invalid number of turntable processes')
+    if ops_dict['tile-count'] > 1:
+        terminate_program('Tiles are not supported for turntable animations')
+
+    n_frames = ops_dict['turntable-frames']
+    base_args = form_pov_args(
+        ops_dict['pov-ray-program'], get_pov_input(output_file), output_file,
+        ops_dict['graph-width'], ops_dict['aspect-ratio'],
+        additional_arg=gen_additional_args(ops_dict)
+        )
+
+    if ops_dict['additional-printing']:
+        print("Calling Pov-ray for %d frames as:" % n_frames)
+        print(' '.join(base_args))
+
+    beg_time = time.time()
     try:
-        ret_code = run_pov_core(
-            ops_dict['pov-ray-program'], input_file, output_file,
-            ops_dict['graph-width'], ops_dict['aspect-ratio'],
-            additional_arg=additional_arg,
+        ret_code, outputs = run_frames(
+            base_args, output_file, n_frames, ops_dict['graph-width'],
+            int(get_graph_height(ops_dict)),
+            n_procs=ops_dict['turntable-processes'],
             suppress_out=ops_dict['suppress-povray-out'],
-            add_print=ops_dict['additional-printing']
+            max_threads=ops_dict['work-threads']
             )
     except OSError:
         terminate_program('Pov-ray cannot be invoked!')
 
     if ret_code != 0:
         terminate_program('Pov-ray returned with error!')
+    missing = [
+        i for i in get_frame_files(output_file, n_frames)
+        if not os.path.exists(i)
+        ]
+    if len(missing) > 0:
+        terminate_program('Frame %s is not rendered!' % missing[0])
+
+    stats = finish_stats(
+        output_file, ops_dict, merge_stats([parse_stats(i) for i in outputs]),
+        time.time() - beg_time, None
+        )
 
     if not if_keep:
-        os.remove(input_file)
+        remove_pov_files(output_file)
+
+    return stats
+
+
+def get_preview_file(output_file, ops_dict):
+
+    """Gets the name of the file for the draft of the progressive mode"""
+
+    if ops_dict['preview-target'] == 'output':
+        return output_file
+    elif ops_dict['preview-target'] == 'sidecar':
+        return output_file.split('.')[0] + '.preview.png'
+    else:
+        terminate_program(
+            'Invalid preview target %s' % ops_dict['preview-target']
+            )
+
+
+def run_pov_preview(output_file, ops_dict):
+
+    """Invokes pov-ray for rendering the draft of the progressive mode
+
+    :param output_file: The name of the output file of the final picture
+    :param ops_dict: The options dictionary
+    :returns: The name of the file of the draft
+
+    """
+
+    if ops_dict['preview-scale'] <= 0.0:
+        terminate_program('Invalid preview scale')
+
+    preview_file = get_preview_file(output_file, ops_dict)
+    width = max(
+        int(round(ops_dict['graph-width'] * ops_dict['preview-scale'])), 1
+        )
+    n_threads = decide_threads(
+        len(get_available_cpus()), 1,
+        count_blocks(width, round(width / ops_dict['aspect-ratio'])),
+        ops_dict['work-threads']
+        )
+
+    try:
+        ret_code, _ = run_pov_core(
+            ops_dict['pov-ray-program'], get_pov_input(output_file),
+            preview_file, width, ops_dict['aspect-ratio'],
+            additional_arg=gen_additional_args(
+                ops_dict, n_threads, draft=True
+                ),
+            suppress_out=ops_dict['suppress-povray-out'],
+            add_print=ops_dict['additional-printing']
+            )
+    except OSError:
+        terminate_program('Pov-ray cannot be invoked!')
+
+    if ret_code != 0:
+        terminate_program('Pov-ray returned with error for the preview!')
+
+    return preview_file
+
+
+def confirm_final_render():
+
+    """Asks the user if the final render is to be started after the draft
+
+    The final render is always started when the standard input is not a
+    terminal.
+
+    """
+
+    if not sys.stdin.isatty():
+        return True
+
+    try:
+        answer = raw_input('Start the final render? [Y/n] ')
+    except EOFError:
+        return True
+
+    return not answer.strip().lower().startswith('n')
+
+
+def finish_cache(cache, ops_dict):
+
+    """Saves and optionally prints the statistics of the render cache"""
+
+    cache.save_stats()
+    if ops_dict['additional-printing']:
+        print(cache.format_stats())
 
     return None
+
+
+def finish_stats(output_file, ops_dict, stats, wall_time, n_threads):
+
+    """Completes the statistics of a render and writes them when requested
+
+    :param output_file: The name of the output file
+    :param ops_dict: The options dictionary
+    :param stats: The statistics parsed from the output of pov-ray
+    :param wall_time: The wall time of running pov-ray in seconds
+    :param n_threads: The number of work threads given to pov-ray, None when
+        it is decided by pov-ray
+    :returns: The completed statistics
+
+    """
+
+    stats['wall_time'] = wall_time
+    stats['work_threads'] = n_threads
+
+    if ops_dict['render-stats']:
+        try:
+            stats_file = write_stats(output_file, stats)
+        except IOError as err:
+            print('Render statistics not written: %s' % err)
+        else:
+            if ops_dict['additional-printing']:
+                print('Render statistics written to %s' % stats_file)
+
+    return stats
+
+
+def run_pov(output_file, if_keep, ops_dict):
+
+    """The driver for invoking pov-ray
+
+    :param output_file: The name of the output file
+    :param if_keep: if the pov-ray input file, and the side data files for
+        the compact scene encoding, are going to be kept after rendering
+    :param ops_dict: The options dictionary
+    :returns: The dictionary of the statistics of the final render, see
+        :py:mod:`povstats`, or None when no render is done due to a hit of
+        the render cache or the abortion after the preview. For turntable
+        animations, the statistics are merged over the pov-ray processes.
+
+    """
+
+    if ops_dict['work-threads'] < 0:
+        terminate_program('Invalid number of work threads')
+    if ops_dict['tile-count'] < 1:
+        terminate_program('Invalid number of tiles')
+
+    if is_turntable(ops_dict):
+        return run_pov_turntable(output_file, if_keep, ops_dict)
+
+    try:
+        cache = get_cache(ops_dict)
+    except (OSError, ValueError) as err:
+        terminate_program('Invalid render cache: %s' % err)
+    if cache is not None:
+        cache_key = form_render_key(
+            gen_pov_args(output_file, ops_dict), get_pov_input(output_file),
+            ops_dict
+            )
+        if cache.fetch(cache_key, output_file):
+            if not if_keep:
+                remove_pov_files(output_file)
+            finish_cache(cache, ops_dict)
+            return None
+
+    try:
+        remove_output(output_file)
+    except OSError as err:
+        terminate_program('Cannot remove the old output file: %s' % err)
+
+    if ops_dict['progressive']:
+        preview_file = run_pov_preview(output_file, ops_dict)
+        print('Preview written to %s' % preview_file)
+        if ops_dict['preview-confirm'] and not confirm_final_render():
+            if not if_keep:
+                remove_pov_files(output_file)
+            return None
+        print('Starting the final render, interrupt to abort')
+
+    beg_time = time.time()
+    try:
+        if ops_dict['tile-count'] > 1:
+            n_threads = None
+            try:
+                ret_code, outputs = run_pov_tiles(output_file, ops_dict)
+            except (IOError, ValueError) as err:
+                terminate_program('Tiled rendering failed: %s' % err)
+            stats = merge_stats([parse_stats(i) for i in outputs])
+        else:
+            n_threads = decide_single_threads(ops_dict)
+            ret_code, output = run_pov_core(
+                ops_dict['pov-ray-program'], get_pov_input(output_file),
+                output_file, ops_dict['graph-width'],
+                ops_dict['aspect-ratio'],
+                additional_arg=gen_additional_args(ops_dict, n_threads),
+                suppress_out=ops_dict['suppress-povray-out'],
+                add_print=ops_dict['additional-printing']
+                )
+            stats = parse_stats(output)
+    except OSError:
+        terminate_program('Pov-ray cannot be invoked!')
+    except KeyboardInterrupt:
+        if not ops_dict['progressive']:
+            raise
+        if not if_keep:
+            remove_pov_files(output_file)
+        terminate_program('Final render aborted after the preview')
+
+    if ret_code != 0:
+        terminate_program('Pov-ray returned with error!')
+
+    stats = finish_stats(
+        output_file, ops_dict, stats, time.time() - beg_time, n_threads
+        )
+
+    if cache is not None:
+        try:
+            cache.store(cache_key, output_file)
+        except (IOError, OSError) as err:
+            print('Image not stored into the render cache: %s' % err)
+        finish_cache(cache, ops_dict)
+
+    if not if_keep:
+        remove_pov_files(output_file)
+        if ops_dict['progressive'] and ops_dict['preview-target'] == 'sidecar':
+            os.remove(get_preview_file(output_file, ops_dict))
+
+    return stats
@@ -0,0 +1,376 @@
+"""
+Incremental generation of the scenes
+====================================
+
+The generation of a scene goes through several stages, from the camera and the
+light source to the atoms and the bonds, and each stage reads only a few of
+the options. So when the same structure is rendered again with only some
+options changed, like in parameter sweeps or interactive use, just the stages
+reading the changed options, and the stages depending on them, need to be run
+again. The stages are
+
+camera
+    The camera from :py:func:`defcamera.gen_camera_ops`.
+
+light
+    The light source from :py:func:`deflightsource.gen_light_ops`, which
+    depends on the camera.
+
+turntable
+    The camera and light source of the turntable animation from
+    :py:func:`turntable.gen_turntable_ops`, None when it is disabled.
+
+atoms
+    The atoms drawn by :py:func:`drawatms.draw_atms` for the template writer,
+    together with the textures of the atoms in the order of their names.
+
+bonds
+    The bonds from :py:func:`drawbonds.form_bonds_list`, which includes the
+    bond detection.
+
+cylinders
+    The bond cylinders from :py:func:`drawbonds.resolve_bonds`, which depends
+    on the bonds and the camera.
+
+axes
+    The coordinate axes from :py:func:`drawaxes.draw_axes`, an empty list when
+    they are not drawn, which depends on the camera.
+
+The options read by each stage and the stages it depends on are given in
+:py:data:`STAGES`, which forms the dependency graph. The outputs of the stages
+are kept in a :py:class:`StageCache` for a structure, and a stage is run again
+only when the values of its options or the outputs of the stages it depends
+on are changed. The outputs are shared by all the scenes generated from the
+cache, so they should not be modified.
+
+Within each process, the stage caches of the recently rendered input files are
+kept by :py:func:`get_input_stages`, and the structure is read again when the
+input file is changed.
+
+"""
+
+import collections
+import os
+
+from .defcamera import gen_camera_ops
+from .deflightsource import gen_light_ops
+from .drawatms import draw_atms
+from .drawaxes import draw_axes
+from .drawbonds import form_bonds_list, resolve_bonds
+from .readstructure import read_structure
+from .texturetable import TextureTable
+from .turntable import is_turntable, gen_turntable_ops
+
+
+#
+# The dependency graph
+# --------------------
+#
+
+
+def _compute_camera(structure, ops_dict):
+
+    """Computes the camera options, location, and focus"""
+
+    return gen_camera_ops(ops_dict, structure)
+
+
+def _compute_light(structure, ops_dict, camera):
+
+    """Computes the light source options"""
+
+    # pylint: disable=unused-argument
+
+    return gen_light_ops(camera[1], camera[2], ops_dict)
+
+
+def _compute_turntable(structure, ops_dict):
+
+    """Computes the view of the turntable animation, None when disabled"""
+
+    if is_turntable(ops_dict):
+        return gen_turntable_ops(ops_dict, structure)
+    else:
+        return None
+
+
+def _compute_atoms(structure, ops_dict):
+
+    """Draws the atoms with their own texture table
+
+    :returns: The pair of the list of the atoms and the list of their textures
+        in the order of their names
+
+    """
+
+    texture_table = TextureTable()
+    atms_list = draw_atms(structure, ops_dict, texture_table)
+    return atms_list, texture_table.textures
+
+
+def _compute_bonds(structure, ops_dict):
+
+    """Forms the list of bonds"""
+
+    return form_bonds_list(structure, ops_dict)
+
+
+def _compute_cylinders(structure, ops_dict, bonds, camera):
+
+    """Resolves the bonds into cylinders for the camera location"""
+
+    return resolve_bonds(structure, camera[1], ops_dict, bonds=bonds)
+
+
+def _compute_axes(structure, ops_dict, camera):
+
+    """Draws the coordinate axes at the camera focus when requested"""
+
+    # pylint: disable=unused-argument
+
+    if ops_dict['draw-axes']:
+        return draw_axes(camera[2], ops_dict)
+    else:
+        return []
+
+
+Stage = collections.namedtuple('Stage', [
+    'options',
+    'inputs',
+    'compute',
+    ])
+
+
+# The options read by the camera and the light source
+CAMERA_OPTIONS = (
+    'camera-focus', 'camera-distance', 'camera-theta', 'camera-phi',
+    'camera-rotation', 'aspect-ratio'
+    )
+LIGHT_OPTIONS = (
+    'light-location', 'light-focus', 'light-rotation', 'light-size',
+    'light-adaptive', 'light-colour', 'light-number', 'light-jitter'
+    )
+
+# The stages, with the options they read, the stages they depend on, and the
+# functions computing their outputs from the structure, the options, and the
+# outputs of the stages they depend on
+STAGES = {
+    'camera': Stage(CAMERA_OPTIONS, (), _compute_camera),
+    'light': Stage(LIGHT_OPTIONS, ('camera', ), _compute_light),
+    'turntable': Stage(
+        CAMERA_OPTIONS + LIGHT_OPTIONS + (
+            'turntable-frames', 'turntable-sweep'
+            ),
+        (), _compute_turntable
+        ),
+    'atoms': Stage(
+        (
+            'element-colour-scheme', 'element-colour-change',
+            'element-textures', 'element-radii'
+            ),
+        (), _compute_atoms
+        ),
+    'bonds': Stage(
+        ('compute-bonds', 'covalent-radii', 'bond-set-changes'), (),
+        _compute_bonds
+        ),
+    'cylinders': Stage(
+        ('multiple-bond-separation', 'partial-bond-dash-size'),
+        ('bonds', 'camera'), _compute_cylinders
+        ),
+    'axes': Stage(
+        ('draw-axes', 'axes-length', 'axes-radius'), ('camera', ),
+        _compute_axes
+        ),
+    }
+
+
+def get_affected_stages(options):
+
+    """Gets the stages to be run again when some options are changed
+
+    :param options: The iterable of the changed option keys
+    :returns: The set of the names of the stages reading the options, and the
+        stages depending on them directly or indirectly
+
+    """
+
+    options = set(options)
+    affected = set(
+        k for k, v in STAGES.iteritems()
+        if any(i in options for i in v.options)
+        )
+
+    n_affected = 0
+    while len(affected) != n_affected:
+        n_affected = len(affected)
+        affected.update(
+            k for k, v in STAGES.iteritems()
+            if any(i in affected for i in v.inputs)
+            )
+
+    return affected
+
+
+#
+# The cache of the stage outputs
+# ------------------------------
+#
+
+
+class StageCache(object):
+
+    """The outputs of the stages for a structure
+
+    The stages are run lazily when their outputs are requested, and the
+    options are compared with the ones the outputs were computed for only once
+    for each options object. So the options given should not be changed
+    afterwards, which holds for the frozen options from
+    :py:func:`getoptions.get_options`.
+
+    .. py:attribute:: structure
+
+      The structure, which should not be changed.
+
+    .. py:attribute:: entries
+
+      The dictionary from the names of the stages to the quadruples of the
+      versions of the outputs of the stages depended on, the values of the
+      options, the version of the output, and the output.
+
+    .. py:attribute:: stats
+
+      The numbers of the stages ``computed`` and ``reused``.
+
+    """
+
+    __slots__ = [
+        'structure',
+        'entries',
+        'stats',
+        '_n_versions',
+        '_ops_dict',
+        '_checked',
+        ]
+
+    def __init__(self, structure):
+
+        """Initializes an empty cache for the structure"""
+
+        self.structure = structure
+        self.entries = {}
+        self.stats = {'computed': 0, 'reused': 0}
+        self._n_versions = 0
+        self._ops_dict = None
+        self._checked = set()
+
+    def _refresh(self, name, ops_dict):
+
+        """Makes the output of a stage up to date for the options
+
+        :returns: The version of the output
+
+        """
+
+        if ops_dict is not self._ops_dict:
+            self._ops_dict = ops_dict
+            self._checked = set()
+        if name in self._checked:
+            return self.entries[name][2]
+
+        stage = STAGES[name]
+        versions = tuple(self._refresh(i, ops_dict) for i in stage.inputs)
+        values = tuple(ops_dict[i] for i in stage.options)
+
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == versions and entry[1] == values:
+            self.stats['reused'] += 1
+        else:
+            output = stage.compute(
+                self.structure, ops_dict,
+                *[self.entries[i][3] for i in stage.inputs]
+                )
+            self._n_versions += 1
+            entry = (versions, values, self._n_versions, output)
+            self.entries[name] = entry
+            self.stats['computed'] += 1
+
+        self._checked.add(name)
+        return entry[2]
+
+    def get(self, name, ops_dict):
+
+        """Gets the output of a stage for the options
+
+        :param name: The name of the stage in :py:data:`STAGES`
+        :param ops_dict: The options dictionary
+
+        """
+
+        self._refresh(name, ops_dict)
+        return self.entries[name][3]
+
+    def get_view(self, ops_dict):
+
+        """Gets the camera and light source options for the scene
+
+        :returns: The same as :py:func:`turntable.gen_view_ops`
+
+        """
+
+        animation = self.get('turntable', ops_dict)
+        if animation is not None:
+            return animation
+
+        cam_dict, cam_loc, cam_foc = self.get('camera', ops_dict)
+        return (
+            cam_dict, self.get('light', ops_dict), None, cam_loc, cam_foc
+            )
+
+
+#
+# The stage caches of the input files
+# -----------------------------------
+#
+
+
+# The maximum number of input files whose stage caches are kept
+MAX_INPUTS = 4
+
+# The stage caches of the input files, from the pairs of the absolute file
+# names and the readers to the pairs of the size and modification time of the
+# files and the caches, the most recently used last
+_INPUT_STAGES = collections.OrderedDict()
+
+
+def get_input_stages(input_file, reader):
+
+    """Gets the stage cache for an input file
+
+    The cache of an input file is reused as long as the file is unchanged,
+    and the caches of the least recently used files are dropped beyond
+    :py:data:`MAX_INPUTS`.
+
+    :param input_file: The name of the input file
+    :param reader: The reader for the input file
+    :returns: The :py:class:`StageCache` holding the structure read from it
+
+    """
+
+    key = (os.path.abspath(input_file), reader)
+    try:
+        stat = os.stat(key[0])
+    except OSError:
+        # Leave the error to be reported by the reader
+        return StageCache(read_structure(input_file, reader))
+    stamp = (stat.st_size, stat.st_mtime)
+
+    entry = _INPUT_STAGES.pop(key, None)
+    if entry is None or entry[0] != stamp:
+        entry = (stamp, StageCache(read_structure(input_file, reader)))
+
+    _INPUT_STAGES[key] = entry
+    while len(_INPUT_STAGES) > MAX_INPUTS:
+        _INPUT_STAGES.popitem(last=False)
+
+    return entry[1]
@@ -0,0 +1,555 @@
+"""
+Streaming POV-Ray scene writer
+==============================
+
+Rendering the mustache template needs the dictionaries for all the atoms and
+bonds, and the whole text of the scene, to be held in memory at the same time.
+For large structures, this can take several copies of a multi-hundred-megabyte
+POV-Ray input. So here a writer is given that writes the same scene as the
+default template ``default.pov.mustache``, section by section into a file-like
+object.
+
+The atoms and the bond cylinders are taken directly from the arrays of the
+array-backed structure and the batched bond cylinders. Since the texture of an
+atom depends only on its element, the textures are collected once for each
+element, and then just the coordinates are formatted for each primitive. The
+primitives are written in batches of bounded size, so that the peak memory
+usage no longer grows with the size of the output text.
+
+"""
+
+import os
+
+import numpy as np
+import pystache
+
+from .drawatms import form_colour_dict, get_radius, get_texture
+from .drawbonds import get_bond_texture
+from .scenestages import StageCache
+from .structure import as_array_structure
+from .texturetable import TextureTable
+from .util import format_vector, get_data_string
+
+
+# The number of primitives to be formatted before each write to the file
+BATCH_SIZE = 4096
+
+
+#
+# Section writers
+# ---------------
+#
+
+
+# The default template that the scenes written here follow
+TEMPLATE_NAME = 'default.pov.mustache'
+
+
+def get_header():
+
+    """Gets the header of the scene with the includes
+
+    The header is the leading part of the default template before its first
+    tag, so that the two writers cannot drift apart in it.
+
+    """
+
+    template = get_data_string(TEMPLATE_NAME)
+    return template[0:template.index('{{')]
+
+
+def _section_title(title):
+
+    """Formats the comment for the title of a section"""
+
+    return '//\n// %s\n// %s\n//\n\n' % (title, '-' * len(title))
+
+
+def write_animation(pov_file, declarations):
+
+    """Writes the declarations for the animation
+
+    :param pov_file: The file-like object to write to
+    :param declarations: The string of the declarations from
+        :py:func:`turntable.gen_view_ops`, nothing is written when it is None
+
+    """
+
+    if declarations is None:
+        return None
+
+    pov_file.write(_section_title('Animation'))
+    pov_file.write(declarations)
+    pov_file.write('\n\n\n')
+
+    return None
+
+
+def write_camera(pov_file, cam_dict):
+
+    """Writes the camera definition
+
+    :param pov_file: The file-like object to write to
+    :param cam_dict: The list of camera options from
+        :py:func:`defcamera.gen_camera_ops`
+
+    """
+
+    pov_file.write(_section_title('Camera definition'))
+    pov_file.write('camera {\n')
+    for i in cam_dict:
+        pov_file.write('    %s %s\n' % (i['op-name'], i['op-value']))
+    pov_file.write('}\n\n\n')
+
+
+def write_light(pov_file, light_dict):
+
+    """Writes the light source definition
+
+    :param pov_file: The file-like object to write to
+    :param light_dict: The dictionary from
+        :py:func:`deflightsource.gen_light_ops`
+
+    """
+
+    pov_file.write(_section_title('Light source definition'))
+    pov_file.write('light_source {\n')
+    pov_file.write('    %s\n' % light_dict['light-location'])
+    pov_file.write('    color %s\n' % light_dict['light-colour'])
+    pov_file.write('    area_light %s, %s, %s, %s\n' % (
+        light_dict['light-area-vec-1'], light_dict['light-area-vec-2'],
+        light_dict['light-number'], light_dict['light-number']
+        ))
+    if light_dict['light-adaptive']:
+        pov_file.write('    adaptive %s\n' % light_dict['light-adaptive'])
+    pov_file.write(
+        '    %s\n' % ('jitter' if light_dict['light-jitter'] else '')
+        )
+    pov_file.write('}\n\n\n')
+
+
+def write_background(pov_file, ops_dict):
+
+    """Writes the background definition
+
+    :param pov_file: The file-like object to write to
+    :param ops_dict: The options dictionary
+
+    """
+
+    pov_file.write(_section_title('Background definition'))
+    bkg_colour = ops_dict['background-colour']
+    if bkg_colour != '':
+        pov_file.write('background {\n    colour %s\n}\n' % bkg_colour)
+    pov_file.write('\n')
+
+
+def write_textures(pov_file, texture_table):
+
+    """Writes the declarations of the textures
+
+    The declarations are rendered from the ``texturedef`` partial, the same as
+    in the template.
+
+    :param pov_file: The file-like object to write to
+    :param texture_table: The :py:class:`texturetable.TextureTable` instance
+
+    """
+
+    pov_file.write(_section_title('Textures Definition'))
+
+    texture_partial = get_data_string('texturedef.pov.mustache')
+    renderer = pystache.Renderer(partials={'texturedef': texture_partial})
+    pov_file.write(renderer.render(
+        '{{#textures}}\n#declare {{{name}}} =\n{{> texturedef}}\n'
+        '{{/textures}}\n',
+        {'textures': texture_table.to_render_list()}
+        ))
+
+    pov_file.write('\n\n')
+
+
+def write_atms(pov_file, structure, ops_dict, texture_names):
+
+    """Writes the atoms as spheres
+
+    :param pov_file: The file-like object to write to
+    :param structure: The array-backed structure
+    :param ops_dict: The options dictionary
+    :param texture_names: The names of the textures for each element, indexed
+        by the species
+
+    """
+
+    pov_file.write(_section_title('Atoms Definition'))
+
+    # The radius for each element, indexed by the species
+    radii = [
+        '%s' % get_radius(i, ops_dict) for i in structure.symbs
+        ]
+
+    coords = structure.coords
+    species = structure.species.tolist()
+    for beg in xrange(0, len(species), BATCH_SIZE):
+        end = min(beg + BATCH_SIZE, len(species))
+        pov_file.write(''.join(
+            'sphere {\n    %s, %s\n    texture { %s }\n}\n' % (
+                format_vector(coords[i]), radii[species[i]],
+                texture_names[species[i]]
+                )
+            for i in xrange(beg, end)
+            ))
+
+    pov_file.write('\n\n')
+
+
+def write_bonds(pov_file, cylinders, ops_dict, texture_name):
+
+    """Writes the bond cylinders
+
+    Each cylinder is drawn with spheres capping its two ends.
+
+    :param pov_file: The file-like object to write to
+    :param cylinders: The :py:class:`bonds2cylinder.BondCylinders` instance
+    :param ops_dict: The options dictionary
+    :param texture_name: The name of the texture for the bonds
+
+    """
+
+    pov_file.write(_section_title('Bonds Definition'))
+
+    radius = '%8.4f' % ops_dict['bond-cylinder-radius']
+    texture = '    texture { %s }\n' % texture_name
+    fmt = (
+        'cylinder {\n    %(begin)s,\n    %(end)s,\n    %(radius)s\n'
+        '%(texture)s}\n'
+        'sphere {\n    %(begin)s, %(radius)s\n%(texture)s}\n'
+        'sphere {\n    %(end)s, %(radius)s\n%(texture)s}\n'
+        )
+
+    begs = cylinders.beg_coords
+    ends = cylinders.end_coords
+    for beg in xrange(0, len(begs), BATCH_SIZE):
+        end = min(beg + BATCH_SIZE, len(begs))
+        pov_file.write(''.join(
+            fmt % {
+                'begin': format_vector(begs[i]),
+                'end': format_vector(ends[i]),
+                'radius': radius,
+                'texture': texture
+                }
+            for i in xrange(beg, end)
+            ))
+
+    pov_file.write('\n\n')
+
+
+def write_axes(pov_file, axes_list):
+
+    """Writes the coordinate axes
+
+    :param pov_file: The file-like object to write to
+    :param axes_list: The list of dictionaries from
+        :py:func:`drawaxes.draw_axes`
+
+    """
+
+    pov_file.write(_section_title('Coordinates Definition (Optional)'))
+
+    for i in axes_list:
+        pov_file.write((
+            'cylinder {\n    %(begin)s,\n    %(end)s,\n    %(radius)s\n'
+            '    texture {\n        pigment { colour %(colour)s }\n    }\n'
+            '}\n'
+            'cone {\n    %(end)s, %(tip-base-radius)s\n    %(tip)s, 0.0\n'
+            '    texture {\n        pigment { colour %(colour)s }\n    }\n'
+            '}\n'
+            ) % i)
+
+    pov_file.write('\n\n')
+
+
+#
+# Compact encoding
+# ----------------
+#
+# For large systems, rather than one literal block for each primitive, the
+# coordinates, radii and textures of the primitives can be given as POV-Ray
+# arrays, and the primitives are drawn by a ``#for`` loop over a macro. The
+# coordinates can also be put into side data files, to be read by ``#read`` in
+# the loop. The former is selected by the value ``array`` of the
+# ``scene-encoding`` option, and the latter by ``data-file``. The literal
+# encoding above is the default for diffable output.
+#
+
+
+# The suffixes of the side data files for the atoms and the bonds, to be
+# appended to the base name of the POV-Ray input file.
+DATA_FILE_SUFFIXES = ['.atoms.dat', '.bonds.dat']
+
+
+def _write_items(out_file, fmt, arr, separator):
+
+    """Writes the rows of a two-dimensional array by the same format
+
+    The rows are formatted in batches and separated by the given separator,
+    with no separator after the last row.
+
+    """
+
+    for beg in xrange(0, len(arr), BATCH_SIZE):
+        chunk = arr[beg:beg + BATCH_SIZE]
+        if beg > 0:
+            out_file.write(separator)
+        out_file.write(
+            separator.join([fmt] * len(chunk)) % tuple(chunk.ravel().tolist())
+            )
+
+
+def _write_array(pov_file, name, fmt, arr):
+
+    """Writes the declaration of a POV-Ray array from a numpy array"""
+
+    pov_file.write('#declare %s = array[%d] {\n' % (name, len(arr)))
+    _write_items(pov_file, fmt, arr, ',\n')
+    pov_file.write('\n}\n')
+
+
+COMPACT_VECTOR = '<%.6f,%.6f,%.6f>'
+
+
+def write_atms_compact(pov_file, structure, ops_dict, texture_names,
+                       data_file=None):
+
+    """Writes the atoms in the compact encoding
+
+    :param pov_file: The file-like object to write to
+    :param structure: The array-backed structure
+    :param ops_dict: The options dictionary
+    :param texture_names: The names of the textures for each element, indexed
+        by the species
+    :param data_file: The name of the side data file for the atoms, the arrays
+        are going to be written into the POV-Ray file if it is not given.
+
+    """
+
+    # pylint: disable=too-many-arguments
+
+    pov_file.write(_section_title('Atoms Definition'))
+
+    n_atms = len(structure.species)
+    if n_atms == 0:
+        pov_file.write('\n\n')
+        return None
+
+    pov_file.write(
+        '#macro ccpoviz_atom(Centre, Species)\n'
+        'sphere {\n'
+        '    Centre, ccpoviz_atom_radii[Species]\n'
+        '    texture { ccpoviz_atom_textures[Species] }\n'
+        '}\n'
+        '#end\n\n'
+        )
+    _write_array(
+        pov_file, 'ccpoviz_atom_radii', '%s', np.array(
+            [get_radius(i, ops_dict) for i in structure.symbs],
+            dtype=object
+            ).reshape((-1, 1))
+        )
+    _write_array(
+        pov_file, 'ccpoviz_atom_textures', '%s',
+        np.array(texture_names, dtype=object).reshape((-1, 1))
+        )
+
+    if data_file is None:
+        _write_array(
+            pov_file, 'ccpoviz_atom_centres', COMPACT_VECTOR,
+            structure.coords
+            )
+        _write_array(
+            pov_file, 'ccpoviz_atom_species', '%d',
+            structure.species.reshape((-1, 1))
+            )
+        pov_file.write(
+            '\n#for (ccpoviz_i, 0, %d)\n'
+            '    ccpoviz_atom(ccpoviz_atom_centres[ccpoviz_i], '
+            'ccpoviz_atom_species[ccpoviz_i])\n'
+            '#end\n' % (n_atms - 1)
+            )
+    else:
+        with open(data_file, 'w') as data:
+            _write_items(
+                data, COMPACT_VECTOR + ',%d,\n',
+                np.column_stack((structure.coords, structure.species)), ''
+                )
+        pov_file.write(
+            '\n#fopen ccpoviz_atom_file "%s" read\n'
+            '#for (ccpoviz_i, 0, %d)\n'
+            '    #read (ccpoviz_atom_file, ccpoviz_centre, ccpoviz_species)\n'
+            '    ccpoviz_atom(ccpoviz_centre, ccpoviz_species)\n'
+            '#end\n'
+            '#fclose ccpoviz_atom_file\n' % (data_file, n_atms - 1)
+            )
+
+    pov_file.write('\n\n')
+    return None
+
+
+def write_bonds_compact(pov_file, cylinders, ops_dict, texture_name,
+                        data_file=None):
+
+    """Writes the bond cylinders in the compact encoding
+
+    :param pov_file: The file-like object to write to
+    :param cylinders: The :py:class:`bonds2cylinder.BondCylinders` instance
+    :param ops_dict: The options dictionary
+    :param texture_name: The name of the texture for the bonds
+    :param data_file: The name of the side data file for the bonds, the arrays
+        are going to be written into the POV-Ray file if it is not given.
+
+    """
+
+    # pylint: disable=too-many-arguments
+
+    pov_file.write(_section_title('Bonds Definition'))
+
+    n_cylinders = len(cylinders.beg_coords)
+    if n_cylinders == 0:
+        pov_file.write('\n\n')
+        return None
+
+    pov_file.write(
+        '#macro ccpoviz_bond(Begin, End)\n'
+        'cylinder {\n'
+        '    Begin, End, %(radius)s\n'
+        '    texture { %(texture)s }\n'
+        '}\n'
+        'sphere {\n'
+        '    Begin, %(radius)s\n'
+        '    texture { %(texture)s }\n'
+        '}\n'
+        'sphere {\n'
+        '    End, %(radius)s\n'
+        '    texture { %(texture)s }\n'
+        '}\n'
+        '#end\n\n' % {
+            'radius': '%.4f' % ops_dict['bond-cylinder-radius'],
+            'texture': texture_name
+            }
+        )
+
+    if data_file is None:
+        _write_array(
+            pov_file, 'ccpoviz_bond_begins', COMPACT_VECTOR,
+            cylinders.beg_coords
+            )
+        _write_array(
+            pov_file, 'ccpoviz_bond_ends', COMPACT_VECTOR,
+            cylinders.end_coords
+            )
+        pov_file.write(
+            '\n#for (ccpoviz_i, 0, %d)\n'
+            '    ccpoviz_bond(ccpoviz_bond_begins[ccpoviz_i], '
+            'ccpoviz_bond_ends[ccpoviz_i])\n'
+            '#end\n' % (n_cylinders - 1)
+            )
+    else:
+        with open(data_file, 'w') as data:
+            _write_items(
+                data, COMPACT_VECTOR + ',' + COMPACT_VECTOR + ',\n',
+                np.column_stack((cylinders.beg_coords, cylinders.end_coords)),
+                ''
+                )
+        pov_file.write(
+            '\n#fopen ccpoviz_bond_file "%s" read\n'
+            '#for (ccpoviz_i, 0, %d)\n'
+            '    #read (ccpoviz_bond_file, ccpoviz_begin, ccpoviz_end)\n'
+            '    ccpoviz_bond(ccpoviz_begin, ccpoviz_end)\n'
+            '#end\n'
+            '#fclose ccpoviz_bond_file\n' % (data_file, n_cylinders - 1)
+            )
+
+    pov_file.write('\n\n')
+    return None
+
+
+#
+# The driver
+# ----------
+#
+
+
+def write_scene(structure, pov_file, ops_dict, data_prefix=None,
+                stages=None):
+
+    """Writes the POV-Ray scene for a structure into a file-like object
+
+    For the default literal encoding, the output is the same as the rendering
+    of the default template by :py:func:`renderpov.render_pov`. For the compact
+    encodings selected by the ``scene-encoding`` option, the atoms and bonds
+    are drawn by loops.
+
+    :param structure: The structure to render, it is converted into the
+        array-backed form when it is not
+    :param pov_file: The file-like object to write to
+    :param ops_dict: The options dictionary
+    :param data_prefix: The prefix for the names of the side data files, with
+        the suffixes in :py:data:`DATA_FILE_SUFFIXES` appended. It is needed
+        only for the ``data-file`` encoding.
+    :param stages: The :py:class:`scenestages.StageCache` for the structure,
+        for reusing the camera, light source, bonds, and axes of earlier
+        scenes, a new one is used when not given
+    :raises ValueError: if the encoding is invalid or the data prefix is
+        missing when it is needed
+
+    """
+
+    encoding = ops_dict['scene-encoding']
+    if encoding == 'data-file':
+        if data_prefix is None:
+            raise ValueError('Data files are needed for the encoding')
+        data_files = [
+            os.path.abspath(data_prefix + i) for i in DATA_FILE_SUFFIXES
+            ]
+    elif encoding in ['literal', 'array']:
+        data_files = [None, None]
+    else:
+        raise ValueError('Invalid scene encoding %s' % encoding)
+
+    if stages is None:
+        stages = StageCache(structure)
+    structure = as_array_structure(structure)
+
+    cam_dict, light_dict, declarations, _, _ = stages.get_view(ops_dict)
+
+    pov_file.write(get_header())
+    write_animation(pov_file, declarations)
+    write_camera(pov_file, cam_dict)
+    write_light(pov_file, light_dict)
+    write_background(pov_file, ops_dict)
+
+    # Collect the textures in the same order as the atoms and bonds drawers
+    texture_table = TextureTable()
+    colour_dict = form_colour_dict(ops_dict)
+    atm_textures = [
+        texture_table.get_name(get_texture(i, colour_dict, ops_dict))
+        for i in structure.symbs
+        ]
+    bond_texture = texture_table.get_name(get_bond_texture(ops_dict))
+    write_textures(pov_file, texture_table)
+
+    cylinders = stages.get('cylinders', ops_dict)
+    if encoding == 'literal':
+        write_atms(pov_file, structure, ops_dict, atm_textures)
+        write_bonds(pov_file, cylinders, ops_dict, bond_texture)
+    else:
+        write_atms_compact(
+            pov_file, structure, ops_dict, atm_textures, data_files[0]
+            )
+        write_bonds_compact(
+            pov_file, cylinders, ops_dict, bond_texture, data_files[1]
+            )
+
+    write_axes(pov_file, stages.get('axes', ops_dict))
+
+    return None
@@ -6,10 +6,18 @@ This module contains the class for representing a chemical structure, either in
 isolated molecular form or crystal form. Just some very basic information are
 stored.
 
+Two representations are provided. The plain :py:class:`Structure` class holds
+a list of atom objects and a list of bond triples, which is simple and flexible
+for small molecules. For large systems, the :py:class:`ArrayStructure` class
+holds the same information in a few flat numpy arrays, while still providing
+the list-like views for the code written for the plain class.
+
 """
 
 import collections
 
+import numpy as np
+
 
 #
 # Atom class
@@ -60,7 +68,10 @@ class Structure(object):
       A list of bonds in the structure. Its entries should be tuples where the
       first two fields gives the **zero-based** indices of the atoms connected
       by the bond. And the next entry gives the bond order, which can be a
-      float-point number to indicate partial bond.
+      float-point number to indicate partial bond. For crystals, an optional
+      fourth entry can be given as a tuple of integers for the periodic image
+      of the second atom in units of the lattice vectors, when the bond
+      crosses the cell boundary.
 
     .. py:attribute: latt_vecs
 
@@ -116,3 +127,291 @@ class Structure(object):
         """Sets the lattice vectors"""
 
         self.latt_vecs = latt_vecs
+
+
+#
+# Array-backed structure
+# ----------------------
+#
+# For large systems, one namedtuple and one small numpy array for each atom
+# costs hundreds of bytes per atom, and forces per-atom Python loops in all the
+# later stages. So here an alternative structure class is defined, where the
+# coordinates are held in a single (N, 3) array, the element symbols are
+# interned into a table with each atom holding just an integral index into it,
+# and the bonds are held in a structured array with fields ``i``, ``j``, and
+# ``order``.
+#
+
+
+BOND_DTYPE = np.dtype([
+    ('i', np.int64),
+    ('j', np.int64),
+    ('order', np.float64),
+    ])
+
+
+class AtmsView(object):
+
+    """Read-only sequence view of the atoms in an array-backed structure
+
+    Indexing or iterating over this view gives :py:class:`Atm` instances that
+    are created on the fly, with the coordinate being a view into the
+    coordinate array of the structure. So it can be used wherever a list of
+    atoms is expected for reading.
+
+    """
+
+    __slots__ = [
+        'structure',
+        ]
+
+    def __init__(self, structure):
+
+        """Initializes the view on an array-backed structure"""
+
+        self.structure = structure
+
+    def __len__(self):
+
+        """Gets the number of atoms"""
+
+        return self.structure.coords.shape[0]
+
+    def __getitem__(self, idx):
+
+        """Gets an atom or a list of atoms for a slice"""
+
+        if isinstance(idx, slice):
+            return [self[i] for i in xrange(*idx.indices(len(self)))]
+
+        structure = self.structure
+        return Atm(
+            symb=structure.symbs[structure.species[idx]],
+            coord=structure.coords[idx]
+            )
+
+    def __iter__(self):
+
+        """Iterates over the atoms"""
+
+        structure = self.structure
+        symbs = structure.symbs
+        for species, coord in zip(structure.species, structure.coords):
+            yield Atm(symb=symbs[species], coord=coord)
+
+
+class ArrayStructure(object):
+
+    """Array-backed chemical structure class
+
+    This class holds the same information as the :py:class:`Structure` class,
+    with the same interface for the readers and the plotters. But the atoms and
+    bonds are stored in flat numpy arrays.
+
+    .. py:attribute:: title
+
+      The optional title, the same as in :py:class:`Structure`.
+
+    .. py:attribute:: coords
+
+      The (N, 3) float64 array for the Cartesian coordinates of the atoms.
+
+    .. py:attribute:: symbs
+
+      The list of distinct element symbols in the structure, in the order of
+      their first appearance.
+
+    .. py:attribute:: species
+
+      The (N, ) integral array giving the index of the symbol of each atom in
+      the :py:attr:`symbs` list.
+
+    .. py:attribute:: bonds_arr
+
+      The (M, ) structured array of :py:data:`BOND_DTYPE` for the bonds.
+
+    .. py:attribute:: latt_vecs
+
+      The lattice vectors, the same as in :py:class:`Structure`.
+
+    The attributes ``atms`` and ``bonds`` are also available for compatibility
+    with code written for :py:class:`Structure`. ``atms`` is a read-only
+    :py:class:`AtmsView`, and ``bonds`` is a list of bond triples formed from
+    the bonds array on each access.
+
+    """
+
+    __slots__ = [
+        'title',
+        'coords',
+        'symbs',
+        'species',
+        'bonds_arr',
+        'latt_vecs'
+        ]
+
+    def __init__(self, title):
+
+        """Initializes an empty array-backed structure"""
+
+        self.title = title
+        self.coords = np.empty((0, 3), dtype=np.float64)
+        self.symbs = []
+        self.species = np.empty((0, ), dtype=np.int32)
+        self.bonds_arr = np.empty((0, ), dtype=BOND_DTYPE)
+        self.latt_vecs = []
+
+    @classmethod
+    def from_arrays(cls, title, coords, symbs, bonds=(), latt_vecs=()):
+
+        """Creates a structure directly from arrays
+
+        :param title: The title of the structure
+        :param coords: Anything convertible to an (N, 3) array of coordinates
+        :param symbs: An iterable of N element symbols for the atoms
+        :param bonds: An iterable of bond triples or a bond structured array
+        :param latt_vecs: The lattice vectors
+        :returns: The new array-backed structure
+
+        """
+
+        # pylint: disable=too-many-arguments
+
+        structure = cls(title)
+        structure.coords = np.array(
+            coords, dtype=np.float64
+            ).reshape((-1, 3))
+        structure.species = structure.intern_symbs(symbs)
+        if structure.species.shape[0] != structure.coords.shape[0]:
+            raise ValueError(
+                'The numbers of coordinates and symbols do not match'
+                )
+        structure.extend_bonds(bonds)
+        structure.set_latt_vecs(list(latt_vecs))
+
+        return structure
+
+    @property
+    def atms(self):
+
+        """The list-like view of the atoms"""
+
+        return AtmsView(self)
+
+    @property
+    def bonds(self):
+
+        """The list of bond triples"""
+
+        return [
+            (int(i[0]), int(i[1]), float(i[2]))
+            for i in self.bonds_arr.tolist()
+            ]
+
+    @property
+    def atm_symbs(self):
+
+        """The array of the element symbols for each atom"""
+
+        return np.array(self.symbs, dtype=object)[self.species]
+
+    def intern_symbs(self, symbs_iter):
+
+        """Interns the given symbols into the symbols table
+
+        New symbols are appended to the :py:attr:`symbs` table.
+
+        :param symbs_iter: An iterable of element symbols
+        :returns: An integral array of the indices of the symbols in the table
+
+        """
+
+        table = {v: i for i, v in enumerate(self.symbs)}
+        species = []
+        for symb in symbs_iter:
+            try:
+                species.append(table[symb])
+            except KeyError:
+                table[symb] = len(self.symbs)
+                species.append(len(self.symbs))
+                self.symbs.append(symb)
+
+        return np.array(species, dtype=np.int32)
+
+    def extend_atms(self, atms_iter):
+
+        """Extends the atoms by an iterator over atom objects"""
+
+        atms = list(atms_iter)
+        if len(atms) == 0:
+            return
+
+        coords = np.array(
+            [i.coord for i in atms], dtype=np.float64
+            ).reshape((-1, 3))
+        species = self.intern_symbs(i.symb for i in atms)
+
+        self.coords = np.concatenate((self.coords, coords))
+        self.species = np.concatenate((self.species, species))
+
+    def extend_bonds(self, bonds_iter):
+
+        """Extends the bonds by an iterator over bonding triples
+
+        A structured array of :py:data:`BOND_DTYPE` can also be given.
+
+        """
+
+        if isinstance(bonds_iter, np.ndarray) and bonds_iter.dtype.names:
+            bonds = bonds_iter.astype(BOND_DTYPE)
+        else:
+            bonds = np.array(
+                [tuple(i[0:3]) for i in bonds_iter], dtype=BOND_DTYPE
+                )
+
+        self.bonds_arr = np.concatenate((self.bonds_arr, bonds))
+
+    def set_latt_vecs(self, latt_vecs):
+
+        """Sets the lattice vectors"""
+
+        self.latt_vecs = latt_vecs
+
+
+def as_array_structure(structure):
+
+    """Gets an array-backed version of a structure
+
+    Array-backed structures are returned as they are, while other structures
+    are converted into a new :py:class:`ArrayStructure` instance.
+
+    """
+
+    if isinstance(structure, ArrayStructure):
+        return structure
+
+    atms = structure.atms
+    return ArrayStructure.from_arrays(
+        structure.title,
+        [i.coord for i in atms],
+        [i.symb for i in atms],
+        bonds=structure.bonds,
+        latt_vecs=structure.latt_vecs
+        )
+
+
+def get_coords(structure):
+
+    """Gets the (N, 3) coordinates array of a structure
+
+    For array-backed structures, the coordinates array is returned directly
+    without copying.
+
+    """
+
+    if isinstance(structure, ArrayStructure):
+        return structure.coords
+
+    return np.array(
+        [i.coord for i in structure.atms], dtype=np.float64
+        ).reshape((-1, 3))
@@ -0,0 +1,112 @@
+"""
+Fake pov-ray program for the tests
+==================================
+
+The tests of the rendering drivers run a shell script in place of pov-ray,
+which prints some output, sleeps for a while, and touches the output file. The
+input molecule and the options selecting the fake program are written into a
+temporary directory by the functions here.
+
+"""
+
+import json
+import os
+import stat
+import tempfile
+
+
+# The fake pov-ray printing two lines of progress, to be formatted with the
+# time in seconds to sleep after each line
+FAKE_POVRAY = '''#!/bin/sh
+for i in 1 2; do printf "line $i\\n"; sleep %f; done
+for a in "$@"; do case $a in +O*) touch "${a#+O}";; esac; done
+'''
+
+# The fake pov-ray printing its arguments one per line before sleeping
+ARGS_POVRAY = '''#!/bin/sh
+for a in "$@"; do printf "%%s\\n" "$a"; done; sleep %f
+for a in "$@"; do case $a in +O*) touch "${a#+O}";; esac; done
+'''
+
+# The fake pov-ray appending its arguments as a line to ``povray.log`` in its
+# directory before sleeping
+LOG_POVRAY = '''#!/bin/sh
+printf "%%s\\n" "$*" >> "$(dirname "$0")/povray.log"; sleep %f
+for a in "$@"; do case $a in +O*) touch "${a#+O}";; esac; done
+'''
+
+# The fake pov-ray copying the scene into the output file after sleeping, so
+# that the image depends on the scene
+COPY_POVRAY = '''#!/bin/sh
+for a in "$@"; do case $a in +I*) i="${a#+I}";; +O*) o="${a#+O}";; esac; done
+sleep %f; cat "$i" > "$o"
+'''
+
+GJF_CONTENT = '''# hf
+
+water
+
+0 1
+O 0.0 0.0 0.0
+H 0.96 0.0 0.0
+H -0.24 0.93 0.0
+
+'''
+
+
+def write_input(work_dir, name='water.gjf'):
+
+    """Writes the input file of a water molecule and returns its name"""
+
+    input_file = os.path.join(work_dir, name)
+    with open(input_file, 'w') as out_file:
+        out_file.write(GJF_CONTENT)
+
+    return input_file
+
+
+def write_options(work_dir, sleep, script=FAKE_POVRAY, options=None):
+
+    """Writes a fake pov-ray and the options file selecting it
+
+    :param work_dir: The directory to write the files in
+    :param sleep: The time in seconds for the script to sleep
+    :param script: The template of the script
+    :param options: The dictionary of other options to be written
+    :returns: The name of the options file, whose content is also given by
+        :py:func:`read_options`
+
+    """
+
+    handle, povray = tempfile.mkstemp(prefix='povray-', dir=work_dir)
+    with os.fdopen(handle, 'w') as out_file:
+        out_file.write(script % sleep)
+    os.chmod(povray, stat.S_IRWXU)
+
+    options = dict(options or {}, **{'pov-ray-program': povray})
+    handle, options_file = tempfile.mkstemp(
+        prefix='options-', suffix='.json', dir=work_dir
+        )
+    with os.fdopen(handle, 'w') as out_file:
+        json.dump(options, out_file)
+
+    return options_file
+
+
+def read_options(options_file):
+
+    """Reads the options written by :py:func:`write_options`"""
+
+    with open(options_file, 'r') as in_file:
+        return json.load(in_file)
+
+
+def read_log(work_dir):
+
+    """Reads the arguments logged by :py:data:`LOG_POVRAY` for each call"""
+
+    log_file = os.path.join(work_dir, 'povray.log')
+    if not os.path.exists(log_file):
+        return []
+    with open(log_file, 'r') as log:
+        return [i.split() for i in log.read().splitlines()]
@@ -0,0 +1,130 @@
+"""
+Tests for the non-blocking rendering
+====================================
+
+The render loop is tested with a fake pov-ray program, which is a shell script
+printing some progress and touching the output file.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ccpoviz.asyncrender import RenderLoop, RenderFailure
+
+from fakepovray import ARGS_POVRAY, write_input, write_options
+
+
+class RenderLoopTest(unittest.TestCase):
+
+    """Tests the render loop with a fake pov-ray program"""
+
+    def setUp(self):
+
+        """Sets up the input and the fake pov-ray in a temporary directory"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.input_file = write_input(self.work_dir)
+
+        self.loop = RenderLoop(1)
+
+    def tearDown(self):
+
+        """Shuts down the loop and removes the temporary directory"""
+
+        self.loop.close()
+        shutil.rmtree(self.work_dir)
+
+    def test_concurrent(self):
+
+        """Tests concurrent renders with output, timeout, and failure"""
+
+        fast = write_options(self.work_dir, 0.05)
+        slow = write_options(self.work_dir, 5.0)
+        lines = []
+
+        done = self.loop.submit_render(
+            self.input_file, 'gjf', None, fast,
+            os.path.join(self.work_dir, 'done.png'), False,
+            on_output=lambda job, line: lines.append(line)
+            )
+        timeout = self.loop.submit_render(
+            self.input_file, 'gjf', None, slow,
+            os.path.join(self.work_dir, 'timeout.png'), False, timeout=1.0
+            )
+        failed = self.loop.submit_render(
+            os.path.join(self.work_dir, 'missing.gjf'), 'gjf', None, fast,
+            None, False
+            )
+        self.loop.run_until_complete()
+
+        self.assertEqual(
+            done.result(), os.path.join(self.work_dir, 'done.png')
+            )
+        self.assertTrue(os.path.exists(done.result()))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.work_dir, 'done.pov'))
+            )
+        self.assertEqual(lines, ['line 1', 'line 2'])
+
+        self.assertEqual(timeout.status, 'timeout')
+        self.assertRaises(RenderFailure, timeout.result)
+        self.assertEqual(failed.status, 'failed')
+
+    def test_cancel(self):
+
+        """Tests the cancelling of a running render"""
+
+        slow = write_options(self.work_dir, 5.0)
+        job = self.loop.submit_render(
+            self.input_file, 'gjf', None, slow,
+            os.path.join(self.work_dir, 'cancel.png'), False
+            )
+        statuses = []
+        job.add_done_callback(lambda job: statuses.append(job.status))
+
+        while job.status != 'running':
+            self.loop.poll(0.05)
+        self.assertTrue(job.cancel())
+        self.assertFalse(job.cancel())
+
+        self.assertEqual(statuses, ['cancelled'])
+        self.assertEqual(self.loop.poll(), 0)
+
+    def test_budget(self):
+
+        """Tests the limits on the renders and their threads"""
+
+        loop = RenderLoop(1, max_renders=2, n_cpus=2)
+        options = write_options(self.work_dir, 0.3, ARGS_POVRAY)
+        threads = []
+
+        def on_output(job, line):
+            """Records the thread options of the renders"""
+            # pylint: disable=unused-argument
+            if line.startswith('+WT'):
+                threads.append(line)
+
+        try:
+            jobs = [
+                loop.submit_render(
+                    self.input_file, 'gjf', None, options,
+                    os.path.join(self.work_dir, 'job%d.png' % i), False,
+                    on_output=on_output
+                    )
+                for i in xrange(0, 3)
+                ]
+            while not all(i.done() for i in jobs):
+                loop.poll(0.05)
+                self.assertLessEqual(
+                    len([i for i in jobs if i.status == 'running']), 2
+                    )
+
+            self.assertEqual([i.status for i in jobs], ['done'] * 3)
+            self.assertEqual(threads, ['+WT1'] * 3)
+            loop.poll()
+            self.assertEqual(loop.budget.free, set(loop.budget.cpus))
+        finally:
+            loop.close()
@@ -0,0 +1,165 @@
+"""
+Tests for the batch rendering
+=============================
+
+The reading of the job manifests, the rejection of the jobs needing several
+pov-ray processes, and the reporting of the results are tested.
+
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ccpoviz import batchrender
+
+from fakepovray import write_input, write_options
+
+
+class ManifestTest(unittest.TestCase):
+
+    """Tests the reading of the job manifests"""
+
+    def setUp(self):
+
+        """Sets up a temporary directory and the default job fields"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.defaults = {
+            'output': None, 'reader': 'gjf', 'molecule-option': None,
+            'project-option': 'proj.yml', 'keep': False,
+            }
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def _write_manifest(self, lines):
+
+        """Writes a manifest with the given lines and returns its name"""
+
+        file_name = os.path.join(self.work_dir, 'manifest.jsonl')
+        with open(file_name, 'w') as manifest:
+            manifest.write('\n'.join(lines) + '\n')
+        return file_name
+
+    def test_defaults(self):
+
+        """Tests the filling of the fields not given in the manifest"""
+
+        manifest = self._write_manifest([
+            json.dumps({'input': 'a.gjf'}),
+            '',
+            json.dumps({'input': 'b.gjf', 'output': 'c.png', 'keep': True}),
+            ])
+        jobs = batchrender.read_manifest(manifest, self.defaults)
+
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(jobs[0]['input'], 'a.gjf')
+        self.assertEqual(jobs[0]['output'], None)
+        self.assertEqual(jobs[0]['project-option'], 'proj.yml')
+        self.assertEqual(jobs[1]['output'], 'c.png')
+        self.assertTrue(jobs[1]['keep'])
+
+    def test_invalid(self):
+
+        """Tests the rejection of invalid entries"""
+
+        for line in ['{"input": ', '{"output": "a.png"}', '["a.gjf"]',
+                     '{"input": "a.gjf", "colour": "red"}']:
+            manifest = self._write_manifest([line])
+            self.assertRaises(
+                ValueError, batchrender.read_manifest, manifest, self.defaults
+                )
+
+
+class SceneTest(unittest.TestCase):
+
+    """Tests the scene generation of the jobs"""
+
+    def setUp(self):
+
+        """Sets up a temporary directory with the input"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.input_file = write_input(self.work_dir)
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def _prepare(self, options, keep=False):
+
+        """Prepares the scene of the input with the given options"""
+
+        options_file = write_options(self.work_dir, 0.0, options=options)
+        return batchrender.prepare_scene(0, {
+            'input': self.input_file, 'output': None, 'reader': 'gjf',
+            'molecule-option': None, 'project-option': options_file,
+            'keep': keep
+            })
+
+    def test_single_render(self):
+
+        """Tests the rejection of the jobs needing several processes"""
+
+        pov_file = os.path.join(self.work_dir, 'water.pov')
+
+        scene = self._prepare({})
+        self.assertIsNone(scene.error)
+        self.assertTrue(os.path.exists(pov_file))
+        os.remove(pov_file)
+
+        scene = self._prepare({'tile-count': 4})
+        self.assertIn('tile-count 4', scene.error)
+        self.assertIsNone(scene.pov_args)
+        self.assertFalse(os.path.exists(pov_file))
+
+        scene = self._prepare({'progressive': True}, keep=True)
+        self.assertIn('progressive mode', scene.error)
+        self.assertTrue(os.path.exists(pov_file))
+        os.remove(pov_file)
+
+        scene = self._prepare({'turntable-frames': 8})
+        self.assertIn('Turntable animation of 8 frames', scene.error)
+        self.assertIsNone(scene.pov_args)
+        self.assertFalse(os.path.exists(pov_file))
+
+
+class ReportTest(unittest.TestCase):
+
+    """Tests the report of the results"""
+
+    def test_summary(self):
+
+        """Tests the summary of a batch with a failed job"""
+
+        results = [
+            batchrender.JobResult(
+                'a.gjf', 'a.png', 'ok', '', 1.0, 2.0, 4, '0-3'
+                ),
+            batchrender.JobResult(
+                'b.gjf', 'b.png', 'failed', 'Corrupt input', 0.5, None, None,
+                None
+                ),
+            ]
+        summary = batchrender.format_summary(results, 3.0)
+
+        self.assertIn('2 jobs, 1 succeeded, 1 failed', summary)
+        self.assertIn('scene generation time 1.50 s', summary)
+        self.assertIn('render time 2.00 s', summary)
+        self.assertIn('b.gjf: Corrupt input', summary)
+        self.assertIn(
+            '4 threads on processors 0-3',
+            batchrender.format_result(results[0], 1, 2)
+            )
+        self.assertIn(
+            'failed b.gjf: Corrupt input',
+            batchrender.format_result(results[1], 2, 2)
+            )
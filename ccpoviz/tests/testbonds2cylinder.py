@@ -0,0 +1,76 @@
+"""
+Tests for the conversion of bonds to cylinders
+==============================================
+
+The batched engine is compared against the plain bond-by-bond conversion on
+random bonds of various orders.
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ccpoviz import bonds2cylinder as b2c
+from ccpoviz.structure import Atm
+
+
+class BatchedCylindersTest(unittest.TestCase):
+
+    """Tests the batched engine against the bond-by-bond conversion"""
+
+    def setUp(self):
+
+        """Sets up random atoms and bonds"""
+
+        rand = np.random.RandomState(5)
+        self.coords = rand.uniform(0.0, 4.0, size=(20, 3))
+        self.atms = [Atm(symb='C', coord=i) for i in self.coords]
+        self.latt_vecs = [np.array([5.0, 0.0, 0.0])]
+        self.camera = np.array([1.0, 2.0, 30.0])
+
+        orders = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+        self.bonds = [
+            (i, i + 1, orders[i % len(orders)]) for i in xrange(0, 19)
+            ] + [(0, 5, 1.0, (1, )), (3, 7, 1.5, (-1, ))]
+
+    def test_against_bond_by_bond(self):
+
+        """Tests the batched engine against the bond-by-bond conversion"""
+
+        for dash_size in [0.05, 0.1, 0.37]:
+            ref = b2c.bonds2cylinders(
+                self.bonds, self.atms, self.camera, 0.12, dash_size,
+                self.latt_vecs
+                )
+            res = b2c.bonds2cylinder_arrays(
+                self.bonds, self.coords, self.camera, 0.12, dash_size,
+                self.latt_vecs
+                )
+
+            self.assertEqual(len(res.beg_coords), len(ref))
+            self.assertTrue(np.allclose(
+                res.beg_coords, [i.beg_coord for i in ref]
+                ))
+            self.assertTrue(np.allclose(
+                res.end_coords, [i.end_coord for i in ref]
+                ))
+            for arr_field, field in [
+                    ('beg_atms', 'beg_atm'), ('end_atms', 'end_atm'),
+                    ('bond_sns', 'bond_sn'), ('total_orders', 'total_order'),
+                    ('if_partial', 'if_partial')
+            ]:
+                self.assertEqual(
+                    getattr(res, arr_field).tolist(),
+                    [getattr(i, field) for i in ref]
+                    )
+
+    def test_empty(self):
+
+        """Tests the batched engine without any bonds"""
+
+        res = b2c.bonds2cylinder_arrays(
+            [], self.coords, self.camera, 0.12, 0.1
+            )
+        self.assertEqual(res.beg_coords.shape, (0, 3))
+        self.assertEqual(len(res.if_partial), 0)
@@ -8,6 +8,8 @@ dependent upon any particular option file format.
 
 """
 
+import copy
+import pickle
 import unittest
 
 from ccpoviz import chainoptions as co
@@ -174,3 +176,97 @@ class ChainOptionsTest(unittest.TestCase):
             update_exc.args[0],
             ('', 'map-option-2', 'key', 'prototype', 0, 'prototype')
             )
+
+    #
+    # Compiled schema test
+    # --------------------
+    #
+
+    def test_compiled_schema(self):
+
+        """Tests the reuse of the compiled schema for many chainings"""
+
+        schema = self.chainer.compile(self.default)
+        updates = [
+            {'map-option-2': {'key1': [-1]}, 'number-option': 2},
+            {'map-option-2': {'key1': [-2], 'key2': [3]}},
+            {'list-option-2': [{'value': 5}], 'string-option': 'new'},
+            ]
+
+        for idx in xrange(0, len(updates)):
+            ops = updates[idx:] + [self.dummy_update, self.default]
+            self.assertEqual(
+                schema.chain_options(*ops), self.chainer.chain_options(*ops)
+                )
+
+        res = schema.chain_options(*(updates + [self.default]))
+        self.assertEqual(res['map-option-2']['key2'], [1, 2, 3])
+        self.assertEqual(self.default['map-option-2'], {})
+
+        with self.assertRaises(co.UpdateError) as cm:
+            schema.chain_options({'map-option-1': {'op3': 1}}, self.default)
+        self.assertEqual(cm.exception.args[0], ('', 'map-option-1', 'op3'))
+
+    def test_extended_entries(self):
+
+        """Tests that the entries added by extension keep the schema intact"""
+
+        default = {'m': {'a': {'l': [1]}}, 'm...update': 'extend'}
+        schema = self.chainer.compile(default)
+
+        with self.assertRaises(co.DefaultError):
+            schema.chain_options(
+                {'m': {'x': {'l': [3]}}}, {'m': {'x': {'l': []}}}, default
+                )
+
+        ops = [{'m': {'x': {'l': [2]}}}, {'m': {'x': {'l': [5]}}}, default]
+        self.assertEqual(schema.chain_options(*ops), {
+            'm': {'a': {'l': [1]}, 'x': {'l': [2]}}, 'm...update': 'extend'
+            })
+        self.assertEqual(
+            schema.chain_options(*ops), self.chainer.chain_options(*ops)
+            )
+
+    def test_invalid_default(self):
+
+        """Tests the errors in the default found by the compilation"""
+
+        for default in [
+                {'option': [1], 'option...update': 'merge'},
+                {'option': [1], 'option...prototype': 1,
+                 'option...prototype-key': 0},
+                {'option': None},
+        ]:
+            with self.assertRaises(co.DefaultError):
+                self.chainer.compile(default)
+
+        schema = self.chainer.compile({'option': []})
+        self.assertEqual(schema.chain_options({}, {'option': []}), {
+            'option': []
+            })
+        with self.assertRaises(co.DefaultError):
+            schema.chain_options({'option': [1]}, {'option': []})
+
+    def test_frozen_results(self):
+
+        """Tests the freezing and the sharing of the chained options"""
+
+        schema = self.chainer.compile(self.default)
+        res = schema.chain_options(
+            {'map-option-2': {'key1': [3]}}, schema.default
+            )
+
+        self.assertIsInstance(res, co.FrozenMap)
+        self.assertIsInstance(res['map-option-2']['key1'], co.FrozenList)
+        self.assertIs(res['map-option-1'], schema.default['map-option-1'])
+        with self.assertRaises(TypeError):
+            res['number-option'] = 2
+        with self.assertRaises(TypeError):
+            res['list-option-1'].append(4)
+        self.assertIs(copy.deepcopy(res), res)
+        self.assertEqual(pickle.loads(pickle.dumps(res, 2)), res)
+
+        derived = res.derive({'number-option': 2})
+        self.assertEqual(derived['number-option'], 2)
+        self.assertEqual(res['number-option'], 1)
+        self.assertIs(derived['map-option-2'], res['map-option-2'])
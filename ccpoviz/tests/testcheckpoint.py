@@ -0,0 +1,92 @@
+"""
+Tests for the checkpoints of batch renders
+==========================================
+
+The checkpoint is tested with fake input and image files, without rendering.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ccpoviz.checkpoint import Checkpoint, get_fingerprint
+
+
+class CheckpointTest(unittest.TestCase):
+
+    """Tests the recording and the checking of the jobs"""
+
+    def setUp(self):
+
+        """Sets up a job with fake input and image files"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.checkpoint_file = os.path.join(self.work_dir, 'batch.ckpt')
+        self.job = {
+            'input': self._write('mol.gjf', 'molecule'),
+            'output': None, 'reader': 'gjf', 'molecule-option': None,
+            'project-option': self._write('proj.json', '{}'), 'keep': False,
+            }
+        self._write('mol.png', 'image')
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def _write(self, name, content, mode='w'):
+
+        """Writes a file in the temporary directory and returns its name"""
+
+        file_name = os.path.join(self.work_dir, name)
+        with open(file_name, mode) as out_file:
+            out_file.write(content)
+        return file_name
+
+    def test_up_to_date(self):
+
+        """Tests the jobs with the inputs, options, and images changed"""
+
+        checkpoint = Checkpoint(self.checkpoint_file)
+        self.assertFalse(
+            checkpoint.is_done(self.job, get_fingerprint(self.job))
+            )
+        checkpoint.record(self.job, get_fingerprint(self.job))
+        self.assertTrue(
+            Checkpoint(self.checkpoint_file).is_done(
+                self.job, get_fingerprint(self.job)
+                )
+            )
+
+        for name in ['mol.gjf', 'proj.json', 'mol.png']:
+            self._write(name, ' ', mode='a')
+            self.assertFalse(
+                Checkpoint(self.checkpoint_file).is_done(
+                    self.job, get_fingerprint(self.job)
+                    )
+                )
+            checkpoint.record(self.job, get_fingerprint(self.job))
+
+        os.remove(self.job['input'])
+        self.assertIsNone(get_fingerprint(self.job))
+
+    def test_truncated(self):
+
+        """Tests the recording after a truncated entry"""
+
+        self._write('batch.ckpt', '{"output": "/tmp/mol', mode='a')
+        checkpoint = Checkpoint(self.checkpoint_file)
+        self.assertEqual(checkpoint.entries, {})
+        checkpoint.record(self.job, get_fingerprint(self.job))
+        self.assertTrue(
+            Checkpoint(self.checkpoint_file).is_done(
+                self.job, get_fingerprint(self.job)
+                )
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for the cache of parsed configuration files
+=================================================
+
+The configuration files are written in a temporary directory, and they are
+given in JSON, since the YAML parser is optional.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ccpoviz.chainoptions import FrozenMap
+from ccpoviz.configcache import ConfigCache
+
+
+class ConfigCacheTest(unittest.TestCase):
+
+    """Tests the caching in the memory and on the disk"""
+
+    def setUp(self):
+
+        """Sets up the temporary directory with a configuration file"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.work_dir, 'cache')
+        self.config_file = os.path.join(self.work_dir, 'proj.json')
+        self._write_config('{"graph-width": 100, "list": [1, 2]}', 0.0)
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def _write_config(self, content, mtime):
+
+        """Writes the configuration file with the given modification time"""
+
+        with open(self.config_file, 'w') as out_file:
+            out_file.write(content)
+        os.utime(self.config_file, (mtime, mtime))
+
+    def test_memory(self):
+
+        """Tests the hits and the invalidation in the memory"""
+
+        cache = ConfigCache()
+        config = cache.load(self.config_file)
+        self.assertIsInstance(config, FrozenMap)
+        self.assertEqual(config, {'graph-width': 100, 'list': [1, 2]})
+        self.assertIs(cache.load(self.config_file), config)
+        self.assertEqual(cache.stats, {'hits': 1, 'disk_hits': 0, 'parses': 1})
+
+        self._write_config('{"graph-width": 200, "list": [1, 2]}', 10.0)
+        self.assertEqual(cache.load(self.config_file)['graph-width'], 200)
+        self.assertEqual(cache.stats['parses'], 2)
+
+        self._write_config('{"graph-width": 200, ', 20.0)
+        with self.assertRaises(ValueError):
+            cache.load(self.config_file)
+        with self.assertRaises((IOError, OSError)):
+            cache.load(os.path.join(self.work_dir, 'absent.json'))
+
+    def test_content(self):
+
+        """Tests the parsing of the content given by the caller"""
+
+        cache = ConfigCache()
+        config = cache.load(self.config_file, b'{"graph-width": 500}')
+        self.assertEqual(config, {'graph-width': 500})
+        self.assertIs(cache.load(self.config_file), config)
+        self.assertEqual(cache.stats, {'hits': 1, 'disk_hits': 0, 'parses': 1})
+
+    def test_disk(self):
+
+        """Tests the sharing of the parsed files by the disk"""
+
+        config = ConfigCache(self.cache_dir).load(self.config_file)
+
+        cache = ConfigCache(self.cache_dir)
+        self.assertEqual(cache.load(self.config_file), config)
+        self.assertEqual(cache.stats, {'hits': 0, 'disk_hits': 1, 'parses': 0})
+
+        self._write_config('{"graph-width": 300, "list": []}', 10.0)
+        self.assertEqual(cache.load(self.config_file)['graph-width'], 300)
+        self.assertEqual(cache.stats['parses'], 1)
+        self.assertEqual(
+            len([i for i in os.listdir(self.cache_dir)
+                 if i.endswith('.json')]), 2
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
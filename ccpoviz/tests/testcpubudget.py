@@ -0,0 +1,52 @@
+"""
+Tests for the budget of processors
+==================================
+
+"""
+
+import unittest
+
+from ccpoviz import cpubudget
+
+
+class CpuBudgetTest(unittest.TestCase):
+
+    """Tests the allocation of processors and threads"""
+
+    def test_cpu_list(self):
+
+        """Tests the parsing and formatting of processor lists"""
+
+        cpus = cpubudget.parse_cpu_list('0-3,8,10-11\n')
+        self.assertEqual(cpus, [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(cpubudget.format_cpu_list(cpus), '0-3,8,10-11')
+        self.assertRaises(ValueError, cpubudget.parse_cpu_list, '0-1-2')
+
+    def test_decide_threads(self):
+
+        """Tests the deciding of the number of threads"""
+
+        # Even share among the renders to be started
+        self.assertEqual(cpubudget.decide_threads(64, 4, 1000), 16)
+        # Limited by the number of blocks
+        self.assertEqual(cpubudget.decide_threads(64, 1, 12), 12)
+        # Limited by the explicit maximum
+        self.assertEqual(cpubudget.decide_threads(64, 1, 1000, 8), 8)
+        # At least one thread
+        self.assertEqual(cpubudget.decide_threads(2, 4, 1000), 1)
+
+        self.assertEqual(cpubudget.count_blocks(1024, 768), 32 * 24)
+        self.assertEqual(cpubudget.count_blocks(100, 33), 4 * 2)
+
+    def test_allocation(self):
+
+        """Tests the allocation and releasing of processors"""
+
+        budget = cpubudget.CpuBudget()
+        n_cpus = len(budget.cpus)
+        cpus = budget.allocate(n_cpus)
+        self.assertEqual(cpus, sorted(budget.cpus))
+        self.assertEqual(len(budget.free), 0)
+        self.assertRaises(ValueError, budget.allocate, 1)
+        budget.release(cpus)
+        self.assertEqual(len(budget.free), n_cpus)
@@ -0,0 +1,123 @@
+"""
+Tests for the merging and changing of the bonds
+===============================================
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ccpoviz.chainoptions import freeze
+from ccpoviz.drawbonds import (
+    bond_key, update_bonds, change_bond_set, form_bonds_list
+    )
+from ccpoviz.getoptions import get_options
+from ccpoviz.structure import Structure, Atm
+from ccpoviz.util import ProgramTermination
+
+
+class BondKeyTest(unittest.TestCase):
+
+    """Tests the canonical keys of the bonds"""
+
+    def test_bond_key(self):
+
+        """Tests the ordering of the atoms and the periodic images"""
+
+        self.assertEqual(bond_key((0, 1, 1.0)), (0, 1, ()))
+        self.assertEqual(bond_key((1, 0, 2.0)), (0, 1, ()))
+        self.assertEqual(bond_key((0, 1, 1.0, (0, 0, 0))), (0, 1, ()))
+
+        # The image is negated when the atoms are swapped
+        self.assertEqual(
+            bond_key((3, 1, 1.0, (1, 0, -1))), (1, 3, (-1, 0, 1))
+            )
+        self.assertEqual(
+            bond_key((1, 3, 1.0, (-1, 0, 1))), (1, 3, (-1, 0, 1))
+            )
+
+        # Bonds to the own images are made lexicographically positive
+        self.assertEqual(bond_key((2, 2, 1.0, (0, -1, 0))), (2, 2, (0, 1, 0)))
+        self.assertEqual(bond_key((2, 2, 1.0, (0, 1, 0))), (2, 2, (0, 1, 0)))
+
+
+class UpdateBondsTest(unittest.TestCase):
+
+    """Tests the merging of the bonds and the changes of the bond sets"""
+
+    def test_update_bonds(self):
+
+        """Tests the addition, change, and removal of the bonds"""
+
+        existing = [
+            (0, 1, 1.0), (1, 2, 1.0), (2, 2, 1.0, (0, 0, 1)),
+            (0, 3, 1.0, (1, 0, 0))
+            ]
+        new = [
+            (2, 1, 2.0), (2, 2, 0.0, (0, 0, -1)), (3, 0, 1.5, (-1, 0, 0)),
+            (3, 0, 1.0, (1, 0, 0)), (4, 5, 0.0), (1, 4, 1.0)
+            ]
+        self.assertEqual(update_bonds(existing, new), [
+            (0, 1, 1.0), (1, 2, 2.0), (0, 3, 1.5, (1, 0, 0)),
+            (0, 3, 1.0, (-1, 0, 0)), (1, 4, 1.0)
+            ])
+        self.assertEqual(update_bonds([], [(1, 0, 0.0)]), [])
+
+    def test_change_bond_set(self):
+
+        """Tests the changes of the bonds selected by the elements"""
+
+        symbs = ['O', 'H', 'H', 'C']
+        bonds = [(0, 1, 1.0), (0, 2, 1.0, (0, 1, 0)), (1, 2, 1.0), (0, 3, 2.0)]
+
+        self.assertEqual(change_bond_set(bonds, symbs, ['H'], 0.0), [
+            (0, 3, 2.0)
+            ])
+        self.assertEqual(change_bond_set(bonds, symbs, ['H', 'O'], 0.5), [
+            (0, 1, 0.5), (0, 2, 0.5, (0, 1, 0)), (1, 2, 1.0), (0, 3, 2.0)
+            ])
+        self.assertEqual(change_bond_set(bonds, symbs, ['H', 'H'], 0.0), [
+            (0, 1, 1.0), (0, 2, 1.0, (0, 1, 0)), (0, 3, 2.0)
+            ])
+        self.assertRaises(
+            ValueError, change_bond_set, bonds, symbs, ['H', 'O', 'C'], 1.0
+            )
+
+    def test_form_bonds_list(self):
+
+        """Tests the bonds from the computation, structure, and options"""
+
+        structure = Structure(['water'])
+        structure.extend_atms([
+            Atm(symb='O', coord=np.array([0.0, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([0.96, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([-0.24, 0.93, 0.0])),
+            ])
+        structure.extend_bonds([(2, 1, 0.5), (2, 0, 2.0)])
+        ops_dict = get_options(None, structure, None).derive({
+            'compute-bonds': True
+            })
+
+        self.assertEqual(form_bonds_list(structure, ops_dict), [
+            (0, 1, 1.0), (0, 2, 2.0), (1, 2, 0.5)
+            ])
+
+        ops_dict = ops_dict.derive({'bond-set-changes': freeze([
+            {'elements': ['H', 'O'], 'order': 1.5},
+            {'elements': ['H', 'H'], 'order': 0.0},
+            ])})
+        self.assertEqual(form_bonds_list(structure, ops_dict), [
+            (0, 1, 1.5), (0, 2, 1.5)
+            ])
+
+        ops_dict = ops_dict.derive({'bond-set-changes': freeze([
+            {'elements': [], 'order': 1.0}
+            ])})
+        self.assertRaises(
+            ProgramTermination, form_bonds_list, structure, ops_dict
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
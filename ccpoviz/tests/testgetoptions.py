@@ -0,0 +1,90 @@
+"""
+Tests for getting the options of the runs
+=========================================
+
+The options are got from configuration files written in a temporary directory.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ccpoviz import configcache
+from ccpoviz.getoptions import get_options, get_options_schema
+
+
+class GetOptionsTest(unittest.TestCase):
+
+    """Tests the memoized options of the project configurations"""
+
+    def setUp(self):
+
+        """Sets up the temporary directory with the configuration files"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.proj_file = self._write('proj.json', '{"graph-width": 100}')
+        self.mol_file = self._write('mol.json', '{"aspect-ratio": 2.0}')
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def _write(self, name, content):
+
+        """Writes a file in the temporary directory and returns its name"""
+
+        file_name = os.path.join(self.work_dir, name)
+        with open(file_name, 'w') as out_file:
+            out_file.write(content)
+        return file_name
+
+    def test_memoized_project(self):
+
+        """Tests the reuse and the invalidation of the project options"""
+
+        proj_ops = get_options(None, None, self.proj_file)
+        self.assertEqual(proj_ops['graph-width'], 100)
+        self.assertIs(get_options(None, None, self.proj_file), proj_ops)
+        self.assertIs(
+            get_options(None, None, None), get_options_schema().default
+            )
+
+        ops = get_options(self.mol_file, None, self.proj_file)
+        self.assertEqual(ops['graph-width'], 100)
+        self.assertEqual(ops['aspect-ratio'], 2.0)
+        self.assertIs(ops['element-radii'], proj_ops['element-radii'])
+
+        # Touched without changes
+        stat = os.stat(self.proj_file)
+        os.utime(self.proj_file, (stat.st_atime, stat.st_mtime + 10.0))
+        self.assertIs(get_options(None, None, self.proj_file), proj_ops)
+
+        # Changed content, which is read only once for the hash and parsing
+        self._write('proj.json', '{"graph-width": 2000}')
+        os.utime(self.proj_file, (stat.st_atime, stat.st_mtime + 20.0))
+        ops = get_options(self.mol_file, None, self.proj_file)
+        self.assertEqual(ops['graph-width'], 2000)
+        self.assertEqual(ops['aspect-ratio'], 2.0)
+
+        def no_read(file_name, *args):
+            """Refuses reading the project file in the cache"""
+            if file_name == self.proj_file:
+                raise IOError('%s read twice' % file_name)
+            return open(file_name, *args)
+
+        self._write('proj.json', '{"graph-width": 3000}')
+        os.utime(self.proj_file, (stat.st_atime, stat.st_mtime + 30.0))
+        try:
+            configcache.open = no_read
+            ops = get_options(None, None, self.proj_file)
+        finally:
+            del configcache.open
+        self.assertEqual(ops['graph-width'], 3000)
+
+
+if __name__ == '__main__':
+    unittest.main()
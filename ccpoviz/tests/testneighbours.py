@@ -0,0 +1,143 @@
+"""
+Tests for the neighbour search
+==============================
+
+The cell-list search is compared against the plain all-pairs search on random
+structures.
+
+"""
+
+import itertools
+import unittest
+
+import numpy as np
+from numpy import linalg
+
+from ccpoviz import neighbours
+
+
+class CellListTest(unittest.TestCase):
+
+    """Tests the cell-list search against the all-pairs search"""
+
+    def setUp(self):
+
+        """Sets up a random structure"""
+
+        rand = np.random.RandomState(10)
+        self.coords = rand.uniform(0.0, 12.0, size=(400, 3))
+        self.radii = rand.choice([0.31, 0.76, 1.2], size=400)
+
+    def _all_pairs(self):
+
+        """Finds the bonded pairs by the all-pairs search"""
+
+        return [
+            (i, j)
+            for i, j in itertools.combinations(xrange(len(self.coords)), 2)
+            if linalg.norm(self.coords[i] - self.coords[j]) <
+            self.radii[i] + self.radii[j]
+            ]
+
+    def test_against_all_pairs(self):
+
+        """Tests the result against the all-pairs search"""
+
+        idx1, idx2 = neighbours.find_bonded_pairs(self.coords, self.radii)
+        self.assertEqual(
+            zip(idx1.tolist(), idx2.tolist()), self._all_pairs()
+            )
+
+    def test_small_chunks(self):
+
+        """Tests the result when the candidates are split into many chunks"""
+
+        orig_size = neighbours.CHUNK_SIZE
+        neighbours.CHUNK_SIZE = 50
+        try:
+            idx1, idx2 = neighbours.find_bonded_pairs(
+                self.coords, self.radii
+                )
+        finally:
+            neighbours.CHUNK_SIZE = orig_size
+        self.assertEqual(
+            zip(idx1.tolist(), idx2.tolist()), self._all_pairs()
+            )
+
+    def test_trivial(self):
+
+        """Tests structures with less than two atoms"""
+
+        for n_atms in [0, 1]:
+            idx1, idx2 = neighbours.find_bonded_pairs(
+                np.zeros((n_atms, 3)), np.ones(n_atms)
+                )
+            self.assertEqual(len(idx1), 0)
+            self.assertEqual(len(idx2), 0)
+
+
+class PeriodicSearchTest(unittest.TestCase):
+
+    """Tests the neighbour search with periodic boundary conditions"""
+
+    def test_simple_cubic(self):
+
+        """Tests a simple cubic lattice with one atom in the cell"""
+
+        idx1, idx2, images = neighbours.find_periodic_bonded_pairs(
+            np.array([[0.5, 0.5, 0.5]]), np.array([1.1]),
+            [np.array([2.0, 0.0, 0.0]), np.array([0.0, 2.0, 0.0]),
+             np.array([0.0, 0.0, 2.0])]
+            )
+
+        self.assertEqual(idx1.tolist(), [0, 0, 0])
+        self.assertEqual(idx2.tolist(), [0, 0, 0])
+        self.assertEqual(
+            images.tolist(), [[0, 0, 1], [0, 1, 0], [1, 0, 0]]
+            )
+
+    def test_triclinic_boundary(self):
+
+        """Tests bonds across the boundary of a triclinic cell"""
+
+        latt_vecs = [
+            np.array([5.0, 0.0, 0.0]), np.array([1.0, 5.0, 0.0]),
+            np.array([0.5, 0.5, 5.0])
+            ]
+        # The two atoms are directly bonded, with the second one given outside
+        # the cell. After translating it by a lattice vector, the bond should
+        # be to its image.
+        coords = np.array([[0.2, 1.0, 1.0], [-0.6, 1.0, 1.0]])
+        idx1, idx2, images = neighbours.find_periodic_bonded_pairs(
+            coords, np.array([0.76, 0.76]), latt_vecs
+            )
+
+        self.assertEqual(
+            zip(idx1.tolist(), idx2.tolist(), images.tolist()),
+            [(0, 1, [0, 0, 0])]
+            )
+
+        coords[1] += latt_vecs[0]
+        idx1, idx2, images = neighbours.find_periodic_bonded_pairs(
+            coords, np.array([0.76, 0.76]), latt_vecs
+            )
+        self.assertEqual(
+            zip(idx1.tolist(), idx2.tolist(), images.tolist()),
+            [(0, 1, [-1, 0, 0])]
+            )
+
+    def test_molecule(self):
+
+        """Tests the search without lattice vectors"""
+
+        rand = np.random.RandomState(3)
+        coords = rand.uniform(0.0, 5.0, size=(50, 3))
+        radii = np.full(50, 0.76)
+
+        ref = neighbours.find_bonded_pairs(coords, radii)
+        idx1, idx2, images = neighbours.find_periodic_bonded_pairs(
+            coords, radii, []
+            )
+        self.assertEqual(idx1.tolist(), ref[0].tolist())
+        self.assertEqual(idx2.tolist(), ref[1].tolist())
+        self.assertEqual(images.shape, (len(idx1), 0))
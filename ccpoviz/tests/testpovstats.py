@@ -0,0 +1,122 @@
+"""
+Tests for the parsing of the pov-ray statistics
+===============================================
+
+The statistics are parsed from trimmed outputs of pov-ray 3.7 and 3.6.
+
+"""
+
+import unittest
+
+from ccpoviz.povstats import parse_stats, parse_progress, merge_stats
+
+
+OUTPUT_37 = '''Parser Options
+  Bounding boxes.......On   Bounding threshold: 3
+----------------------------------------------------------------------------
+Parser Statistics
+----------------------------------------------------------------------------
+Finite Objects:          240
+Infinite Objects:          0
+Light Sources:             2
+Total:                   242
+----------------------------------------------------------------------------
+Parser Time
+  Parse Time:       0 hours  0 minutes  0 seconds (0.004 seconds)
+              using 1 thread(s) with 0.003 CPU-seconds total
+  Bounding Time:    0 hours  0 minutes  0 seconds (0.001 seconds)
+              using 1 thread(s) with 0.001 CPU-seconds total
+----------------------------------------------------------------------------
+\rRendered 240000 of 480000 pixels (50%)\rRendered 480000 of 480000 pixels
+----------------------------------------------------------------------------
+Render Statistics
+Image Resolution 800 x 600
+----------------------------------------------------------------------------
+Pixels:           482400   Samples:          482400   Smpls/Pxl: 1.00
+Rays:            1164394   Saved:             10201   Max Level: 3/5
+----------------------------------------------------------------------------
+Ray->Shape Intersection          Tests       Succeeded  Percentage
+----------------------------------------------------------------------------
+Cylinder                         924332          102399     11.08
+Sphere                          2313114          416373     18.00
+Bounding Box                    8813144         2912313     33.05
+----------------------------------------------------------------------------
+Shadow Ray Tests:          758103   Succeeded:              1011
+----------------------------------------------------------------------------
+Peak memory used:          4427776 bytes
+----------------------------------------------------------------------------
+Render Time:
+  Photon Time:      No photons
+  Radiosity Time:   No radiosity
+  Trace Time:       0 hours  1 minutes  1 seconds (61.258 seconds)
+              using 8 thread(s) with 480.953 CPU-seconds total
+POV-Ray finished
+'''
+
+OUTPUT_36 = '''Rendering line 300 of 600
+Pixels:          480000   Samples:         480000   Smpls/Pxl: 1.00
+Rays:            960000   Saved:              0   Max Level: 1/5
+Time For Parse:    0 hours  0 minutes   1.0 seconds (1 seconds)
+Time For Trace:    0 hours  2 minutes   3.0 seconds (123 seconds)
+'''
+
+
+class PovStatsTest(unittest.TestCase):
+
+    """Tests the parsing of the statistics"""
+
+    def test_povray37(self):
+
+        """Tests the parsing of the output of pov-ray 3.7"""
+
+        stats = parse_stats(OUTPUT_37)
+        self.assertAlmostEqual(stats['parse_time'], 0.004)
+        self.assertAlmostEqual(stats['bounding_time'], 0.001)
+        self.assertIsNone(stats['photon_time'])
+        self.assertIsNone(stats['radiosity_time'])
+        self.assertAlmostEqual(stats['trace_time'], 61.258)
+        self.assertEqual(stats['trace_threads'], 8)
+        self.assertAlmostEqual(stats['trace_cpu_time'], 480.953)
+        self.assertEqual(stats['pixels'], 482400)
+        self.assertEqual(stats['rays'], 1164394)
+        self.assertEqual(stats['rays_saved'], 10201)
+        self.assertEqual(stats['finite_objects'], 240)
+        self.assertEqual(stats['light_sources'], 2)
+        self.assertEqual(stats['total_objects'], 242)
+        self.assertTrue(stats['bounding_boxes'])
+        self.assertEqual(stats['bounding_threshold'], 3)
+        self.assertEqual(stats['peak_memory'], 4427776)
+        self.assertEqual(
+            stats['intersections']['Bounding Box'], [8813144, 2912313]
+            )
+        self.assertEqual(len(stats['intersections']), 3)
+        self.assertEqual(stats['percent_complete'], 100.0)
+
+    def test_povray36(self):
+
+        """Tests the parsing of the output of pov-ray 3.6"""
+
+        stats = parse_stats(OUTPUT_36)
+        self.assertAlmostEqual(stats['parse_time'], 1.0)
+        self.assertAlmostEqual(stats['trace_time'], 123.0)
+        self.assertEqual(stats['rays'], 960000)
+        self.assertIsNone(stats['peak_memory'])
+        self.assertEqual(parse_progress(OUTPUT_36), 50.0)
+
+    def test_progress_merge(self):
+
+        """Tests the progress of unfinished renders and merging of tiles"""
+
+        partial = parse_stats('Rendered 100 of 400 pixels (25%)\r')
+        self.assertEqual(partial['percent_complete'], 25.0)
+        self.assertIsNone(partial['trace_time'])
+
+        merged = merge_stats([parse_stats(OUTPUT_37), partial])
+        self.assertEqual(merged['pixels'], 482400)
+        self.assertAlmostEqual(merged['trace_time'], 61.258)
+        self.assertEqual(merged['percent_complete'], 62.5)
+        self.assertEqual(merged['intersections']['Sphere'], [2313114, 416373])
+
+
+if __name__ == '__main__':
+    unittest.main()
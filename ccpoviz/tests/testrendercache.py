@@ -0,0 +1,158 @@
+"""
+Tests for the render cache
+==========================
+
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+from ccpoviz import rendercache
+from ccpoviz.getoptions import get_options
+from ccpoviz.runpov import run_pov
+
+from fakepovray import COPY_POVRAY, write_options
+
+
+class RenderCacheTest(unittest.TestCase):
+
+    """Tests the keys, storing, fetching, and eviction of the cache"""
+
+    def setUp(self):
+
+        """Sets up a temporary directory with a scene"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.work_dir, 'cache')
+        self.pov_file = os.path.join(self.work_dir, 'mol.pov')
+        with open(self.pov_file, 'w') as pov_file:
+            pov_file.write('sphere { <0, 0, 0>, 1 }\n')
+        self.args = [
+            'povray', '+I' + self.pov_file, '+W100', '+H75', '+Omol.png',
+            '+A', '+Q9', '+WT4'
+            ]
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def _write_image(self, name, content):
+
+        """Writes a fake image and returns its path"""
+
+        path = os.path.join(self.work_dir, name)
+        with open(path, 'w') as image:
+            image.write(content)
+        return path
+
+    def test_keys(self):
+
+        """Tests the dependence of the keys on the scene and settings"""
+
+        key = rendercache.form_key(self.args, self.pov_file)
+
+        other_args = list(self.args)
+        other_args[4] = '+Oother.png'
+        other_args[7] = '+WT1'
+        self.assertEqual(rendercache.form_key(other_args, self.pov_file), key)
+
+        other_args[6] = '+Q5'
+        self.assertNotEqual(
+            rendercache.form_key(other_args, self.pov_file), key
+            )
+        self.assertNotEqual(
+            rendercache.form_key(self.args, self.pov_file, ['tiles']), key
+            )
+
+        with open(self.pov_file, 'a') as pov_file:
+            pov_file.write('sphere { <1, 0, 0>, 1 }\n')
+        self.assertNotEqual(
+            rendercache.form_key(self.args, self.pov_file), key
+            )
+
+    def test_store_fetch(self):
+
+        """Tests the storing and fetching of images with statistics"""
+
+        cache = rendercache.RenderCache(self.cache_dir, 1)
+        output = os.path.join(self.work_dir, 'out.png')
+
+        self.assertFalse(cache.fetch('a', output))
+        cache.store('a', self._write_image('a.png', 'image a'))
+        self.assertTrue(cache.fetch('a', output))
+        with open(output, 'r') as image:
+            self.assertEqual(image.read(), 'image a')
+
+        self.assertEqual(cache.stats, {
+            'hits': 1, 'misses': 1, 'stores': 1, 'evictions': 0
+            })
+        self.assertEqual(cache.save_stats()['hits'], 1)
+        self.assertEqual(cache.save_stats()['hits'], 2)
+
+    def test_linked_entries(self):
+
+        """Tests the protection of the cached images linked to the outputs"""
+
+        cache = rendercache.RenderCache(self.cache_dir, 1, link=True)
+        output = os.path.join(self.work_dir, 'out.png')
+        entry = os.path.join(self.cache_dir, 'a.png')
+
+        cache.store('a', self._write_image('a.png', 'image a'))
+        self.assertEqual(stat.S_IMODE(os.stat(entry).st_mode), 0o444)
+        self.assertTrue(cache.fetch('a', output))
+        self.assertTrue(os.path.samefile(output, entry))
+        self.assertFalse(cache.fetch('b', output))
+        self.assertFalse(os.path.exists(output))
+
+        # Rendering a changed scene into the output linked to the old image
+        ops_dict = get_options(None, None, write_options(
+            self.work_dir, 0.0, COPY_POVRAY, {
+                'render-cache-dir': self.cache_dir, 'render-cache-link': True,
+                'work-threads': 1
+                }
+            ))
+        output = os.path.join(self.work_dir, 'mol.png')
+        run_pov(output, True, ops_dict)
+        self.assertIsNone(run_pov(output, True, ops_dict))
+        entry = next(
+            os.path.join(self.cache_dir, i) for i in os.listdir(self.cache_dir)
+            if os.path.samefile(os.path.join(self.cache_dir, i), output)
+            )
+
+        with open(self.pov_file, 'w') as pov_file:
+            pov_file.write('sphere { <1, 0, 0>, 1 }\n')
+        run_pov(output, True, ops_dict)
+        with open(entry, 'r') as image:
+            self.assertEqual(image.read(), 'sphere { <0, 0, 0>, 1 }\n')
+        with open(output, 'r') as image:
+            self.assertEqual(image.read(), 'sphere { <1, 0, 0>, 1 }\n')
+
+    def test_eviction(self):
+
+        """Tests the eviction of the least recently used images"""
+
+        # Room for two images of 0.4 megabytes
+        cache = rendercache.RenderCache(self.cache_dir, 1)
+        content = 'x' * (4 * 2 ** 20 // 10)
+        output = os.path.join(self.work_dir, 'out.png')
+
+        for key in ['a', 'b']:
+            cache.store(key, self._write_image(key + '.png', content))
+        past = time.time() - 100
+        os.utime(os.path.join(self.cache_dir, 'a.png'), (past, past))
+        os.utime(os.path.join(self.cache_dir, 'b.png'), (past - 10, past - 10))
+
+        # Using b makes a the least recently used one
+        self.assertTrue(cache.fetch('b', output))
+        cache.store('c', self._write_image('c.png', content))
+
+        self.assertEqual(cache.stats['evictions'], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, 'a.png')))
+        self.assertTrue(cache.fetch('b', output))
+        self.assertTrue(cache.fetch('c', output))
@@ -0,0 +1,164 @@
+"""
+Tests for the render daemon
+===========================
+
+The daemon is driven in the test process, with the requests sent over its
+socket and the renders done by a fake pov-ray program.
+
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+from ccpoviz.renderdaemon import (
+    RenderDaemon, encode_message, split_messages, normalize_job
+    )
+
+from fakepovray import write_input, write_options
+
+
+class MessageTest(unittest.TestCase):
+
+    """Tests the messages and jobs of the protocol"""
+
+    def test_split(self):
+
+        """Tests the splitting of the messages from a buffer"""
+
+        buf = encode_message({'command': 'status'}) + b'\n{"id"'
+        messages, rest = split_messages(buf)
+        self.assertEqual(messages, [{'command': 'status'}])
+        self.assertEqual(rest, b'{"id"')
+        self.assertRaises(ValueError, split_messages, b'[1]\n')
+
+    def test_normalize(self):
+
+        """Tests the normalization of the jobs"""
+
+        job = normalize_job({'input': '/tmp/water.gjf'})
+        self.assertEqual(job['output'], '/tmp/water.png')
+        self.assertEqual(job['reader'], 'gjf')
+        self.assertFalse(job['keep'])
+        self.assertRaises(ValueError, normalize_job, {'output': 'a.png'})
+        self.assertRaises(
+            ValueError, normalize_job, {'input': 'a.gjf', 'colour': 'red'}
+            )
+
+
+class RenderDaemonTest(unittest.TestCase):
+
+    """Tests the daemon with a fake pov-ray program"""
+
+    def setUp(self):
+
+        """Sets up the input, the fake pov-ray, and the daemon"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.input_file = write_input(self.work_dir)
+        self.options = write_options(self.work_dir, 0.1)
+
+        self.socket_path = os.path.join(self.work_dir, 'daemon.sock')
+        self.daemon = RenderDaemon(self.socket_path, 1)
+
+    def tearDown(self):
+
+        """Shuts down the daemon and removes the temporary directory"""
+
+        self.daemon.close()
+        shutil.rmtree(self.work_dir)
+
+    def _request(self, requests, timeout=30.0, on_serve=None):
+
+        """Sends the requests and serves them until all are answered
+
+        The given function is called after each iteration of the daemon.
+
+        """
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        for request in requests:
+            sock.sendall(encode_message(request))
+        sock.shutdown(socket.SHUT_WR)
+        sock.setblocking(False)
+
+        answers = []
+        buf = b''
+        deadline = time.time() + timeout
+        while len(answers) < len(requests) and time.time() < deadline:
+            self.daemon.serve_once(0.05)
+            if on_serve is not None:
+                on_serve()
+            try:
+                chunk = sock.recv(65536)
+            except socket.error:
+                continue
+            new_answers, buf = split_messages(buf + chunk)
+            answers.extend(new_answers)
+        sock.close()
+
+        return answers
+
+    def test_dedup(self):
+
+        """Tests the deduplication of identical jobs and the status"""
+
+        job = {'input': self.input_file, 'project-option': self.options}
+        answers = self._request([
+            {'command': 'render', 'id': 0, 'job': job},
+            {'command': 'render', 'id': 1, 'job': job, 'priority': 3},
+            {'command': 'status', 'id': 2},
+            {'command': 'bogus', 'id': 3},
+            ])
+
+        by_id = dict((i['id'], i) for i in answers)
+        self.assertEqual(by_id[2]['queued'] + by_id[2]['running'], 1)
+        self.assertEqual(by_id[3]['status'], 'error')
+        for i in [0, 1]:
+            self.assertEqual(by_id[i]['status'], 'done')
+            self.assertEqual(
+                by_id[i]['output'], os.path.join(self.work_dir, 'water.png')
+                )
+        self.assertTrue(os.path.exists(by_id[0]['output']))
+        self.assertEqual(self.daemon.stats['deduplicated'], 1)
+        self.assertEqual(self.daemon.stats['done'], 1)
+
+    def test_overlap(self):
+
+        """Tests the scene generation of a job during another render"""
+
+        options = write_options(self.work_dir, 0.5)
+        jobs = [
+            {'input': write_input(self.work_dir, i), 'project-option': options}
+            for i in ['water.gjf', 'ice.gjf']
+            ]
+        overlaps = []
+
+        def check_overlap():
+            """Records if a scene is ready while another job renders"""
+            # pylint: disable=protected-access
+            render_jobs = [
+                i.render_job for i in self.daemon._entries.values()
+                if i.render_job is not None
+                ]
+            statuses = [
+                'ready' if i.status == 'scene' and i._scene_res.ready()
+                else i.status for i in render_jobs
+                ]
+            overlaps.append('running' in statuses and 'ready' in statuses)
+
+        answers = self._request([
+            {'command': 'render', 'id': i, 'job': job}
+            for i, job in enumerate(jobs)
+            ], on_serve=check_overlap)
+
+        self.assertEqual([i['status'] for i in answers], ['done', 'done'])
+        self.assertTrue(any(overlaps))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+"""
+Tests for the progressive rendering
+===================================
+
+The draft and the final render are done by a fake pov-ray program logging its
+arguments, and the answer of the user and the interruptions are simulated by
+replacing the functions in the :py:mod:`runpov` module.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ccpoviz import runpov
+from ccpoviz.getoptions import get_options
+from ccpoviz.util import ProgramTermination
+
+from fakepovray import LOG_POVRAY, read_log, write_options
+
+
+class ProgressiveTest(unittest.TestCase):
+
+    """Tests the draft and the final render of the progressive mode"""
+
+    def setUp(self):
+
+        """Sets up the fake pov-ray and the pov-ray input"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.options = write_options(self.work_dir, 0.0, LOG_POVRAY, {
+            'progressive': True, 'graph-width': 400, 'aspect-ratio': 2.0,
+            'quality': 9, 'preview-quality': 4, 'preview-scale': 0.25,
+            'antialias': True, 'work-threads': 1
+            })
+        self.output_file = os.path.join(self.work_dir, 'water.png')
+        self.pov_file = os.path.join(self.work_dir, 'water.pov')
+        self.preview_file = os.path.join(self.work_dir, 'water.preview.png')
+        with open(self.pov_file, 'w'):
+            pass
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def _run(self, changes=None, keep=False):
+
+        """Runs pov-ray with the options changed"""
+
+        ops_dict = get_options(None, None, self.options).derive(changes or {})
+        return runpov.run_pov(self.output_file, keep, ops_dict)
+
+    def test_draft_args(self):
+
+        """Tests the arguments of the draft and the final render"""
+
+        self._run()
+        draft, final = read_log(self.work_dir)
+
+        self.assertIn('+W100', draft)
+        self.assertIn('+H50', draft)
+        self.assertIn('+Q4', draft)
+        self.assertIn('+O' + self.preview_file, draft)
+        self.assertFalse(any(i.startswith('+A') for i in draft))
+
+        self.assertIn('+W400', final)
+        self.assertIn('+Q9', final)
+        self.assertIn('+O' + self.output_file, final)
+        self.assertTrue(any(i.startswith('+A') for i in final))
+
+        ops_dict = get_options(None, None, self.options).derive({
+            'quality': 2
+            })
+        self.assertIn(
+            '+Q2', runpov.gen_additional_args(ops_dict, draft=True)
+            )
+
+    def test_preview_targets(self):
+
+        """Tests the sidecar and output targets of the draft"""
+
+        self._run(keep=True)
+        self.assertTrue(os.path.exists(self.preview_file))
+        self.assertTrue(os.path.exists(self.pov_file))
+
+        os.remove(self.preview_file)
+        self._run({'preview-target': 'output'})
+        draft, final = read_log(self.work_dir)[2:]
+        self.assertIn('+O' + self.output_file, draft)
+        self.assertIn('+O' + self.output_file, final)
+        self.assertFalse(os.path.exists(self.preview_file))
+        self.assertFalse(os.path.exists(self.pov_file))
+
+        self.assertRaises(
+            ProgramTermination, self._run, {'preview-target': 'elsewhere'}
+            )
+
+    def test_abort(self):
+
+        """Tests the abortion after the draft and during the final render"""
+
+        confirm = runpov.confirm_final_render
+        core = runpov.run_pov_core
+        try:
+            runpov.confirm_final_render = lambda: False
+            self.assertIsNone(self._run({'preview-confirm': True}))
+            self.assertEqual(len(read_log(self.work_dir)), 1)
+            self.assertTrue(os.path.exists(self.preview_file))
+            self.assertFalse(os.path.exists(self.pov_file))
+            self.assertFalse(os.path.exists(self.output_file))
+
+            with open(self.pov_file, 'w'):
+                pass
+            runpov.confirm_final_render = lambda: True
+            self.assertIsNotNone(self._run({'preview-confirm': True}))
+            self.assertEqual(len(read_log(self.work_dir)), 3)
+
+            def interrupt_final(*args, **kwargs):
+                """Runs the draft and interrupts the final render"""
+                if args[2] == self.output_file:
+                    raise KeyboardInterrupt()
+                return core(*args, **kwargs)
+
+            with open(self.pov_file, 'w'):
+                pass
+            runpov.run_pov_core = interrupt_final
+            self.assertRaises(ProgramTermination, self._run)
+            self.assertFalse(os.path.exists(self.pov_file))
+        finally:
+            runpov.confirm_final_render = confirm
+            runpov.run_pov_core = core
+
+    def test_confirm(self):
+
+        """Tests the answers of the user for the final render"""
+
+        stdin = runpov.sys.stdin
+        answers = []
+
+        class _Terminal(object):
+            """The standard input from a terminal"""
+            @staticmethod
+            def isatty():
+                """Tells that it is a terminal"""
+                return True
+
+        def answer(prompt):
+            """Gives the next answer"""
+            # pylint: disable=unused-argument
+            if len(answers) == 0:
+                raise EOFError()
+            return answers.pop(0)
+
+        try:
+            runpov.sys.stdin = _Terminal()
+            runpov.raw_input = answer
+            answers.extend(['', 'y', 'No', ' n '])
+            self.assertEqual(
+                [runpov.confirm_final_render() for _ in xrange(0, 5)],
+                [True, True, False, False, True]
+                )
+        finally:
+            runpov.sys.stdin = stdin
+            del runpov.raw_input
+
+
+class RenderErrorTest(unittest.TestCase):
+
+    """Tests the reporting of the errors of the final render"""
+
+    def setUp(self):
+
+        """Sets up the fake pov-ray and the pov-ray input"""
+
+        self.work_dir = tempfile.mkdtemp()
+        self.ops_dict = get_options(None, None, write_options(
+            self.work_dir, 0.0, LOG_POVRAY, {'work-threads': 1}
+            ))
+        self.output_file = os.path.join(self.work_dir, 'water.png')
+        with open(os.path.join(self.work_dir, 'water.pov'), 'w'):
+            pass
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def test_tile_errors(self):
+
+        """Tests that only the errors of the tiles are reported as such"""
+
+        def fail(*args, **kwargs):
+            """Fails as a corrupt image"""
+            # pylint: disable=unused-argument
+            raise ValueError('Corrupt image')
+
+        core = runpov.run_pov_core
+        tiles = runpov.run_pov_tiles
+        try:
+            runpov.run_pov_core = fail
+            runpov.run_pov_tiles = fail
+            self.assertRaises(
+                ValueError, runpov.run_pov, self.output_file, True,
+                self.ops_dict
+                )
+            with self.assertRaises(ProgramTermination) as cm:
+                runpov.run_pov(
+                    self.output_file, True,
+                    self.ops_dict.derive({'tile-count': 2})
+                    )
+            self.assertIn('Tiled rendering failed', cm.exception.err_msg)
+        finally:
+            runpov.run_pov_core = core
+            runpov.run_pov_tiles = tiles
+
+
+if __name__ == '__main__':
+    unittest.main()
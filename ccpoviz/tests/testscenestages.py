@@ -0,0 +1,124 @@
+"""
+Tests for the incremental generation of the scenes
+==================================================
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ccpoviz.chainoptions import freeze
+from ccpoviz.getoptions import get_options
+from ccpoviz.scenestages import (
+    STAGES, StageCache, get_affected_stages, get_input_stages
+    )
+from ccpoviz.structure import Structure, Atm
+
+
+class _RecordingDict(dict):
+
+    """The dictionary recording the keys read from it"""
+
+    def __init__(self, *args):
+
+        """Initializes the dictionary with an empty record"""
+
+        super(_RecordingDict, self).__init__(*args)
+        self.read = set()
+
+    def __getitem__(self, key):
+
+        """Records the key read"""
+
+        self.read.add(key)
+        return super(_RecordingDict, self).__getitem__(key)
+
+
+class StageCacheTest(unittest.TestCase):
+
+    """Tests the dependency graph and the reuse of the stage outputs"""
+
+    def setUp(self):
+
+        """Sets up the options for a water molecule"""
+
+        self.structure = Structure(['water'])
+        self.structure.extend_atms([
+            Atm(symb='O', coord=np.array([0.0, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([0.96, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([-0.24, 0.93, 0.0])),
+            ])
+        self.ops_dict = get_options(None, self.structure, None).derive({
+            'compute-bonds': True, 'draw-axes': True
+            })
+
+    def test_declared_options(self):
+
+        """Tests that the stages read only their declared options"""
+
+        outputs = {}
+        for name in ['camera', 'light', 'turntable', 'atoms', 'bonds',
+                     'cylinders', 'axes']:
+            stage = STAGES[name]
+            ops_dict = _RecordingDict(self.ops_dict)
+            outputs[name] = stage.compute(
+                self.structure, ops_dict, *[outputs[i] for i in stage.inputs]
+                )
+            self.assertLessEqual(ops_dict.read, set(stage.options))
+
+        self.assertEqual(len(outputs['bonds']), 2)
+
+    def test_reuse(self):
+
+        """Tests that only the affected stages are run again"""
+
+        stages = StageCache(self.structure)
+        bonds = stages.get('bonds', self.ops_dict)
+        cylinders = stages.get('cylinders', self.ops_dict)
+        atoms = stages.get('atoms', self.ops_dict)
+        self.assertEqual(stages.stats['computed'], 4)
+
+        self.assertEqual(
+            get_affected_stages(['camera-theta']),
+            set(['camera', 'light', 'turntable', 'cylinders', 'axes'])
+            )
+        ops_dict = self.ops_dict.derive({'camera-theta': 30.0})
+        self.assertIs(stages.get('bonds', ops_dict), bonds)
+        self.assertIsNot(stages.get('cylinders', ops_dict), cylinders)
+        self.assertIs(stages.get('atoms', ops_dict), atoms)
+        self.assertEqual(stages.stats['computed'], 6)
+
+        ops_dict = ops_dict.derive({'element-colour-scheme': 'Jmol'})
+        self.assertIs(stages.get('atoms', ops_dict), atoms)
+        ops_dict = ops_dict.derive({
+            'element-colour-change': freeze({'O': 'Green'})
+            })
+        self.assertIsNot(stages.get('atoms', ops_dict), atoms)
+        self.assertEqual(len(stages.get('cylinders', ops_dict).beg_coords), 2)
+        self.assertEqual(stages.stats['computed'], 7)
+
+    def test_input_files(self):
+
+        """Tests the reuse of the structures of the input files"""
+
+        work_dir = tempfile.mkdtemp()
+        try:
+            input_file = os.path.join(work_dir, 'water.gjf')
+            with open(input_file, 'w') as out_file:
+                out_file.write('# hf\n\nwater\n\n0 1\nO 0.0 0.0 0.0\n\n')
+            stages = get_input_stages(input_file, 'gjf')
+            self.assertIs(get_input_stages(input_file, 'gjf'), stages)
+            self.assertEqual(len(stages.structure.atms), 1)
+
+            os.utime(input_file, (0.0, 0.0))
+            self.assertIsNot(get_input_stages(input_file, 'gjf'), stages)
+        finally:
+            shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
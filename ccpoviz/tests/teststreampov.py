@@ -0,0 +1,173 @@
+"""
+Tests for the streaming scene writer
+====================================
+
+The scenes are written into files in a temporary directory, and the removal
+of the side data files is tested through the render driver with a fake
+pov-ray program.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ccpoviz.getoptions import get_options
+from ccpoviz.renderdriver import render_driver
+from ccpoviz.renderpov import render_pov, render_pov_template
+from ccpoviz.streampov import DATA_FILE_SUFFIXES, write_scene
+from ccpoviz.structure import Structure, Atm
+from ccpoviz.util import ProgramTermination
+
+from fakepovray import write_input, write_options
+
+
+class StreamPovTest(unittest.TestCase):
+
+    """Tests the scenes written by the streaming writer"""
+
+    def setUp(self):
+
+        """Sets up a water molecule and the temporary directory"""
+
+        self.structure = Structure(['water'])
+        self.structure.extend_atms([
+            Atm(symb='O', coord=np.array([0.0, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([0.96, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([-0.24, 0.93, 0.0])),
+            ])
+        self.ops_dict = get_options(None, self.structure, None).derive({
+            'compute-bonds': True
+            })
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def _write(self, name, writer, ops_dict, **kwargs):
+
+        """Writes the scene by a writer and returns its content"""
+
+        file_name = os.path.join(self.work_dir, name)
+        with open(file_name, 'w') as pov_file:
+            writer(self.structure, pov_file, ops_dict, **kwargs)
+        with open(file_name, 'r') as pov_file:
+            return pov_file.read()
+
+    def test_template_equivalence(self):
+
+        """Tests the literal scenes against the rendering of the template"""
+
+        for changes in [
+                {},
+                {'draw-axes': True, 'background-colour': 'White'},
+                {'turntable-frames': 4, 'light-adaptive': 1},
+        ]:
+            ops_dict = self.ops_dict.derive(changes)
+            self.assertEqual(
+                self._write('stream.pov', write_scene, ops_dict),
+                self._write('template.pov', render_pov_template, ops_dict)
+                )
+
+    def test_array_encoding(self):
+
+        """Tests the arrays of the atoms and bonds in the scene"""
+
+        scene = self._write(
+            'array.pov', write_scene,
+            self.ops_dict.derive({'scene-encoding': 'array'})
+            )
+
+        self.assertIn('#declare ccpoviz_atom_radii = array[2] {\n', scene)
+        self.assertIn('#declare ccpoviz_atom_textures = array[2] {\n', scene)
+        self.assertIn(
+            '#declare ccpoviz_atom_centres = array[3] {\n'
+            '<0.000000,0.000000,0.000000>,\n'
+            '<0.960000,0.000000,0.000000>,\n'
+            '<-0.240000,0.930000,0.000000>\n}\n', scene
+            )
+        self.assertIn(
+            '#declare ccpoviz_atom_species = array[3] {\n0,\n1,\n1\n}\n',
+            scene
+            )
+        self.assertIn('#declare ccpoviz_bond_begins = array[2] {\n', scene)
+        self.assertIn('#declare ccpoviz_bond_ends = array[2] {\n', scene)
+        self.assertIn('#for (ccpoviz_i, 0, 2)\n', scene)
+        self.assertIn('#for (ccpoviz_i, 0, 1)\n', scene)
+        self.assertNotIn('#fopen', scene)
+
+    def test_data_file_encoding(self):
+
+        """Tests the side data files of the atoms and bonds"""
+
+        ops_dict = self.ops_dict.derive({'scene-encoding': 'data-file'})
+        prefix = os.path.join(self.work_dir, 'data')
+        with self.assertRaises(ValueError):
+            self._write('data.pov', write_scene, ops_dict)
+        scene = self._write(
+            'data.pov', write_scene, ops_dict, data_prefix=prefix
+            )
+
+        atoms_file, bonds_file = [prefix + i for i in DATA_FILE_SUFFIXES]
+        self.assertIn(
+            '#fopen ccpoviz_atom_file "%s" read\n' % atoms_file, scene
+            )
+        self.assertIn(
+            '#fopen ccpoviz_bond_file "%s" read\n' % bonds_file, scene
+            )
+        self.assertNotIn('ccpoviz_atom_centres', scene)
+
+        with open(atoms_file, 'r') as data:
+            self.assertEqual(data.read().splitlines(), [
+                '<0.000000,0.000000,0.000000>,0,',
+                '<0.960000,0.000000,0.000000>,1,',
+                '<-0.240000,0.930000,0.000000>,1,',
+                ])
+        with open(bonds_file, 'r') as data:
+            lines = data.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('<0.000000,0.000000,0.000000>,<'))
+
+    def test_data_file_removal(self):
+
+        """Tests the removal of the side data files after rendering"""
+
+        input_file = write_input(self.work_dir)
+        options = write_options(self.work_dir, 0.0, options={
+            'scene-encoding': 'data-file', 'compute-bonds': True
+            })
+
+        for keep in [True, False]:
+            output_file = os.path.join(self.work_dir, 'water%d.png' % keep)
+            base_name = output_file[0:-len('.png')]
+            render_driver(input_file, 'gjf', None, options, output_file, keep)
+
+            self.assertTrue(os.path.exists(output_file))
+            for suffix in ['.pov'] + DATA_FILE_SUFFIXES:
+                self.assertEqual(os.path.exists(base_name + suffix), keep)
+
+    def test_template_encodings(self):
+
+        """Tests the refusal of the compact encodings by the template"""
+
+        output_file = os.path.join(self.work_dir, 'water.png')
+        for encoding in ['array', 'data-file']:
+            with self.assertRaises(ProgramTermination):
+                render_pov(
+                    self.structure, output_file, self.ops_dict.derive({
+                        'pov-writer': 'template', 'scene-encoding': encoding
+                        })
+                    )
+        self.assertFalse(
+            os.path.exists(os.path.join(self.work_dir, 'water.pov'))
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for the structure classes
+===============================
+
+The array-backed structure is tested against the plain structure class, which
+it should be able to be used interchangeably with.
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ccpoviz import structure as st
+
+
+class ArrayStructureTest(unittest.TestCase):
+
+    """Tests the array-backed structure on a toy water molecule"""
+
+    def setUp(self):
+
+        """Sets up a plain water molecule structure"""
+
+        self.plain = st.Structure(['water'])
+        self.plain.extend_atms([
+            st.Atm(symb='O', coord=np.array([0.0, 0.0, 0.0])),
+            st.Atm(symb='H', coord=np.array([0.96, 0.0, 0.0])),
+            st.Atm(symb='H', coord=np.array([-0.24, 0.93, 0.0])),
+            ])
+        self.plain.extend_bonds([(0, 1, 1.0), (0, 2, 1.0)])
+
+    def test_conversion(self):
+
+        """Tests the conversion from the plain structure"""
+
+        arr = st.as_array_structure(self.plain)
+
+        self.assertEqual(arr.coords.shape, (3, 3))
+        self.assertEqual(arr.symbs, ['O', 'H'])
+        self.assertEqual(list(arr.species), [0, 1, 1])
+        self.assertEqual(list(arr.atm_symbs), ['O', 'H', 'H'])
+        self.assertEqual(arr.bonds, self.plain.bonds)
+        self.assertEqual(arr.bonds_arr['j'].tolist(), [1, 2])
+        self.assertIs(st.as_array_structure(arr), arr)
+
+    def test_atms_view(self):
+
+        """Tests the compatibility view of the atoms"""
+
+        arr = st.as_array_structure(self.plain)
+
+        self.assertEqual(len(arr.atms), 3)
+        for plain_atm, arr_atm in zip(self.plain.atms, arr.atms):
+            self.assertEqual(plain_atm.symb, arr_atm.symb)
+            self.assertTrue(np.allclose(plain_atm.coord, arr_atm.coord))
+        self.assertEqual(arr.atms[-1].symb, 'H')
+        self.assertEqual([i.symb for i in arr.atms[1:]], ['H', 'H'])
+
+    def test_extend(self):
+
+        """Tests extending the array-backed structure by the reader API"""
+
+        arr = st.ArrayStructure(['water'])
+        arr.extend_atms(self.plain.atms)
+        arr.extend_atms([st.Atm(symb='C', coord=np.zeros(3))])
+        arr.extend_bonds(self.plain.bonds)
+
+        self.assertEqual(arr.symbs, ['O', 'H', 'C'])
+        self.assertEqual(list(arr.species), [0, 1, 1, 2])
+        self.assertEqual(len(arr.bonds_arr), 2)
+        self.assertTrue(np.allclose(
+            st.get_coords(arr)[:3], st.get_coords(self.plain)
+            ))
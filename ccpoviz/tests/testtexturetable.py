@@ -0,0 +1,97 @@
+"""
+Tests for the table of the textures
+===================================
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ccpoviz.chainoptions import freeze
+from ccpoviz.drawatms import form_colour_dict
+from ccpoviz.getoptions import get_options
+from ccpoviz.renderpov import gen_render_dict
+from ccpoviz.structure import Structure, Atm
+from ccpoviz.texturetable import TextureTable
+
+
+def _texture(pigment, finish=()):
+
+    """Forms a texture dictionary with the given pigment and finish"""
+
+    return {
+        'texture': [], 'pigment': list(pigment), 'normal': [],
+        'finish': list(finish)
+        }
+
+
+class TextureTableTest(unittest.TestCase):
+
+    """Tests the naming and the deduplication of the textures"""
+
+    def test_names(self):
+
+        """Tests the deduplication by the content and the naming order"""
+
+        table = TextureTable()
+        red = _texture(['colour Red'])
+        names = [
+            table.get_name(i) for i in [
+                red, _texture(['colour Red'], ['metallic']),
+                dict(_texture(['colour Red']), **{'has-pigment': True}),
+                _texture([], ['colour Red']), red
+                ]
+            ]
+        self.assertEqual(names, [
+            'ccpoviz_texture_0', 'ccpoviz_texture_1', 'ccpoviz_texture_0',
+            'ccpoviz_texture_2', 'ccpoviz_texture_0'
+            ])
+
+        textures = table.to_render_list()
+        self.assertEqual([i['name'] for i in textures], [
+            'ccpoviz_texture_0', 'ccpoviz_texture_1', 'ccpoviz_texture_2'
+            ])
+        self.assertEqual(textures[1]['finish'], ['metallic'])
+        self.assertNotIn('name', red)
+
+        table = TextureTable('bond_')
+        self.assertEqual(table.get_name(red), 'bond_0')
+
+    def test_shared_declaration(self):
+
+        """Tests the sharing of the declarations by the atoms and bonds"""
+
+        structure = Structure(['water'])
+        structure.extend_atms([
+            Atm(symb='O', coord=np.array([0.0, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([0.96, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([-0.24, 0.93, 0.0])),
+            ])
+        ops_dict = get_options(None, structure, None).derive({
+            'compute-bonds': True
+            })
+
+        render_dict = gen_render_dict(structure, ops_dict)
+        self.assertEqual(len(render_dict['textures']), 3)
+
+        # The bonds with the same texture as the hydrogen atoms
+        hydrogen = 'colour %s' % form_colour_dict(ops_dict)['H']
+        ops_dict = ops_dict.derive({
+            'bond-pigment': freeze([hydrogen]),
+            'bond-finish': freeze(['specular 0.5', 'metallic'])
+            })
+
+        render_dict = gen_render_dict(structure, ops_dict)
+        self.assertEqual(len(render_dict['textures']), 2)
+        atm_names = [i['texture-name'] for i in render_dict['atoms']]
+        self.assertEqual(atm_names[1], atm_names[2])
+        self.assertNotEqual(atm_names[0], atm_names[1])
+        self.assertEqual(
+            set(i['texture-name'] for i in render_dict['bonds']),
+            set([atm_names[1]])
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Tests for the tile-split rendering
+==================================
+
+The splitting of the image into regions and the stitching of the partial
+outputs are tested on synthetic images.
+
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+
+from ccpoviz import tilerender
+
+
+def write_tga(file_name, pixels, full_size=None, origin=None):
+
+    """Writes RGB(A) pixels into an uncompressed TGA file with bottom origin
+
+    When the full size is given, the pixels are placed into a blank image of
+    the full size at the given origin, like a pov-ray partial output.
+
+    """
+
+    if full_size is not None:
+        full = np.zeros(full_size + (pixels.shape[2], ), dtype=np.uint8)
+        full[
+            origin[0]:origin[0] + pixels.shape[0],
+            origin[1]:origin[1] + pixels.shape[1]
+            ] = pixels
+        pixels = full
+
+    height, width, n_chans = pixels.shape
+    data = pixels[::-1][:, :, [2, 1, 0, 3][0:n_chans]]
+    with open(file_name, 'wb') as tga_file:
+        tga_file.write(struct.pack(
+            '<BBBHHBHHHHBB', 0, 0, 2, 0, 0, 0, 0, 0, width, height,
+            8 * n_chans, 0
+            ))
+        tga_file.write(data.tobytes())
+
+
+def read_png(file_name):
+
+    """Reads the PNG files written by the encoder in the module"""
+
+    with open(file_name, 'rb') as png_file:
+        data = png_file.read()
+
+    pos = 8
+    chunks = {}
+    while pos < len(data):
+        length, = struct.unpack('>I', data[pos:pos + 4])
+        tag = data[pos + 4:pos + 8]
+        chunks[tag] = data[pos + 8:pos + 8 + length]
+        pos += length + 12
+
+    width, height, _, colour_type = struct.unpack(
+        '>IIBB', chunks[b'IHDR'][0:10]
+        )
+    n_chans = 4 if colour_type == 6 else 3
+    filtered = np.frombuffer(
+        zlib.decompress(chunks[b'IDAT']), dtype=np.uint8
+        ).reshape((height, width * n_chans + 1))
+    rows = np.cumsum(filtered[:, 1:], axis=0, dtype=np.uint8)
+
+    return rows.reshape((height, width, n_chans))
+
+
+class TileRenderTest(unittest.TestCase):
+
+    """Tests the splitting and the stitching of the tiles"""
+
+    def setUp(self):
+
+        """Sets up a temporary directory"""
+
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        """Removes the temporary directory"""
+
+        shutil.rmtree(self.work_dir)
+
+    def test_split_regions(self):
+
+        """Tests the splitting of the images into regions"""
+
+        for shape, n_tiles in [('rows', 5), ('blocks', 6), ('blocks', 7)]:
+            regions = tilerender.split_regions(53, 37, n_tiles, shape)
+            self.assertEqual(len(regions), n_tiles)
+            covered = np.zeros((37, 53), dtype=np.int64)
+            for row_beg, row_end, col_beg, col_end in regions:
+                covered[row_beg:row_end, col_beg:col_end] += 1
+            self.assertTrue((covered == 1).all())
+
+        self.assertEqual(tilerender.decide_grid(6), (2, 3))
+        self.assertRaises(
+            ValueError, tilerender.split_regions, 10, 10, 4, 'stripes'
+            )
+        self.assertEqual(
+            tilerender.gen_region_args((0, 10, 5, 20)),
+            ['+SR1', '+ER10', '+SC6', '+EC20']
+            )
+
+    def test_stitch(self):
+
+        """Tests the stitching of cropped and full-size partial outputs"""
+
+        width, height = 45, 31
+        rand = np.random.RandomState(2)
+
+        for n_chans in [3, 4]:
+            image = rand.randint(0, 256, size=(height, width, n_chans)).astype(
+                np.uint8
+                )
+            regions = tilerender.split_regions(width, height, 4, 'blocks')
+
+            tile_files = []
+            for idx, region in enumerate(regions):
+                row_beg, row_end, col_beg, col_end = region
+                tile_file = os.path.join(self.work_dir, 'tile%d.tga' % idx)
+                if idx % 2 == 0:
+                    write_tga(
+                        tile_file, image[row_beg:row_end, col_beg:col_end]
+                        )
+                else:
+                    write_tga(
+                        tile_file, image[row_beg:row_end, col_beg:col_end],
+                        (height, width), (row_beg, col_beg)
+                        )
+                tile_files.append(tile_file)
+
+            stitched = tilerender.stitch_tiles(
+                tile_files, regions, width, height
+                )
+            self.assertTrue((stitched == image).all())
+
+            png_file = os.path.join(self.work_dir, 'out.png')
+            tilerender.write_png(png_file, stitched)
+            self.assertTrue((read_png(png_file) == image).all())
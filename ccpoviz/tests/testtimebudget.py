@@ -0,0 +1,71 @@
+"""
+Tests for the tuning of the quality for a time budget
+=====================================================
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ccpoviz.getoptions import get_options
+from ccpoviz.structure import Structure, Atm
+from ccpoviz.timebudget import (
+    TUNED_OPTIONS, gen_candidates, estimate_time, tune_options
+    )
+
+
+class TimeBudgetTest(unittest.TestCase):
+
+    """Tests the candidate settings and the tuning"""
+
+    def setUp(self):
+
+        """Sets up the default options for a water molecule"""
+
+        self.structure = Structure(['water'])
+        self.structure.extend_atms([
+            Atm(symb='O', coord=np.array([0.0, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([0.96, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([-0.24, 0.93, 0.0])),
+            ])
+        self.structure.extend_bonds([(0, 1, 1.0), (0, 2, 1.0)])
+        self.ops_dict = get_options(None, self.structure, None)
+
+    def test_candidates(self):
+
+        """Tests that the candidates are increasingly cheaper"""
+
+        candidates = gen_candidates(self.ops_dict)
+        self.assertEqual(
+            candidates[0],
+            dict((i, self.ops_dict[i]) for i in TUNED_OPTIONS)
+            )
+        self.assertEqual(candidates[-1]['quality'], 3)
+        self.assertFalse(candidates[-1]['antialias'])
+
+        times = [estimate_time(5, 10000, i, 1, 1.0E6) for i in candidates]
+        for prev, curr in zip(times[:-1], times[1:]):
+            self.assertLess(curr, prev)
+
+    def test_tuning(self):
+
+        """Tests the settings chosen for different budgets"""
+
+        self.assertIsNone(tune_options(dict(self.ops_dict), self.structure))
+
+        ops_dict = dict(self.ops_dict, **{'render-time-budget': 1.0E6})
+        choice = tune_options(ops_dict, self.structure)
+        self.assertTrue(choice.met)
+        self.assertEqual(choice.settings, gen_candidates(self.ops_dict)[0])
+
+        ops_dict = dict(self.ops_dict, **{'render-time-budget': 1.0E-9})
+        choice = tune_options(ops_dict, self.structure)
+        self.assertFalse(choice.met)
+        self.assertEqual(choice.settings['quality'], 3)
+        self.assertFalse(choice.settings['antialias'])
+        self.assertEqual(ops_dict['quality'], self.ops_dict['quality'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests for the turntable animations
+==================================
+
+"""
+
+import unittest
+
+import numpy as np
+
+from ccpoviz.defcamera import gen_camera_ops
+from ccpoviz.structure import Structure, Atm
+from ccpoviz.turntable import (
+    FRAME_VAR, gen_turntable_ops, get_frame_files, get_frame_phis,
+    split_frames
+    )
+from ccpoviz.getoptions import get_options
+
+
+class TurntableTest(unittest.TestCase):
+
+    """Tests the frames and the camera of the turntable animations"""
+
+    def test_frames(self):
+
+        """Tests the splitting and the naming of the frames"""
+
+        self.assertEqual(split_frames(10, 3), [(1, 3), (4, 6), (7, 10)])
+        self.assertEqual(split_frames(2, 8), [(1, 1), (2, 2)])
+        self.assertEqual(
+            get_frame_files('/tmp/mol.png', 12)[0:2],
+            ['/tmp/mol01.png', '/tmp/mol02.png']
+            )
+        self.assertEqual(len(get_frame_files('mol.png', 9)[-1]), 8)
+
+    def test_camera(self):
+
+        """Tests the camera of the frames against the single pictures"""
+
+        structure = Structure(['water'])
+        structure.extend_atms([
+            Atm(symb='O', coord=np.array([0.0, 0.0, 0.0])),
+            Atm(symb='H', coord=np.array([0.96, 0.0, 0.0])),
+            ])
+        ops_dict = dict(get_options(None, structure, None))
+        ops_dict.update({
+            'turntable-frames': 4, 'camera-theta': 90.0, 'camera-phi': 30.0
+            })
+
+        phis = get_frame_phis(ops_dict)
+        self.assertEqual(phis, [30.0, 120.0, 210.0, 300.0])
+
+        # Integer sweeps given by the users
+        int_phis = get_frame_phis(dict(ops_dict, **{
+            'turntable-frames': 100, 'turntable-sweep': 360
+            }))
+        self.assertAlmostEqual(int_phis[1] - int_phis[0], 3.6)
+        self.assertAlmostEqual(int_phis[-1], 386.4)
+
+        cam_dict, light_dict, declarations, _, _ = gen_turntable_ops(
+            ops_dict, structure
+            )
+        ops = dict((i['op-name'], i['op-value']) for i in cam_dict)
+        self.assertEqual(
+            ops['location'], 'CCPOVIZ_Camera_Location[%s]' % FRAME_VAR
+            )
+        self.assertIn(FRAME_VAR, light_dict['light-location'])
+
+        for phi in phis:
+            ops_dict['camera-phi'] = phi
+            single, _, _ = gen_camera_ops(ops_dict, structure)
+            single_ops = dict((i['op-name'], i['op-value']) for i in single)
+            self.assertIn(single_ops['location'], declarations)
+            self.assertEqual(single_ops['look_at'], ops['look_at'])
+
+
+if __name__ == '__main__':
+    unittest.main()
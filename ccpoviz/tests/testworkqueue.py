@@ -0,0 +1,109 @@
+"""
+Tests for the work queue in a directory
+=======================================
+
+The claiming, leases, and results of the jobs are tested without rendering.
+
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from ccpoviz.workqueue import WorkQueue
+
+
+class WorkQueueTest(unittest.TestCase):
+
+    """Tests the work queue in a temporary directory"""
+
+    def setUp(self):
+
+        """Creates a queue with two jobs"""
+
+        self.queue_dir = tempfile.mkdtemp()
+        self.queue = WorkQueue(self.queue_dir, lease=60.0)
+        self.names = self.queue.submit([
+            {'input': '/tmp/a.gjf'}, {'input': '/tmp/b.gjf'}
+            ])
+
+    def tearDown(self):
+
+        """Removes the queue directory"""
+
+        shutil.rmtree(self.queue_dir)
+
+    def test_claim_finish(self):
+
+        """Tests the claiming of the jobs in order and their results"""
+
+        claim_a, job_a = self.queue.claim('w1')
+        claim_b, job_b = self.queue.claim('w2')
+        self.assertEqual(job_a['input'], '/tmp/a.gjf')
+        self.assertEqual(job_b['input'], '/tmp/b.gjf')
+        self.assertIsNone(self.queue.claim('w3'))
+
+        self.assertTrue(self.queue.finish(claim_a, 'done', {'message': ''}))
+        self.assertFalse(self.queue.finish(claim_a, 'done', {'message': ''}))
+        self.assertTrue(self.queue.release(claim_b))
+        self.assertEqual(self.queue.claim('w3')[1], job_b)
+
+        status = self.queue.get_status()
+        self.assertEqual(status['done'], 1)
+        self.assertEqual(status['pending'], 0)
+        self.assertEqual(status['claimed'], 1)
+
+        result_file = os.path.join(
+            self.queue_dir, 'done', self.names[0] + '.json'
+            )
+        with open(result_file, 'r') as result:
+            self.assertEqual(json.load(result)['worker'], 'w1')
+
+    def test_separator_in_name(self):
+
+        """Tests the jobs with the claim separator in their input names"""
+
+        queue_dir = os.path.join(self.queue_dir, 'separator')
+        queue = WorkQueue(queue_dir)
+        name = queue.submit([{'input': '/data/mol@2.gjf'}])[0]
+        claim_name, job = queue.claim('host-1')
+        self.assertEqual(job['input'], '/data/mol@2.gjf')
+
+        self.assertTrue(queue.release(claim_name))
+        self.assertEqual(os.listdir(os.path.join(queue_dir, 'pending')), [
+            name + '.json'
+            ])
+
+        claim_name, _ = queue.claim('host-1')
+        self.assertTrue(queue.finish(claim_name, 'done', {}))
+        result_file = os.path.join(queue_dir, 'done', name + '.json')
+        with open(result_file, 'r') as result:
+            self.assertEqual(json.load(result)['worker'], 'host-1')
+
+    def test_reclaim(self):
+
+        """Tests the reclaiming of the jobs with expired leases"""
+
+        claim_a, _ = self.queue.claim('w1')
+        claim_b, _ = self.queue.claim('w2')
+        stale = time.time() - 3600.0
+        os.utime(
+            os.path.join(self.queue_dir, 'claimed', claim_a), (stale, stale)
+            )
+
+        self.assertEqual(self.queue.reclaim_stale(), [claim_a])
+        self.assertFalse(self.queue.renew(claim_a))
+        self.assertTrue(self.queue.renew(claim_b))
+        self.assertFalse(self.queue.finish(claim_a, 'done', {}))
+
+        claim_c, job = self.queue.claim('w3')
+        self.assertEqual(job['input'], '/tmp/a.gjf')
+        self.assertEqual(self.queue.reclaim_stale(), [])
+        self.assertTrue(self.queue.finish(claim_c, 'failed', {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
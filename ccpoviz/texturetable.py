@@ -0,0 +1,86 @@
+"""
+Table of the textures in a scene
+================================
+
+Rather than giving the full texture inline for every sphere and cylinder, the
+distinct textures in a scene are declared once as POV-Ray identifiers by
+``#declare``, and the primitives just refer to them by name. This module
+contains the table for collecting the distinct textures and assigning names to
+them.
+
+The textures are given as dictionaries of the format documented in the
+:py:mod:`drawatms` module, with the fields ``texture``, ``pigment``,
+``normal``, and ``finish`` being lists of strings. Textures with the same
+content share the same name.
+
+"""
+
+
+class TextureTable(object):
+
+    """The table of the distinct textures in a scene
+
+    .. py:attribute:: prefix
+
+      The prefix for the names of the declared textures, which is followed by
+      the serial number of the texture.
+
+    .. py:attribute:: names
+
+      The dictionary from the content of the texture to its name.
+
+    .. py:attribute:: textures
+
+      The list of the texture dictionaries in the order of their addition,
+      with the name of each texture added under the key ``name``.
+
+    """
+
+    __slots__ = [
+        'prefix',
+        'names',
+        'textures',
+        ]
+
+    def __init__(self, prefix='ccpoviz_texture_'):
+
+        """Initializes an empty texture table"""
+
+        self.prefix = prefix
+        self.names = {}
+        self.textures = []
+
+    def get_name(self, texture_dict):
+
+        """Gets the name of a texture, adding it when it is new
+
+        :param texture_dict: The dictionary for the texture
+        :returns: The string for the name of the texture
+
+        """
+
+        key = tuple(
+            tuple(texture_dict[i])
+            for i in ['texture', 'pigment', 'normal', 'finish']
+            )
+
+        try:
+            return self.names[key]
+        except KeyError:
+            name = '%s%d' % (self.prefix, len(self.textures))
+            self.names[key] = name
+            entry = dict(texture_dict)
+            entry['name'] = name
+            self.textures.append(entry)
+            return name
+
+    def to_render_list(self):
+
+        """Forms the list for rendering the texture declarations
+
+        The entries of the returned list are the texture dictionaries with the
+        names added, in the order of the addition of the textures.
+
+        """
+
+        return list(self.textures)
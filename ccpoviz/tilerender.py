@@ -0,0 +1,347 @@
+"""
+Tile-split rendering of a single image
+======================================
+
+For very large images, a single pov-ray process can be the bottleneck of the
+rendering. In the tiled mode, the image is split into regions, which are
+rendered by separate pov-ray processes in parallel by using the partial render
+options ``+SR``, ``+ER``, ``+SC``, and ``+EC``, and the partial outputs are
+stitched into the final PNG image.
+
+The regions can be either bands of rows or blocks on a grid, as set by the
+``tile-shape`` option, and their number is set by the ``tile-count`` option.
+The regions are rendered into uncompressed TGA files, which are trivial to
+read, and the stitched image is written as PNG by the simple encoder in this
+module. When the background is transparent, the alpha channel from pov-ray is
+kept in the final image. Both the pov-ray versions writing only the rendered
+region and those writing the full image with the region filled are supported.
+
+The outputs of the tiles are captured in log files for their statistics, and
+they are printed after the tiles are finished unless the output of pov-ray is
+suppressed.
+
+"""
+
+import os
+import struct
+import subprocess
+import time
+import zlib
+
+import numpy as np
+
+from .cpubudget import get_available_cpus, count_blocks, decide_threads
+
+
+#
+# Splitting into regions
+# ----------------------
+#
+
+
+def split_range(size, n_parts):
+
+    """Splits a range of pixels into nearly equal parts
+
+    :returns: The list of pairs of the beginning and end of the parts
+
+    """
+
+    bounds = [(size * i) // n_parts for i in xrange(0, n_parts + 1)]
+    return zip(bounds[:-1], bounds[1:])
+
+
+def decide_grid(n_tiles):
+
+    """Decides the grid of blocks for the given number of tiles
+
+    The grid is chosen to be as close to square as possible.
+
+    :returns: The pair of the numbers of rows and columns of blocks
+
+    """
+
+    n_rows = int(n_tiles ** 0.5)
+    while n_tiles % n_rows != 0:
+        n_rows -= 1
+
+    return n_rows, n_tiles // n_rows
+
+
+def split_regions(width, height, n_tiles, shape):
+
+    """Splits an image into regions
+
+    :param width: The width of the image in pixels
+    :param height: The height of the image in pixels
+    :param n_tiles: The number of regions
+    :param shape: The shape of the regions, ``rows`` or ``blocks``
+    :returns: The list of quadruples of the beginning and end rows and the
+        beginning and end columns of the regions, counted from zero and with
+        the end excluded
+    :raises ValueError: if the shape is invalid or the tiles are too many
+
+    """
+
+    if shape == 'rows':
+        n_rows, n_cols = n_tiles, 1
+    elif shape == 'blocks':
+        n_rows, n_cols = decide_grid(n_tiles)
+    else:
+        raise ValueError('Invalid tile shape %s' % shape)
+
+    if n_rows > height or n_cols > width:
+        raise ValueError('Too many tiles for the image size')
+
+    return [
+        (row_beg, row_end, col_beg, col_end)
+        for row_beg, row_end in split_range(height, n_rows)
+        for col_beg, col_end in split_range(width, n_cols)
+        ]
+
+
+def gen_region_args(region):
+
+    """Generates the pov-ray partial render arguments for a region
+
+    The pixels in the arguments are counted from one and inclusive.
+
+    """
+
+    row_beg, row_end, col_beg, col_end = region
+    return [
+        '+SR%d' % (row_beg + 1), '+ER%d' % row_end,
+        '+SC%d' % (col_beg + 1), '+EC%d' % col_end,
+        ]
+
+
+#
+# Image files
+# -----------
+#
+
+
+def read_tga(file_name):
+
+    """Reads an uncompressed true-colour TGA file
+
+    :returns: The array of the pixels, with shape height, width, and channels,
+        with the channels in RGB or RGBA order, and the rows from top to
+        bottom
+    :raises ValueError: if the file is not of the supported format
+
+    """
+
+    with open(file_name, 'rb') as tga_file:
+        data = tga_file.read()
+
+    if len(data) < 18:
+        raise ValueError('Corrupt TGA file %s' % file_name)
+    id_len, cmap_type, img_type = struct.unpack('<BBB', data[0:3])
+    width, height, depth, desc = struct.unpack('<HHBB', data[12:18])
+    if cmap_type != 0 or img_type != 2 or depth not in [24, 32]:
+        raise ValueError('Unsupported TGA file %s' % file_name)
+
+    n_chans = depth // 8
+    n_bytes = width * height * n_chans
+    if len(data) < 18 + id_len + n_bytes:
+        raise ValueError('Corrupt TGA file %s' % file_name)
+    pixels = np.frombuffer(
+        data, dtype=np.uint8, count=n_bytes, offset=18 + id_len
+        ).reshape((height, width, n_chans))
+
+    # The origin is at the lower left by default
+    if not desc & 0x20:
+        pixels = pixels[::-1]
+    if desc & 0x10:
+        pixels = pixels[:, ::-1]
+
+    # The channels are stored in BGR(A) order
+    return pixels[:, :, [2, 1, 0, 3][0:n_chans]]
+
+
+def _png_chunk(tag, content):
+
+    """Forms a PNG chunk with the given tag and content"""
+
+    return (
+        struct.pack('>I', len(content)) + tag + content +
+        struct.pack('>I', zlib.crc32(tag + content) & 0xffffffff)
+        )
+
+
+def write_png(file_name, pixels):
+
+    """Writes the pixels into a PNG file
+
+    The rows are filtered by the Up filter of PNG, which is trivially
+    vectorized.
+
+    :param file_name: The name of the PNG file
+    :param pixels: The array of 8-bit pixels, with shape height, width, and
+        channels, with three channels for RGB and four channels for RGBA
+
+    """
+
+    height, width, n_chans = pixels.shape
+    rows = pixels.reshape((height, width * n_chans))
+
+    filtered = np.empty((height, width * n_chans + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 1:] = rows[0]
+    filtered[1:, 1:] = rows[1:] - rows[:-1]
+
+    header = struct.pack(
+        '>IIBBBBB', width, height, 8, 6 if n_chans == 4 else 2, 0, 0, 0
+        )
+
+    with open(file_name, 'wb') as png_file:
+        png_file.write(b'\x89PNG\r\n\x1a\n')
+        png_file.write(_png_chunk(b'IHDR', header))
+        png_file.write(_png_chunk(
+            b'IDAT', zlib.compress(filtered.tobytes(), 6)
+            ))
+        png_file.write(_png_chunk(b'IEND', b''))
+
+    return None
+
+
+def stitch_tiles(tile_files, regions, width, height):
+
+    """Stitches the partial outputs of the regions into a full image
+
+    :param tile_files: The names of the TGA files of the regions
+    :param regions: The regions, as returned by :py:func:`split_regions`
+    :param width: The width of the full image
+    :param height: The height of the full image
+    :returns: The array of the pixels of the full image
+    :raises ValueError: if the partial outputs are not consistent
+
+    """
+
+    image = None
+
+    for tile_file, region in zip(tile_files, regions):
+        row_beg, row_end, col_beg, col_end = region
+        tile = read_tga(tile_file)
+
+        if tile.shape[0:2] == (height, width):
+            tile = tile[row_beg:row_end, col_beg:col_end]
+        elif tile.shape[0:2] != (row_end - row_beg, col_end - col_beg):
+            raise ValueError('Unexpected size of tile %s' % tile_file)
+
+        if image is None:
+            image = np.zeros((height, width, tile.shape[2]), dtype=np.uint8)
+        elif tile.shape[2] != image.shape[2]:
+            raise ValueError('Inconsistent channels of tile %s' % tile_file)
+
+        image[row_beg:row_end, col_beg:col_end] = tile
+
+    return image
+
+
+#
+# Running the tiles
+# -----------------
+#
+
+
+# The interval in seconds for polling the pov-ray processes
+POLL_INTERVAL = 0.05
+
+
+def run_tiles(base_args, output_file, width, height, n_tiles, shape,
+              suppress_out=True, max_threads=0):
+
+    """Renders an image by tiles in parallel and stitches them
+
+    The tiles are rendered at most as many at a time as the available
+    processors, which are shared evenly among the concurrent tiles.
+
+    :param base_args: The pov-ray command line for the full image, without
+        the output file and work thread settings
+    :param output_file: The name of the final PNG file
+    :param width: The width of the image in pixels
+    :param height: The height of the image in pixels
+    :param n_tiles: The number of tiles
+    :param shape: The shape of the tiles, ``rows`` or ``blocks``
+    :param suppress_out: If the output of pov-ray is suppressed
+    :param max_threads: The maximum number of threads for each tile, zero for
+        no limit
+    :returns: The pair of the return code of the first failed pov-ray
+        process, zero on success, and the list of the outputs of the tiles
+    :raises ValueError: if the tiles cannot be formed or stitched
+    :raises OSError: if pov-ray cannot be invoked
+
+    """
+
+    # pylint: disable=too-many-arguments, too-many-locals
+
+    regions = split_regions(width, height, n_tiles, shape)
+    base_name = output_file.split('.')[0]
+    tile_files = [
+        '%s.tile%d.tga' % (base_name, i) for i in xrange(0, len(regions))
+        ]
+    log_files = [
+        '%s.tile%d.log' % (base_name, i) for i in xrange(0, len(regions))
+        ]
+
+    n_cpus = len(get_available_cpus())
+    max_procs = min(len(regions), n_cpus)
+
+    pending = zip(tile_files, log_files, regions)
+    running = []
+    outputs = []
+    ret_code = 0
+
+    try:
+        while ret_code == 0 and (len(pending) > 0 or len(running) > 0):
+
+            while len(pending) > 0 and len(running) < max_procs:
+                tile_file, log_file, region = pending.pop(0)
+                n_threads = decide_threads(
+                    n_cpus, max_procs,
+                    count_blocks(region[3] - region[2], region[1] - region[0]),
+                    max_threads
+                    )
+                with open(log_file, 'wb') as log_out:
+                    running.append(subprocess.Popen(
+                        base_args + gen_region_args(region) + [
+                            '+FT', '+O%s' % tile_file, '+WT%d' % n_threads
+                            ],
+                        stdout=log_out, stderr=subprocess.STDOUT
+                        ))
+
+            time.sleep(POLL_INTERVAL)
+            still_running = []
+            for proc in running:
+                code = proc.poll()
+                if code is None:
+                    still_running.append(proc)
+                elif code != 0:
+                    ret_code = code
+            running = still_running
+
+        if ret_code == 0:
+            write_png(
+                output_file, stitch_tiles(tile_files, regions, width, height)
+                )
+
+        for log_file in log_files:
+            if not os.path.exists(log_file):
+                continue
+            with open(log_file, 'rb') as log_in:
+                outputs.append(log_in.read().decode('utf-8', 'replace'))
+            if not suppress_out:
+                print(outputs[-1])
+
+    finally:
+        for proc in running:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+        for tile_file in tile_files + log_files:
+            if os.path.exists(tile_file):
+                os.remove(tile_file)
+
+    return ret_code, outputs
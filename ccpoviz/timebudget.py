@@ -0,0 +1,294 @@
+"""
+Tuning of the quality for a budget of render time
+=================================================
+
+For thumbnails and previews, it is often more important for the image to be
+ready in time than to have the best quality. When the ``render-time-budget``
+option is set to a positive number of seconds, the quality settings of the
+render are tuned before the scene is written, so that the estimated time of
+the render fits in the budget. The settings tuned are
+
+quality
+    The ``quality`` option for pov-ray, which is lowered to 4 to use point
+    lights rather than area lights, and to 3 to skip the shadows.
+
+anti-aliasing
+    The ``antialias`` switch and the ``antialias-threshold`` for pov-ray.
+
+area light
+    The ``light-number`` for the grid of the area light and its
+    ``light-adaptive`` level, see :py:mod:`deflightsource`.
+
+Starting from the settings given in the options, the settings are degraded
+step by step in the order of the loss of the visual quality, and the first
+one estimated to fit in the budget is used. When none of them fits, the
+cheapest one is used and the budget is reported to be not met.
+
+The time is estimated by a simple model from the numbers of the primitives,
+the resolution of the image, and the number of rays per pixel according to
+the settings. The number of rays traced per second by each thread is set by
+the ``render-time-rate`` option, or a built-in value when it is zero. It can
+be calibrated for a machine by the ``rays`` and ``trace_cpu_time`` in the
+render statistics, see :py:mod:`povstats`, and the ratio of the estimated and
+the actual time.
+
+"""
+
+import collections
+import math
+
+from .cpubudget import get_available_cpus, count_blocks, decide_threads
+from .structure import ArrayStructure, get_coords
+from .util import terminate_program
+
+
+#
+# The cost model
+# --------------
+#
+
+
+# The options that are tuned
+TUNED_OPTIONS = [
+    'quality', 'antialias', 'antialias-threshold', 'light-number',
+    'light-adaptive'
+    ]
+
+# The default number of rays traced per second by a thread, each ray weighted
+# by the logarithm of the number of primitives for the bounding hierarchy
+DEFAULT_RATE = 2.0E7
+
+# The time for parsing a primitive in seconds
+PARSE_TIME = 2.0E-5
+
+# The estimated number of bonds per atom when the bonds are computed
+BONDS_PER_ATOM = 1.2
+
+# The fraction of the pixels covered by the molecule, which cast shadow rays
+COVERAGE = 0.5
+
+# The number of rays for a supersampled pixel with the default depth of three
+AA_SAMPLES = 9
+
+# The fraction of the pixels supersampled at the default threshold of 0.3,
+# which is assumed to be inversely proportional to the threshold
+AA_FRACTION = 0.15
+
+# The fraction of the area light grid traced beyond the initial samples of
+# the adaptive sampling, for the shadow boundaries
+ADAPTIVE_FRACTION = 0.1
+
+# The lower bound of the grid size of the area light in the tuning
+MIN_LIGHT_NUMBER = 3
+
+# The threshold of anti-aliasing for the degraded settings
+DEGRADED_AA_THRESHOLD = 0.5
+
+
+def count_primitives(structure, ops_dict):
+
+    """Counts the spheres and the cylinders in the scene
+
+    The number of the bonds is estimated from the number of atoms when they
+    are to be computed.
+
+    :returns: The pair of the numbers of the spheres and the cylinders
+
+    """
+
+    n_atms = len(get_coords(structure))
+    if isinstance(structure, ArrayStructure):
+        n_bonds = len(structure.bonds_arr)
+    else:
+        n_bonds = len(structure.bonds)
+
+    if ops_dict['compute-bonds']:
+        n_bonds = max(n_bonds, int(n_atms * BONDS_PER_ATOM))
+
+    return n_atms, n_bonds
+
+
+def count_shadow_rays(settings):
+
+    """Counts the shadow rays for a pixel on the molecule
+
+    No shadow is traced for quality below 4, and the area light is only used
+    for quality above 4.
+
+    """
+
+    if settings['quality'] < 4:
+        return 0.0
+    elif settings['quality'] == 4:
+        return 1.0
+
+    n_grid = settings['light-number'] ** 2
+    adaptive = settings['light-adaptive']
+    if adaptive < 0:
+        return float(n_grid)
+
+    n_init = min((2 ** adaptive + 1) ** 2, n_grid)
+    return n_init + ADAPTIVE_FRACTION * (n_grid - n_init)
+
+
+def count_samples(settings):
+
+    """Counts the primary rays for a pixel"""
+
+    if not settings['antialias']:
+        return 1.0
+
+    fraction = min(AA_FRACTION * 0.3 / settings['antialias-threshold'], 1.0)
+    return 1.0 + fraction * AA_SAMPLES
+
+
+def estimate_time(n_prims, n_pixels, settings, n_threads, rate, n_frames=1):
+
+    """Estimates the wall time of a render in seconds
+
+    :param n_prims: The number of primitives in the scene
+    :param n_pixels: The number of pixels in the image
+    :param settings: The dictionary of the tuned options
+    :param n_threads: The number of work threads of pov-ray
+    :param rate: The weighted number of rays traced per second by a thread
+    :param n_frames: The number of frames, which are parsed and traced
+        separately
+
+    """
+
+    # pylint: disable=too-many-arguments
+
+    n_rays = n_pixels * count_samples(settings) * (
+        1.0 + COVERAGE * count_shadow_rays(settings)
+        )
+    trace_time = n_rays * math.log(n_prims + 2.0, 2) / (rate * n_threads)
+
+    return n_frames * (PARSE_TIME * n_prims + trace_time)
+
+
+#
+# The tuning
+# ----------
+#
+
+
+BudgetChoice = collections.namedtuple('BudgetChoice', [
+    'budget',
+    'settings',
+    'estimated_time',
+    'met',
+    ])
+
+
+def _push_candidate(candidates, option, value):
+
+    """Adds a candidate with the option changed from the last candidate"""
+
+    if candidates[-1][option] != value:
+        candidate = dict(candidates[-1])
+        candidate[option] = value
+        candidates.append(candidate)
+
+    return None
+
+
+def gen_candidates(ops_dict):
+
+    """Generates the candidate settings from the given ones downwards
+
+    :returns: The list of the dictionaries of the tuned options, starting with
+        the settings in the options, in the order of the loss of quality
+
+    """
+
+    candidates = [dict((i, ops_dict[i]) for i in TUNED_OPTIONS)]
+    given = candidates[0]
+
+    if given['light-adaptive'] < 0:
+        _push_candidate(candidates, 'light-adaptive', 1)
+    for n_grid in xrange(given['light-number'] - 1, MIN_LIGHT_NUMBER - 1, -1):
+        _push_candidate(candidates, 'light-number', n_grid)
+    if given['antialias']:
+        _push_candidate(
+            candidates, 'antialias-threshold',
+            max(given['antialias-threshold'], DEGRADED_AA_THRESHOLD)
+            )
+    _push_candidate(candidates, 'quality', min(given['quality'], 4))
+    _push_candidate(candidates, 'antialias', False)
+    _push_candidate(candidates, 'quality', min(given['quality'], 3))
+
+    return candidates
+
+
+def tune_options(ops_dict, structure):
+
+    """Tunes the quality options for the budget of render time
+
+    The options dictionary is not changed, and the chosen settings in the
+    result are to be applied to it, like by
+    :py:meth:`chainoptions.FrozenMap.derive` for the frozen options.
+
+    :param ops_dict: The options dictionary
+    :param structure: The structure to render
+    :returns: The :py:class:`BudgetChoice`, or None when there is no budget
+
+    """
+
+    budget = ops_dict['render-time-budget']
+    if budget == 0.0:
+        return None
+    if budget < 0.0:
+        terminate_program('Invalid render time budget %r' % budget)
+    rate = ops_dict['render-time-rate']
+    if rate < 0.0:
+        terminate_program('Invalid render time rate %r' % rate)
+    elif rate == 0.0:
+        rate = DEFAULT_RATE
+
+    width = ops_dict['graph-width']
+    height = round(width / ops_dict['aspect-ratio'])
+    n_threads = decide_threads(
+        len(get_available_cpus()), 1, count_blocks(width, height),
+        ops_dict['work-threads']
+        )
+    n_prims = sum(count_primitives(structure, ops_dict))
+    n_frames = max(ops_dict['turntable-frames'], 1)
+
+    for settings in gen_candidates(ops_dict):
+        estimated_time = estimate_time(
+            n_prims, width * height, settings, n_threads, rate, n_frames
+            )
+        if estimated_time <= budget:
+            met = True
+            break
+    else:
+        met = False
+
+    return BudgetChoice(
+        budget=budget, settings=settings, estimated_time=estimated_time,
+        met=met
+        )
+
+
+def format_choice(choice):
+
+    """Formats the chosen settings for the budget into a line"""
+
+    settings = choice.settings
+    if settings['antialias']:
+        antialias = 'threshold %g' % settings['antialias-threshold']
+    else:
+        antialias = 'off'
+    if settings['light-adaptive'] < 0:
+        adaptive = 'off'
+    else:
+        adaptive = '%d' % settings['light-adaptive']
+
+    return (
+        'Time budget %g s %s: estimated %.2g s with quality %d, '
+        'anti-aliasing %s, area light %dx%d, adaptive %s' % (
+            choice.budget, 'met' if choice.met else 'not met',
+            choice.estimated_time, settings['quality'], antialias,
+            settings['light-number'], settings['light-number'], adaptive
+            )
+        )
@@ -0,0 +1,296 @@
+"""
+Turntable animations
+====================
+
+For the videos of rotating molecules, the camera is turned around the focus by
+changing its azimuth angle ``phi`` through the frames. Rather than running the
+whole pipeline for each frame, the scene is generated once for all the frames
+and rendered by the built-in animation of pov-ray.
+
+The number of frames is set by the ``turntable-frames`` option, with the
+animation disabled when it is less than two, and the total change of the
+azimuth angle in degrees over the animation is set by ``turntable-sweep``. The
+animation is cyclic, so that the last frame is one step before the first one
+for a full turn. The camera and the light source for each frame are computed
+exactly as for a single picture with the azimuth angle of the frame, and they
+are declared in the scene as arrays indexed by the frame number computed from
+the pov-ray ``clock``. The multiple bonds are resolved for the camera of the
+first frame.
+
+The frames are rendered by pov-ray with the animation options ``+KFI`` and
+``+KFF``, and the frames are split into contiguous ranges rendered by parallel
+pov-ray processes by the subset options ``+SF`` and ``+EF``. The number of the
+processes is set by the ``turntable-processes`` option, default to the number
+of the available processors, which are shared by the processes as their work
+threads. Note that pov-ray still parses the scene for each frame, but the
+scene is only generated and written once. The frames are written by pov-ray
+with the frame number appended to the base name of the output file.
+
+"""
+
+import os
+import subprocess
+import time
+
+from .cpubudget import get_available_cpus, count_blocks, decide_threads
+from .defcamera import gen_camera_ops
+from .deflightsource import gen_light_ops
+
+
+#
+# The scene
+# ---------
+#
+
+
+# The name of the variable for the frame index in the scene
+FRAME_VAR = 'CCPOVIZ_Frame'
+
+# The light source options changing with the camera
+LIGHT_VARYING = [
+    ('light-location', 'CCPOVIZ_Light_Location'),
+    ('light-area-vec-1', 'CCPOVIZ_Light_Area_Vec_1'),
+    ('light-area-vec-2', 'CCPOVIZ_Light_Area_Vec_2'),
+    ]
+
+
+def is_turntable(ops_dict):
+
+    """Tests if the turntable animation is enabled by the options"""
+
+    return ops_dict['turntable-frames'] > 1
+
+
+def get_frame_phis(ops_dict):
+
+    """Gets the azimuth angles of the camera for the frames in degrees
+
+    The sweep is taken as a float, since it can be given as an integer.
+
+    """
+
+    n_frames = ops_dict['turntable-frames']
+    step = float(ops_dict['turntable-sweep']) / n_frames
+    return [
+        ops_dict['camera-phi'] + step * i for i in xrange(0, n_frames)
+        ]
+
+
+def _format_array(name, values):
+
+    """Formats the declaration of a pov-ray array of the values"""
+
+    return '#declare %s = array[%d] {\n    %s\n    }\n' % (
+        name, len(values), ',\n    '.join(values)
+        )
+
+
+def gen_turntable_ops(ops_dict, structure):
+
+    """Generates the camera and light source options for the animation
+
+    The options that are the same for all the frames are given as they are,
+    while the others refer to the arrays in the declarations.
+
+    :param ops_dict: The options dictionary
+    :param structure: The structure to plot
+    :returns: The camera options list, the light source options dictionary,
+        the string for the declarations in the scene, and the location and the
+        focus of the camera for the first frame
+
+    """
+
+    frames = []
+    for phi in get_frame_phis(ops_dict):
+        frame_ops = dict(ops_dict)
+        frame_ops['camera-phi'] = phi
+        cam_dict, cam_loc, cam_foc = gen_camera_ops(frame_ops, structure)
+        frames.append((
+            cam_dict, gen_light_ops(cam_loc, cam_foc, frame_ops),
+            cam_loc, cam_foc
+            ))
+
+    n_frames = len(frames)
+    declarations = [
+        '#declare %s = mod(int(clock * %d + 0.5), %d);\n' % (
+            FRAME_VAR, n_frames, n_frames
+            )
+        ]
+
+    cam_dict = []
+    for idx, option in enumerate(frames[0][0]):
+        values = [i[0][idx]['op-value'] for i in frames]
+        if all(i == values[0] for i in values):
+            cam_dict.append(option)
+            continue
+        name = 'CCPOVIZ_Camera_' + option['op-name'].title()
+        declarations.append(_format_array(name, values))
+        cam_dict.append({
+            'op-name': option['op-name'],
+            'op-value': '%s[%s]' % (name, FRAME_VAR)
+            })
+
+    light_dict = dict(frames[0][1])
+    for key, name in LIGHT_VARYING:
+        values = [i[1][key] for i in frames]
+        if all(i == values[0] for i in values):
+            continue
+        declarations.append(_format_array(name, values))
+        light_dict[key] = '%s[%s]' % (name, FRAME_VAR)
+
+    return (
+        cam_dict, light_dict, '\n'.join(declarations), frames[0][2],
+        frames[0][3]
+        )
+
+
+def gen_view_ops(ops_dict, structure):
+
+    """Generates the camera and light source options for the scene
+
+    This is the common entry for both the single pictures and the animations.
+
+    :returns: The same as :py:func:`gen_turntable_ops`, with the declarations
+        being None when the animation is disabled
+
+    """
+
+    if is_turntable(ops_dict):
+        return gen_turntable_ops(ops_dict, structure)
+
+    cam_dict, cam_loc, cam_foc = gen_camera_ops(ops_dict, structure)
+    light_dict = gen_light_ops(cam_loc, cam_foc, ops_dict)
+
+    return cam_dict, light_dict, None, cam_loc, cam_foc
+
+
+#
+# Rendering the frames
+# --------------------
+#
+
+
+# The interval in seconds for polling the pov-ray processes
+POLL_INTERVAL = 0.05
+
+
+def gen_animation_args(n_frames):
+
+    """Generates the pov-ray arguments for the cyclic animation of the frames
+    """
+
+    return ['+KFI1', '+KFF%d' % n_frames, '+KI0', '+KF1', '+KC']
+
+
+def split_frames(n_frames, n_procs):
+
+    """Splits the frames into nearly equal contiguous ranges
+
+    :returns: The list of pairs of the first and last frame numbers of the
+        ranges, counted from one and inclusive
+
+    """
+
+    n_procs = max(min(n_procs, n_frames), 1)
+    bounds = [(n_frames * i) // n_procs for i in xrange(0, n_procs + 1)]
+    return [
+        (bounds[i] + 1, bounds[i + 1]) for i in xrange(0, n_procs)
+        ]
+
+
+def get_frame_files(output_file, n_frames):
+
+    """Gets the names of the files of the frames written by pov-ray
+
+    Pov-ray appends the frame number to the base name, padded with zeros to
+    the number of digits of the last frame number.
+
+    """
+
+    base_name, ext = os.path.splitext(output_file)
+    n_digits = len(str(n_frames))
+    return [
+        '%s%0*d%s' % (base_name, n_digits, i, ext)
+        for i in xrange(1, n_frames + 1)
+        ]
+
+
+def run_frames(base_args, output_file, n_frames, width, height, n_procs=0,
+               suppress_out=True, max_threads=0):
+
+    """Renders the frames of an animation by parallel pov-ray processes
+
+    :param base_args: The pov-ray command line for all the frames, including
+        the output file and the animation options but not the work threads
+    :param output_file: The name of the output file
+    :param n_frames: The number of frames
+    :param width: The width of the frames in pixels
+    :param height: The height of the frames in pixels
+    :param n_procs: The number of pov-ray processes, zero for the number of
+        available processors
+    :param suppress_out: If the output of pov-ray is suppressed
+    :param max_threads: The maximum number of threads for each process, zero
+        for no limit
+    :returns: The pair of the return code of the first failed pov-ray
+        process, zero on success, and the list of the outputs of the
+        processes
+    :raises OSError: if pov-ray cannot be invoked
+
+    """
+
+    # pylint: disable=too-many-arguments, too-many-locals
+
+    n_cpus = len(get_available_cpus())
+    ranges = split_frames(n_frames, n_procs if n_procs > 0 else n_cpus)
+    n_threads = decide_threads(
+        n_cpus, len(ranges), count_blocks(width, height), max_threads
+        )
+
+    base_name = output_file.split('.')[0]
+    log_files = [
+        '%s.frames%d.log' % (base_name, i) for i in xrange(0, len(ranges))
+        ]
+
+    running = []
+    outputs = []
+    ret_code = 0
+
+    try:
+        for (first, last), log_file in zip(ranges, log_files):
+            with open(log_file, 'wb') as log_out:
+                running.append(subprocess.Popen(
+                    base_args + [
+                        '+SF%d' % first, '+EF%d' % last, '+WT%d' % n_threads
+                        ],
+                    stdout=log_out, stderr=subprocess.STDOUT
+                    ))
+
+        while ret_code == 0 and len(running) > 0:
+            time.sleep(POLL_INTERVAL)
+            still_running = []
+            for proc in running:
+                code = proc.poll()
+                if code is None:
+                    still_running.append(proc)
+                elif code != 0:
+                    ret_code = code
+            running = still_running
+
+        for log_file in log_files:
+            if not os.path.exists(log_file):
+                continue
+            with open(log_file, 'rb') as log_in:
+                outputs.append(log_in.read().decode('utf-8', 'replace'))
+            if not suppress_out:
+                print(outputs[-1])
+
+    finally:
+        for proc in running:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+        for log_file in log_files:
+            if os.path.exists(log_file):
+                os.remove(log_file)
+
+    return ret_code, outputs
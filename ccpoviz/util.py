@@ -3,20 +3,47 @@ Utility functions
 =================
 
 This module defines some utility functions that can be used in multiple
-unrelated part of the code, such as error reporting.
+unrelated part of the code, such as error reporting and the access to the data
+files in the package.
 
 """
 
 from __future__ import print_function
 
+import copy
+import json
 import sys
 import functools
 
+import pkg_resources
+
+
+class ProgramTermination(SystemExit):
+
+    """The exception for the termination of the program on fatal errors
+
+    It is a :py:exc:`SystemExit`, so that it terminates the program unless it
+    is explicitly caught, as in the batch mode, where it just marks the failure
+    of the current job. The error message is kept in the attribute
+    ``err_msg``.
+
+    """
+
+    def __init__(self, err_msg, ret_code=1):
+
+        """Initializes the exception with the message and return code"""
+
+        super(ProgramTermination, self).__init__(ret_code)
+        self.err_msg = err_msg
+
 
 def terminate_program(err_msg, ret_code=1):
 
     """Terminates the current program
 
+    The error message is printed to the standard error and a
+    :py:exc:`ProgramTermination` exception is raised.
+
     :param err_msg: The error message to be printed out
     :param ret_code: The return code for the termination of the program
 
@@ -34,7 +61,7 @@ def terminate_program(err_msg, ret_code=1):
     p(err_msg)
     p('')
 
-    sys.exit(ret_code)
+    raise ProgramTermination(err_msg, ret_code)
 
 
 def format_vector(vec, float_format='%11.6f'):
@@ -51,3 +78,70 @@ def format_vector(vec, float_format='%11.6f'):
     return (
         '<' + (', '.join([float_format for _ in xrange(0, 3)])) + '>'
         ) % tuple(vec[i] for i in xrange(0, 3))
+
+
+#
+# Data files in the package
+# -------------------------
+#
+# The data files are read only once in each process, which saves the repeated
+# reading in long-running processes like the render daemon.
+#
+
+
+_DATA_STRINGS = {}
+
+
+def get_data_string(name):
+
+    """Gets the content of a data file in the package
+
+    :param name: The name of the file in the data directory
+    :returns: The string of the content of the file
+
+    """
+
+    try:
+        return _DATA_STRINGS[name]
+    except KeyError:
+        content = pkg_resources.resource_string(__name__, 'data/' + name)
+        _DATA_STRINGS[name] = content
+        return content
+
+
+_DATA_JSONS = {}
+
+
+def get_data_json(name):
+
+    """Gets the parsed content of a JSON data file in the package
+
+    The file is parsed only once, and a deep copy of the parsed content is
+    returned so that it can be freely modified by the caller.
+
+    :param name: The name of the file in the data directory
+
+    """
+
+    try:
+        parsed = _DATA_JSONS[name]
+    except KeyError:
+        parsed = json.loads(get_data_string(name))
+        _DATA_JSONS[name] = parsed
+
+    return copy.deepcopy(parsed)
+
+
+def get_version():
+
+    """Gets the version of the installed package
+
+    :returns: The version string, or ``unknown`` when the package is run
+        without being installed
+
+    """
+
+    try:
+        return pkg_resources.get_distribution('ccpoviz').version
+    except pkg_resources.DistributionNotFound:
+        return 'unknown'
@@ -0,0 +1,548 @@
+"""
+Work queue in a shared directory
+================================
+
+For rendering on many nodes sharing a file system, like the NFS mount of a
+cluster, the jobs can be put into a work queue in a shared directory, and
+rendered by workers running on the nodes. No service other than the file
+system is needed, since all the coordination is done by atomic renames.
+
+The queue directory contains the subdirectories
+
+pending
+  The job files waiting to be claimed. Each job file contains the job
+  dictionary of the format of :py:mod:`batchrender`, with all the file names
+  made absolute on submission.
+
+claimed
+  The job files claimed by the workers, with the identifier of the worker
+  appended to the name.
+
+done, failed
+  The result files of the finished jobs, with the job, the worker, the
+  timing, and the error message for failures.
+
+A worker claims a job by renaming its file from ``pending`` into ``claimed``,
+which succeeds for only one worker. While rendering, the worker renews its
+lease by touching the claimed file periodically. A claimed file not touched
+for longer than the lease timeout is considered to be left by a dead worker,
+and is renamed back to ``pending`` by any worker, to be claimed again. The
+times of the files are compared against a clock file touched on the same file
+system, so that the clocks of the nodes do not need to be synchronized. A
+worker finishes a job by renaming its claimed file into the result directory,
+which fails when the lease has been lost, in which case the result is
+discarded since the job is given to another worker.
+
+The jobs are rendered by :py:func:`renderdriver.render_driver` in the worker
+process, and the queue is managed by the ``ccpovizq`` program, with the
+``submit``, ``work``, and ``status`` commands.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from .batchrender import absolutize_job
+from .main import add_job_arguments, form_cli_jobs
+from .renderdriver import render_driver
+from .util import ProgramTermination, terminate_program
+
+
+# The subdirectories of the queue directory
+QUEUE_SUBDIRS = ['pending', 'claimed', 'done', 'failed', 'tmp']
+
+# The extension of the job and result files
+JOB_EXT = '.json'
+
+# The separator between the job name and the worker in the claimed files
+CLAIM_SEP = '@'
+
+# The default lease timeout in seconds
+DEFAULT_LEASE = 300.0
+
+
+def get_worker_id():
+
+    """Gets the identifier of the current worker from the host and process"""
+
+    return '%s-%d' % (socket.gethostname(), os.getpid())
+
+
+def split_claim(claim_name):
+
+    """Splits the name of a claimed file into the job file name and worker
+
+    The names of the jobs can contain the separator from the names of their
+    input files, while the identifiers of the workers cannot, so the name is
+    split at the last separator.
+
+    :returns: The pair of the name of the job file and the worker identifier
+
+    """
+
+    file_name, worker_id = claim_name.rsplit(CLAIM_SEP, 1)
+    return file_name, worker_id
+
+
+class WorkQueue(object):
+
+    """The work queue in a directory
+
+    .. py:attribute:: queue_dir
+
+      The absolute path of the queue directory.
+
+    .. py:attribute:: lease
+
+      The lease timeout in seconds.
+
+    """
+
+    __slots__ = [
+        'queue_dir',
+        'lease',
+        ]
+
+    def __init__(self, queue_dir, lease=DEFAULT_LEASE):
+
+        """Initializes the queue, creating the directories when needed
+
+        :raises ValueError: if the lease timeout is not positive
+        :raises OSError: if the directories cannot be created
+
+        """
+
+        if lease <= 0:
+            raise ValueError('The lease timeout needs to be positive')
+
+        self.queue_dir = os.path.abspath(queue_dir)
+        self.lease = lease
+
+        for subdir in QUEUE_SUBDIRS:
+            path = self._get_path(subdir)
+            if not os.path.isdir(path):
+                try:
+                    os.makedirs(path)
+                except OSError:
+                    # Possibly created by another node at the same time
+                    if not os.path.isdir(path):
+                        raise
+
+    def _get_path(self, subdir, name=''):
+
+        """Gets the path of a file in a subdirectory of the queue"""
+
+        return os.path.join(self.queue_dir, subdir, name)
+
+    def _write_file(self, subdir, name, content):
+
+        """Writes a JSON file atomically into a subdirectory
+
+        The file is first written in the temporary directory of the queue, so
+        that a partially written file is never visible.
+
+        """
+
+        handle, tmp_name = tempfile.mkstemp(
+            suffix='.tmp', dir=self._get_path('tmp')
+            )
+        try:
+            with os.fdopen(handle, 'w') as tmp_file:
+                json.dump(content, tmp_file, sort_keys=True)
+            os.rename(tmp_name, self._get_path(subdir, name))
+        except (IOError, OSError):
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+        return None
+
+    def _list(self, subdir):
+
+        """Lists the names of the files in a subdirectory in sorted order"""
+
+        return sorted(
+            i for i in os.listdir(self._get_path(subdir))
+            if not i.startswith('.')
+            )
+
+    def submit(self, jobs):
+
+        """Submits jobs into the queue
+
+        The names of the job files start with the time of submission, so that
+        the jobs are claimed roughly in the order of submission.
+
+        :param jobs: The list of job dictionaries, with absolute file names
+        :returns: The list of the names of the jobs
+
+        """
+
+        prefix = '%013d-%s' % (int(time.time() * 1000), get_worker_id())
+        names = []
+        for idx, job in enumerate(jobs):
+            name = '%s-%05d-%s' % (
+                prefix, idx, os.path.basename(job['input']).split('.')[0]
+                )
+            self._write_file('pending', name + JOB_EXT, job)
+            names.append(name)
+
+        return names
+
+    def claim(self, worker_id):
+
+        """Claims the first pending job that can be claimed
+
+        :returns: The pair of the name of the claimed file and the job
+            dictionary, or None when no job can be claimed
+
+        """
+
+        for file_name in self._list('pending'):
+            claim_name = file_name + CLAIM_SEP + worker_id
+            try:
+                os.rename(
+                    self._get_path('pending', file_name),
+                    self._get_path('claimed', claim_name)
+                    )
+            except OSError:
+                # Claimed by another worker
+                continue
+
+            # The modification time is kept by the renaming, which needs to be
+            # updated before the job is seen as stale.
+            if not self.renew(claim_name):
+                continue
+
+            try:
+                with open(self._get_path('claimed', claim_name), 'r') as job:
+                    return claim_name, json.load(job)
+            except (IOError, ValueError) as err:
+                self._write_result(claim_name, 'failed', {
+                    'job': None, 'message': 'Invalid job file: %s' % err
+                    })
+
+        return None
+
+    def renew(self, claim_name):
+
+        """Renews the lease of a claimed job
+
+        :returns: If the job is still claimed
+
+        """
+
+        try:
+            os.utime(self._get_path('claimed', claim_name), None)
+        except OSError:
+            return False
+
+        return True
+
+    def release(self, claim_name):
+
+        """Puts a claimed job back into the pending jobs
+
+        :returns: If the job is put back, False when it is no longer claimed
+
+        """
+
+        try:
+            os.rename(
+                self._get_path('claimed', claim_name),
+                self._get_path('pending', split_claim(claim_name)[0])
+                )
+        except OSError:
+            return False
+
+        return True
+
+    def finish(self, claim_name, status, result):
+
+        """Finishes a claimed job with its result
+
+        :param claim_name: The name of the claimed file
+        :param status: The status of the job, ``done`` or ``failed``
+        :param result: The dictionary of the result
+        :returns: If the result is recorded, False when the lease of the job
+            has been lost
+
+        """
+
+        return self._write_result(claim_name, status, result)
+
+    def _write_result(self, claim_name, status, result):
+
+        """Moves a claimed file into the result directory and writes the result
+
+        The claimed file is renamed first, which only succeeds when the job is
+        still claimed.
+
+        """
+
+        file_name, worker_id = split_claim(claim_name)
+        result_path = self._get_path(status, file_name)
+        try:
+            os.rename(self._get_path('claimed', claim_name), result_path)
+        except OSError:
+            return False
+
+        result = dict(result)
+        result['worker'] = worker_id
+        self._write_file(status, file_name, result)
+
+        return True
+
+    def get_fs_time(self):
+
+        """Gets the current time according to the file system
+
+        A clock file in the queue directory is touched and its modification
+        time is read, so that it can be compared with the times of the files
+        written by other nodes.
+
+        """
+
+        clock_file = self._get_path('tmp', '.clock-' + get_worker_id())
+        with open(clock_file, 'a'):
+            os.utime(clock_file, None)
+        try:
+            return os.stat(clock_file).st_mtime
+        finally:
+            os.remove(clock_file)
+
+    def reclaim_stale(self):
+
+        """Puts the claimed jobs with expired leases back into the pending jobs
+
+        :returns: The list of the names of the reclaimed claimed files
+
+        """
+
+        now = self.get_fs_time()
+        reclaimed = []
+
+        for claim_name in self._list('claimed'):
+            claim_path = self._get_path('claimed', claim_name)
+            try:
+                mtime = os.stat(claim_path).st_mtime
+            except OSError:
+                continue
+            if now - mtime > self.lease and self.release(claim_name):
+                reclaimed.append(claim_name)
+
+        return reclaimed
+
+    def get_status(self):
+
+        """Gets the status of the queue
+
+        :returns: The dictionary from the subdirectories to the numbers of
+            files in them, with the list of the claimed files under the key
+            ``workers``
+
+        """
+
+        status = dict(
+            (i, len(self._list(i))) for i in ['pending', 'done', 'failed']
+            )
+        claimed = self._list('claimed')
+        status['claimed'] = len(claimed)
+        status['workers'] = claimed
+
+        return status
+
+
+#
+# The worker
+# ----------
+#
+
+
+class LeaseKeeper(threading.Thread):
+
+    """The thread for renewing the lease of a job during its render"""
+
+    def __init__(self, queue, claim_name):
+
+        """Initializes the thread for a claimed job"""
+
+        super(LeaseKeeper, self).__init__()
+        self.daemon = True
+        self.queue = queue
+        self.claim_name = claim_name
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+
+        """Renews the lease three times in each lease timeout"""
+
+        while not self._stop_event.wait(self.queue.lease / 3.0):
+            if not self.queue.renew(self.claim_name):
+                self.lost = True
+                break
+
+    def stop(self):
+
+        """Stops renewing the lease"""
+
+        self._stop_event.set()
+        self.join()
+
+
+def run_job(queue, claim_name, job):
+
+    """Renders a claimed job and records its result
+
+    :returns: The status of the job, ``done``, ``failed``, or ``lost`` when
+        the lease of the job is lost
+
+    """
+
+    keeper = LeaseKeeper(queue, claim_name)
+    keeper.start()
+    beg_time = time.time()
+
+    try:
+        render_driver(
+            job['input'], job['reader'], job['molecule-option'],
+            job['project-option'], job['output'], job['keep']
+            )
+        status, message = 'done', ''
+    except ProgramTermination as exc:
+        status, message = 'failed', exc.err_msg
+    except KeyboardInterrupt:
+        keeper.stop()
+        queue.release(claim_name)
+        raise
+    except Exception as exc:  # pylint: disable=broad-except
+        status, message = 'failed', '%s: %s' % (type(exc).__name__, exc)
+    finally:
+        keeper.stop()
+
+    result = {
+        'job': job, 'message': message, 'beg_time': beg_time,
+        'render_time': time.time() - beg_time,
+        }
+    if keeper.lost or not queue.finish(claim_name, status, result):
+        return 'lost'
+
+    return status
+
+
+def run_worker(queue, poll_interval=5.0, exit_when_idle=False):
+
+    """Runs a worker on a queue
+
+    The stale claims are reclaimed whenever no pending job can be claimed.
+
+    :param queue: The :py:class:`WorkQueue`
+    :param poll_interval: The interval in seconds for checking the queue when
+        it is empty
+    :param exit_when_idle: If the worker exits when no job is pending or
+        claimed by other workers
+    :returns: The number of failed jobs
+
+    """
+
+    worker_id = get_worker_id()
+    n_failed = 0
+
+    while True:
+
+        claimed = queue.claim(worker_id)
+        if claimed is None and len(queue.reclaim_stale()) > 0:
+            claimed = queue.claim(worker_id)
+
+        if claimed is None:
+            if exit_when_idle and queue.get_status()['claimed'] == 0:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        claim_name, job = claimed
+        status = run_job(queue, claim_name, job)
+        if status == 'failed':
+            n_failed += 1
+        print('%-6s %s' % (status, job['input']))
+        sys.stdout.flush()
+
+    return n_failed
+
+
+#
+# The program
+# -----------
+#
+
+
+def main():
+
+    """The main function of the work queue program"""
+
+    parser = argparse.ArgumentParser(
+        description='Rendering molecules by a work queue in a directory',
+        epilog='by Tschijnmo TSCHAU <tschijnmotschau@gmail.com>'
+        )
+    parser.add_argument('-q', '--queue', type=str, required=True,
+                        help='The queue directory')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    submit_parser = subparsers.add_parser(
+        'submit', help='Submit jobs into the queue'
+        )
+    add_job_arguments(submit_parser)
+
+    work_parser = subparsers.add_parser(
+        'work', help='Run a worker rendering the jobs in the queue'
+        )
+    work_parser.add_argument('--lease', type=float, default=DEFAULT_LEASE,
+                             help='The lease timeout in seconds, after which '
+                             'the jobs claimed by dead workers are reclaimed')
+    work_parser.add_argument('--poll', type=float, default=5.0,
+                             help='The interval in seconds for checking an '
+                             'empty queue')
+    work_parser.add_argument('--exit-when-idle', action='store_true',
+                             help='Exit when no job is left in the queue')
+
+    subparsers.add_parser('status', help='Print the status of the queue')
+
+    args = parser.parse_args()
+
+    try:
+        queue = WorkQueue(args.queue, getattr(args, 'lease', DEFAULT_LEASE))
+    except ValueError as verr:
+        terminate_program(verr.args[0])
+    except OSError as err:
+        terminate_program('Invalid queue directory: %s' % err)
+
+    if args.command == 'submit':
+        jobs = [
+            absolutize_job(i) for i in form_cli_jobs(submit_parser, args)
+            ]
+        names = queue.submit(jobs)
+        print('%d jobs submitted to %s' % (len(names), queue.queue_dir))
+        return 0
+    elif args.command == 'work':
+        try:
+            n_failed = run_worker(queue, args.poll, args.exit_when_idle)
+        except KeyboardInterrupt:
+            return 1
+        return 1 if n_failed > 0 else 0
+    else:
+        status = queue.get_status()
+        for key in ['pending', 'claimed', 'done', 'failed']:
+            print('%-8s %d' % (key, status[key]))
+        for claim_name in status['workers']:
+            print('    %s by %s' % split_claim(claim_name))
+        return 0
@@ -4,7 +4,10 @@ setup(
     name = "ccpoviz",
     version = "0.0.1",
     packages = find_packages(),
-    scripts = ['scripts/ccpoviz', 'scripts/iPerspective'],
+    scripts = [
+        'scripts/ccpoviz', 'scripts/iPerspective',
+        'scripts/ccpovizd', 'scripts/ccpovizc', 'scripts/ccpovizq',
+        ],
 
     install_requires = [
         'docutils>=0.3',